@@ -0,0 +1,134 @@
+# -- Almacenamiento local por contenido -- #
+# Cada archivo se guarda una sola vez como <raiz>/ab/cd/<sha256>; las filas de Archivo con ese
+# sha256 son sus referencias. Un blob sin referencias se borra al eliminar la ultima fila o en la
+# recoleccion de huerfanos.
+# 01: imports
+import hashlib, os, string, time, uuid
+import click
+from flask import current_app
+from sqlalchemy import select
+from models import db, Archivo
+from subidas import guardar_stream
+from tareas import cola
+
+HEX = set(string.hexdigits.lower())
+
+# -- almacen -- #
+# 01: blobs inmutables repartidos en dos niveles de carpetas (65536 como maximo)
+class AlmacenContenido:
+    def __init__(self):
+        self.raiz = None
+        self.gracia = 3600
+        self._ultima_recoleccion = float('-inf')
+
+    # 02: ALMACEN_GRACIA (segundos que se respeta un blob recien usado) y ALMACEN_RECOLECTAR (segundos entre recolecciones)
+    def init_app(self, app, raiz):
+        self.raiz = raiz
+        self.gracia = app.config.setdefault('ALMACEN_GRACIA', int(os.environ.get('ALMACEN_GRACIA', 3600)))
+        app.config.setdefault('ALMACEN_RECOLECTAR', int(os.environ.get('ALMACEN_RECOLECTAR', 86400)))
+        os.makedirs(self.temporales, exist_ok=True)
+        app.extensions['almacen'] = self
+
+        # comandos: flask almacen recolectar
+        @app.cli.group('almacen')
+        def grupo():
+            """Blobs locales por contenido"""
+
+        @grupo.command('recolectar')
+        def _recolectar():
+            """Borra los blobs sin referencias y los temporales abandonados"""
+            click.echo(f'{self.recolectar()} blobs borrados')
+
+    @property
+    def temporales(self):
+        return os.path.join(self.raiz, '.tmp')  # mismo disco que los blobs: os.replace es atomico
+
+    # clave relativa a la raiz ('ab/cd/<sha256>'), la misma que guarda Archivo.clave
+    @staticmethod
+    def clave_de(sha256):
+        return f'{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+    def ruta_de(self, sha256):
+        return os.path.join(self.raiz, sha256[:2], sha256[2:4], sha256)
+
+    # -- escritura -- #
+    # 01: copia el stream calculando el sha256; si el contenido ya existe solo lo reusa
+    def guardar(self, stream, max_bytes=None):
+        """Devuelve (sha256, tamano, ruta)"""
+        resumen = hashlib.sha256()
+        temporal = os.path.join(self.temporales, uuid.uuid4().hex)
+        tamano = guardar_stream(stream, temporal, max_bytes=max_bytes, resumen=resumen)
+        sha256 = resumen.hexdigest()
+        destino = self.ruta_de(sha256)
+        try:
+            os.utime(destino)  # marca el blob como en uso para que la recoleccion no lo borre ahora
+            os.remove(temporal)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(temporal, destino)
+        return sha256, tamano, destino
+
+    # -- borrado -- #
+    # 01: borra el blob si ya no lo referencia ninguna fila; False si sigue en uso o es muy reciente
+    def liberar(self, sha256):
+        if db.session.scalar(select(Archivo.id).where(Archivo.sha256 == sha256).limit(1)): return False
+        ruta = self.ruta_de(sha256)
+        try:
+            if time.time() - os.path.getmtime(ruta) < self.gracia: return False  # una subida en curso pudo reusarlo; queda para la recoleccion
+            os.remove(ruta)
+        except FileNotFoundError:
+            return False
+        return True
+
+    # 02: encola una recoleccion si paso ALMACEN_RECOLECTAR desde la ultima de este proceso
+    def programar_recoleccion(self):
+        ahora = time.monotonic()
+        if ahora - self._ultima_recoleccion < current_app.config['ALMACEN_RECOLECTAR']: return
+        self._ultima_recoleccion = ahora
+        cola.encolar('almacen.recolectar')
+
+    # -- recoleccion -- #
+    # 01: recorre los blobs viejos por lotes y borra los que no tienen filas; tambien temporales abandonados
+    def recolectar(self, lote=500):
+        limite = time.time() - self.gracia
+        borrados, candidatos = 0, {}
+        for sha256, ruta in self._blobs():
+            if os.path.getmtime(ruta) >= limite: continue
+            candidatos[sha256] = ruta
+            if len(candidatos) >= lote: borrados += self._borrar_huerfanos(candidatos); candidatos = {}
+        borrados += self._borrar_huerfanos(candidatos)
+        for entrada in os.scandir(self.temporales):
+            if entrada.stat().st_mtime < limite: os.remove(entrada.path)
+        return borrados
+
+    # 02: (sha256, ruta) de cada blob en las carpetas ab/cd
+    def _blobs(self):
+        for nivel1 in os.scandir(self.raiz):
+            if not (nivel1.is_dir() and len(nivel1.name) == 2 and set(nivel1.name) <= HEX): continue
+            for nivel2 in os.scandir(nivel1.path):
+                if not nivel2.is_dir(): continue
+                for blob in os.scandir(nivel2.path):
+                    if len(blob.name) == 64 and set(blob.name) <= HEX: yield blob.name, blob.path
+
+    # 03: una consulta por lote para saber cuales siguen referenciados
+    def _borrar_huerfanos(self, candidatos):
+        if not candidatos: return 0
+        usados = set(db.session.scalars(select(Archivo.sha256).where(Archivo.sha256.in_(list(candidatos)))))
+        borrados = 0
+        for sha256, ruta in candidatos.items():
+            if sha256 in usados: continue
+            try:
+                if os.path.getmtime(ruta) >= time.time() - self.gracia: continue  # reusado mientras se consultaba
+                os.remove(ruta); borrados += 1
+            except FileNotFoundError: pass
+        return borrados
+
+almacen = AlmacenContenido()
+
+@cola.tarea('almacen.liberar')
+def tarea_liberar(sha256):
+    almacen.liberar(sha256)
+
+@cola.tarea('almacen.recolectar')
+def tarea_recolectar():
+    almacen.recolectar()
@@ -0,0 +1,232 @@
+# -- Backends de almacenamiento -- #
+# Cada Archivo guarda su backend ('local', 'cloudinary' o 's3') y su clave dentro de el. Las rutas
+# piden al backend la url o la ruta del archivo; nadie vuelve a interpretar `Archivo.ruta`.
+# 01: imports
+import os, re, uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import quote
+from urllib.request import urlopen
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.datastructures import FileStorage
+from models import db, Archivo
+from almacen import almacen
+from subidas import LectorLimitado
+from tareas import cola
+from metricas import metricas
+
+EXTENSIONES_IMAGEN = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
+BLOB = re.compile(r'[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})')
+
+class ErrorAlmacenamiento(Exception):
+    """El backend no pudo guardar el archivo"""
+
+# 02: lo que devuelve un backend al guardar
+@dataclass(frozen=True)
+class Guardado:
+    clave: str  # identificador dentro del backend
+    tamano: int
+    ruta: str  # ruta local o url, solo informativa
+    sha256: Optional[str] = None  # solo blobs locales (referencias del almacen por contenido)
+
+# 03: Content-Disposition con nombre unicode (RFC 6266)
+def disposicion(nombre, adjunto=True):
+    return f"{'attachment' if adjunto else 'inline'}; filename*=UTF-8''{quote(nombre)}"
+
+# -- interfaz -- #
+class Almacenamiento:
+    """Operaciones comunes; `remoto` indica si el archivo vive fuera del servidor"""
+    nombre = None
+    remoto = True
+
+    def guardar(self, archivo, carpeta, extension, max_bytes=None):  # -> Guardado
+        raise NotImplementedError
+
+    def abrir(self, clave):  # archivo binario de lectura
+        raise NotImplementedError
+
+    def eliminar(self, claves):  # en lote; las que ya no existen se ignoran
+        raise NotImplementedError
+
+    def ruta_local(self, clave):  # para enviar desde el servidor (send_file / X-Accel)
+        return None
+
+    def url_directa(self, clave, nombre_descarga=None, adjunto=True):  # url publica o firmada
+        return None
+
+    def url_miniatura(self, clave, ancho):
+        return None
+
+# -- local -- #
+# 01: blobs por contenido en el disco del servidor (ver almacen.py)
+class AlmacenLocal(Almacenamiento):
+    nombre, remoto = 'local', False
+
+    def __init__(self, contenido):
+        self.contenido = contenido
+
+    def guardar(self, archivo, carpeta, extension, max_bytes=None):
+        sha256, tamano, ruta = self.contenido.guardar(archivo.stream, max_bytes=max_bytes)
+        return Guardado(self.contenido.clave_de(sha256), tamano, ruta, sha256)
+
+    def ruta_local(self, clave):
+        return os.path.join(self.contenido.raiz, *clave.split('/'))
+
+    def abrir(self, clave):
+        return open(self.ruta_local(clave), 'rb')
+
+    # los blobs se liberan (se borran si no quedan referencias); los archivos anteriores al almacen se borran
+    def eliminar(self, claves):
+        for clave in claves:
+            if blob := BLOB.fullmatch(clave): self.contenido.liberar(blob.group(1)); continue
+            try: os.remove(self.ruta_local(clave))
+            except FileNotFoundError: pass
+        self.contenido.programar_recoleccion()
+
+# -- cloudinary -- #
+# 01: el SDK (y requests/urllib3/certifi) se importa en el primer uso, no al arrancar cada worker
+def _cloudinary():
+    import cloudinary_utils
+    return cloudinary_utils
+
+# 02: la clave es '<resource_type>/<public_id>', tal como aparece en la url de entrega
+class AlmacenCloudinary(Almacenamiento):
+    nombre = 'cloudinary'
+
+    def guardar(self, archivo, carpeta, extension, max_bytes=None):
+        result = _cloudinary().upload_stream_to_cloudinary(archivo, folder=carpeta, max_bytes=max_bytes,
+                                             resource_type='image' if extension in EXTENSIONES_IMAGEN else 'raw')
+        if not result['success']: raise ErrorAlmacenamiento(f"Error Cloudinary: {result['error']}")
+        return Guardado(f"{result['resource_type']}/{result['public_id']}", result['bytes'], result['secure_url'])
+
+    def abrir(self, clave):
+        with metricas.medir('cloudinary', 'abrir'): return urlopen(self.url_directa(clave))
+
+    def url_directa(self, clave, nombre_descarga=None, adjunto=True):
+        resource_type, public_id = clave.split('/', 1)
+        return _cloudinary().get_secure_url(public_id, resource_type=resource_type, secure=True)
+
+    def url_miniatura(self, clave, ancho):
+        resource_type, public_id = clave.split('/', 1)
+        return _cloudinary().get_optimized_url(public_id, width=ancho, quality=60) if resource_type == 'image' else None
+
+    # delete_resources acepta hasta 100 public_ids por llamada y tipo de recurso
+    def eliminar(self, claves):
+        por_tipo = defaultdict(list)
+        for clave in claves:
+            resource_type, public_id = clave.split('/', 1)
+            por_tipo[resource_type].append(public_id)
+        for resource_type, ids in por_tipo.items():
+            for i in range(0, len(ids), 100):
+                with metricas.medir('cloudinary', 'eliminar'):
+                    result = _cloudinary().cloudinary.api.delete_resources(ids[i:i + 100], resource_type=resource_type)
+                fallidos = {k: v for k, v in result.get('deleted', {}).items() if v not in ('deleted', 'not_found')}
+                if fallidos: raise RuntimeError(f'Cloudinary no elimino {fallidos}')  # la cola reintenta
+
+# -- s3 -- #
+# 01: cualquier servicio compatible con S3 (AWS, MinIO, R2...); `cliente` permite pasar un doble en pruebas
+class AlmacenS3(Almacenamiento):
+    nombre = 's3'
+
+    def __init__(self, bucket, prefijo='', expira=300, cliente=None, **opciones_cliente):
+        if cliente is None:
+            try: import boto3  # dependencia opcional, solo si se usa este backend
+            except ImportError: raise RuntimeError('ALMACENAMIENTO=s3 requiere boto3 (pip install boto3)')
+            cliente = boto3.client('s3', **opciones_cliente)
+        self.s3, self.bucket, self.prefijo, self.expira = cliente, bucket, prefijo, expira
+
+    # upload_fileobj sube por partes si hace falta; el lector corta al pasar el limite
+    def guardar(self, archivo, carpeta, extension, max_bytes=None):
+        clave = f'{self.prefijo}{carpeta}/{uuid.uuid4().hex}.{extension}'
+        origen = LectorLimitado(archivo.stream, max_bytes)
+        self.s3.upload_fileobj(origen, self.bucket, clave, ExtraArgs={'ContentType': archivo.mimetype or 'application/octet-stream'})
+        return Guardado(clave, origen.leidos, f's3://{self.bucket}/{clave}')
+
+    def abrir(self, clave):
+        return self.s3.get_object(Bucket=self.bucket, Key=clave)['Body']
+
+    # url firmada: el navegador descarga directo del bucket, con el nombre original
+    def url_directa(self, clave, nombre_descarga=None, adjunto=True):
+        params = {'Bucket': self.bucket, 'Key': clave}
+        if nombre_descarga: params['ResponseContentDisposition'] = disposicion(nombre_descarga, adjunto)
+        return self.s3.generate_presigned_url('get_object', Params=params, ExpiresIn=self.expira)
+
+    # delete_objects acepta hasta 1000 claves por llamada
+    def eliminar(self, claves):
+        for i in range(0, len(claves), 1000):
+            result = self.s3.delete_objects(Bucket=self.bucket, Delete={'Objects': [{'Key': k} for k in claves[i:i + 1000]], 'Quiet': True})
+            if result.get('Errors'): raise RuntimeError(f"S3 no elimino {result['Errors']}")
+
+# -- registro -- #
+# 01: backends configurados y el activo para subidas nuevas, resueltos una vez al arrancar
+class Almacenamientos:
+    def __init__(self):
+        self.backends = {}
+        self.activo = None
+        self.diferido = False
+
+    # 02: ALMACENAMIENTO ('local', 'cloudinary' o 's3'), ALMACENAMIENTO_DIFERIDO y S3_*
+    def init_app(self, app):
+        credenciales = all(os.environ.get(k) for k in ['CLOUDINARY_CLOUD_NAME', 'CLOUDINARY_API_KEY', 'CLOUDINARY_API_SECRET'])
+        nombre = app.config.setdefault('ALMACENAMIENTO', os.environ.get('ALMACENAMIENTO') or ('cloudinary' if credenciales else 'local'))
+        self.diferido = app.config.setdefault('ALMACENAMIENTO_DIFERIDO', False)  # guarda local y mueve al backend remoto en segundo plano
+        self.backends = {'local': AlmacenLocal(almacen), 'cloudinary': AlmacenCloudinary()}  # cloudinary: filas existentes aunque no sea el activo
+        if bucket := app.config.setdefault('S3_BUCKET', os.environ.get('S3_BUCKET')):
+            self.backends['s3'] = AlmacenS3(bucket, prefijo=os.environ.get('S3_PREFIJO', ''),
+                                            expira=int(os.environ.get('S3_URL_EXPIRA', 300)),
+                                            endpoint_url=os.environ.get('S3_ENDPOINT_URL'),  # minio o un doble local
+                                            region_name=os.environ.get('S3_REGION'))
+        if nombre not in self.backends: raise RuntimeError(f'ALMACENAMIENTO={nombre} no esta configurado')
+        self.activo = self.backends[nombre]
+        app.extensions['almacenamiento'] = self
+
+    def de(self, nombre):
+        return self.backends[nombre]
+
+    # -- operaciones -- #
+    # 01: guarda en el backend activo (o local si la subida es diferida); devuelve (backend, Guardado)
+    def guardar(self, archivo, carpeta, extension, max_bytes=None):
+        backend = self.backends['local'] if self.diferido and self.activo.remoto else self.activo
+        return backend.nombre, backend.guardar(archivo, carpeta, extension, max_bytes)
+
+    # 02: una tarea por backend con todas las claves, despues del commit que borra las filas
+    def eliminar_tras_commit(self, session, archivos):
+        por_backend = defaultdict(list)
+        for archivo in archivos: por_backend[archivo.backend].append(archivo.clave)
+        for backend, claves in por_backend.items():
+            cola.encolar_tras_commit(session, 'almacenamiento.eliminar', backend=backend, claves=claves)
+
+    # 03: mueve el archivo al backend activo despues del commit que lo crea
+    def mover_tras_commit(self, session, archivo_id):
+        cola.encolar_tras_commit(session, 'almacenamiento.mover', archivo_id=archivo_id)
+
+almacenamiento = Almacenamientos()
+
+# -- tareas -- #
+@cola.tarea('almacenamiento.eliminar')
+def tarea_eliminar(backend, claves):
+    almacenamiento.de(backend).eliminar(claves)
+
+# 'cloudinary.eliminar' queda por las tareas encoladas antes de los backends; importa el SDK solo si llega una
+@cola.tarea('cloudinary.eliminar')
+def tarea_eliminar_cloudinary(public_id, resource_type='image'):
+    _cloudinary().tarea_eliminar_cloudinary(public_id, resource_type)
+
+# 01: copia al backend activo y actualiza la fila; 'cloudinary.subir' queda por las tareas ya encoladas
+@cola.tarea('almacenamiento.mover')
+@cola.tarea('cloudinary.subir')
+def tarea_mover(archivo_id):
+    archivo = db.session.get(Archivo, archivo_id)
+    destino = almacenamiento.activo
+    if not archivo or archivo.backend == destino.nombre: return  # ya no existe o ya se movio
+    origen = almacenamiento.de(archivo.backend)
+    with origen.abrir(archivo.clave) as f:
+        guardado = destino.guardar(FileStorage(stream=f, filename=archivo.nombre_original, content_type=archivo.mime_type),
+                                   f'postulantes/user_{archivo.usuario_id}', archivo.extension)
+    anterior = (archivo.backend, archivo.clave)
+    archivo.backend, archivo.clave, archivo.ruta, archivo.tamano, archivo.sha256 = destino.nombre, guardado.clave, guardado.ruta, guardado.tamano, None
+    try: db.session.commit()
+    except StaleDataError:  # el archivo se elimino mientras se subia: se borra la copia recien subida
+        db.session.rollback(); cola.encolar('almacenamiento.eliminar', backend=destino.nombre, claves=[guardado.clave]); return
+    cola.encolar('almacenamiento.eliminar', backend=anterior[0], claves=[anterior[1]])  # libera la copia local
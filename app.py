@@ -1,32 +1,49 @@
 # -- Configuracion inicial de la aplicacion -- #
 # 01: importar librerias
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, make_response
-from werkzeug.security import generate_password_hash, check_password_hash  # para manejo de contraseñas
-from models import db, Usuario, Postulante, Archivo
-from datetime import datetime
-from flask_mail import Message
-import random, os, uuid
-from config_mail import init_mail, mail
+from flask import Flask, current_app, render_template, request, redirect, url_for, flash, session, make_response, jsonify, abort
+from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
+import contrasenas  # hash de contraseñas con costo configurable
+from models import db, Usuario, Postulante, Archivo, AuditoriaEstado
+from datetime import datetime, timedelta
+import os, uuid, hmac, json, math
+from config_mail import init_mail
+from config_db import init_db
 from functools import wraps
-from cloudinary_utils import upload_to_cloudinary, delete_from_cloudinary
+from tareas import cola
+from estadisticas import contadores
+import usuario_actual as identidades
+from usuario_actual import usuario_actual, invalidar_usuario
+from subidas import ArchivoDemasiadoGrande
+from almacen import almacen
+from almacenamiento import almacenamiento, ErrorAlmacenamiento
+from cli_postulantes import registrar_comandos
+import migraciones
+import verificacion
+from limites import limitador
+import descargas
+import busqueda
+from derivados import derivados
+from metricas import metricas
+from fragmentos import fragmentos
+from estaticos import estaticos
+from sqlalchemy import update, exists
+from sqlalchemy.orm import contains_eager
+from paginacion import paginar_keyset, leer_limite, filtro_prefijo
 
-app = Flask(__name__)
-app.secret_key = os.environ['SECRET_KEY']  # clave secreta desde variables de entorno
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-
-# -- Configuracion de la app -- #
-# 01: base de datos y limites de archivos
-app.config.update(
-    SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(BASE_DIR, 'instance', 'app.db')}",
-    SQLALCHEMY_TRACK_MODIFICATIONS=False,
-    MAX_CONTENT_LENGTH=5*1024*1024  # limite de 5MB para archivos
-)
-
-CARPETA_ARCHIVOS = os.path.join(BASE_DIR, 'uploads')
 EXTENSIONES_PERMITIDAS = {'pdf','png','jpg','jpeg','doc','docx','xlsx','txt','gif','webp'}
-db.init_app(app)
-init_mail(app)
-os.makedirs(CARPETA_ARCHIVOS, exist_ok=True)  # crea carpeta si no existe
+ESTADOS_POSTULANTE = ['pendiente','aprobado','rechazado']
+
+# -- Registro de rutas -- #
+# 01: las vistas se anotan al importar el modulo y crear_app las registra con los endpoints de siempre
+# ('login', 'admin_usuarios'...); un Blueprint les agregaria un prefijo y cambiaria todos los url_for
+RUTAS = []
+def ruta(regla,**opciones):
+    def decorador(f):
+        RUTAS.append((regla,f,opciones))
+        return f
+    return decorador
 
 # -- Cecoradores para control de acceso -- #
 # 01: requiere que el usuario este logueado
@@ -41,7 +58,7 @@ def login_required(f):
 def admin_required(f):
     @wraps(f)
     def decorated(*args,**kwargs):
-        usuario=Usuario.query.get(session.get('user_id'))
+        usuario=usuario_actual()  # una consulta como maximo por peticion
         if not usuario or usuario.tipo != 'admin': flash('Acceso no autorizado','error'); return redirect(url_for('login'))
         return f(*args,**kwargs)
     return decorated
@@ -55,64 +72,63 @@ def archivo_valido(nombre):
 def validar_dni(dni):
     return len(dni)==8 and dni.isdigit()
 
+# 03: convierte 'YYYY-MM-DD' en fecha, None si no es valida
+def leer_fecha(valor):
+    try: return datetime.strptime(valor,'%Y-%m-%d')
+    except (TypeError,ValueError): return None
+
+# 04: miniatura liviana para vistas previas: la del backend (cloudinary) o un derivado webp propio (global de jinja)
+def miniatura_url(archivo,ancho=120):
+    return almacenamiento.de(archivo.backend).url_miniatura(archivo.clave,ancho) or derivados.url(archivo,'mini')
+
+# 05: respuesta 429 cuando se supera un limite de frecuencia
+def demasiados_intentos(espera,plantilla,**contexto):
+    segundos=math.ceil(espera)
+    flash(f'Demasiados intentos, espera {segundos} segundos','error')
+    return render_template(plantilla,**contexto),429,{'Retry-After':str(segundos)}
+
 # -- manejo de archivos -- #
-# 01: guarda archivos en cloudinary o localmente
+# 01: guarda el archivo en el backend de almacenamiento activo
 def guardar_archivo(archivo, usuario_id=None):
     if not archivo or not archivo.filename: return None,'No seleccionaste ningún archivo'
     if not archivo_valido(archivo.filename): return None,'Tipo de archivo no permitido'
     
-    # determina si usar cloudinary segun variables de entorno
-    use_cloudinary=all([
-        os.environ.get('CLOUDINARY_CLOUD_NAME'),
-        os.environ.get('CLOUDINARY_API_KEY'),
-        os.environ.get('CLOUDINARY_API_SECRET')
-    ])
-    
-    if use_cloudinary:
-        ext=archivo.filename.rsplit('.',1)[1].lower()
-        resource_type='image' if ext in {'jpg','jpeg','png','gif','webp'} else 'raw'
-        result=upload_to_cloudinary(archivo,folder=f"postulantes/user_{usuario_id or session['user_id']}",resource_type=resource_type)
-        if not result['success']: return None,f"Error Cloudinary: {result['error']}"
-        nuevo_archivo=Archivo(
-            usuario_id=usuario_id or session['user_id'],
-            nombre_original=archivo.filename,
-            nombre_guardado=result['public_id'],
-            extension=result['format'],
-            mime_type=f"application/{result['format']}",
-            ruta=result['secure_url'],  # url de cloudinary
-            tamano=result['bytes']
-        )
-    else:
-        # guardado local en el servidor
-        ext=archivo.filename.rsplit('.',1)[1].lower()
-        nombre_unico=f"{uuid.uuid4()}.{ext}"
-        ruta_local=os.path.join(CARPETA_ARCHIVOS,nombre_unico)
-        archivo.save(ruta_local)
-        if os.path.getsize(ruta_local)>app.config['MAX_CONTENT_LENGTH']:
-            os.remove(ruta_local); return None,'El archivo supera 5MB'
-        nuevo_archivo=Archivo(
-            usuario_id=usuario_id or session['user_id'],
-            nombre_original=archivo.filename,
-            nombre_guardado=nombre_unico,
-            extension=ext,
-            mime_type=archivo.mimetype,
-            ruta=ruta_local,  # ruta local
-            tamano=os.path.getsize(ruta_local)
-        )
-    db.session.add(nuevo_archivo)
+    usuario_id=usuario_id or session['user_id']
+    ext=archivo.filename.rsplit('.',1)[1].lower()
+    try: backend,guardado=almacenamiento.guardar(archivo,f"postulantes/user_{usuario_id}",ext,max_bytes=current_app.config['MAX_CONTENT_LENGTH'])
+    except ArchivoDemasiadoGrande: return None,'El archivo supera 5MB'
+    except ErrorAlmacenamiento as e: return None,str(e)
+    nuevo_archivo=Archivo(
+        usuario_id=usuario_id,
+        nombre_original=archivo.filename,
+        nombre_guardado=f"{uuid.uuid4()}.{ext}",
+        extension=ext,
+        mime_type=archivo.mimetype,
+        ruta=guardado.ruta,  # ruta local o url, solo informativa
+        tamano=guardado.tamano,
+        sha256=guardado.sha256,
+        backend=backend,
+        clave=guardado.clave
+    )
+    db.session.add(nuevo_archivo); db.session.flush()
+    if backend!=almacenamiento.activo.nombre:  # subida diferida: se mueve al backend activo despues del commit
+        almacenamiento.mover_tras_commit(db.session,nuevo_archivo.id)
+    elif derivados.soporta(ext):  # miniatura lista antes de que se vea el listado
+        cola.encolar_tras_commit(db.session,'derivados.generar',archivo_id=nuevo_archivo.id)
     return nuevo_archivo,None
 
 # -- rutas principales -- #
-@app.route('/')
+@ruta('/')
 def index():
     return render_template('register.html')
 
 # -- registro de postulantes -- #
 # 01: procesa el formulario de registro
-@app.route('/postular',methods=['POST'])
+@ruta('/postular',methods=['POST'])
 def postular():
     datos={k:request.form.get(k,'').strip() for k in ['nombres','apellidos','fecha_nacimiento','correo','dni','password']}
     datos['correo']=datos['correo'].lower()
+    if espera:=limitador.excedido(email=datos['correo']): return demasiados_intentos(espera,'register.html')
     
     # validaciones basicas
     if not all(datos.values()): flash('Todos los campos son obligatorios','error'); return redirect(url_for('index'))
@@ -122,7 +138,7 @@ def postular():
     
     try:
         # crea usuario y postulante
-        nuevo_usuario=Usuario(email=datos['correo'],password_hash=generate_password_hash(datos['password']),tipo='postulante',verificado=False)
+        nuevo_usuario=Usuario(email=datos['correo'],password_hash=contrasenas.hashear(datos['password']),tipo='postulante',verificado=False)
         db.session.add(nuevo_usuario); db.session.flush()
         
         nuevo_postulante=Postulante(
@@ -139,70 +155,100 @@ def postular():
         if archivo:=request.files.get('archivo_de_identidad'):
             if archivo.filename: guardar_archivo(archivo,nuevo_usuario.id)
         
-        # genera codigo de verificacion y guarda en session
-        codigo=str(random.randint(100000,999999))
-        session.update({'correo_verificar':datos['correo'],'codigo_verificacion':codigo})
+        # genera codigo de verificacion en la base de datos; la sesion solo recuerda el correo
+        codigo=verificacion.emitir_codigo(datos['correo'])
+        session['correo_verificar']=datos['correo']
         
-        # envia correo de verificacion
-        try:
-            msg=Message("Verifica tu correo en App Iestpoxapampa",recipients=[datos['correo']])
-            msg.html=render_template("verify_email.html",nombres=datos['nombres'],codigo=codigo); mail.send(msg)
-        except: pass  # si falla el envio continua igual
+        # envia correo de verificacion en segundo plano, solo si el registro se guarda
+        cola.encolar_tras_commit(db.session,'correo.enviar',destinatarios=[datos['correo']],asunto="Verifica tu correo en App Iestpoxapampa",
+            html=render_template("verify_email.html",nombres=datos['nombres'],codigo=codigo))
         
         db.session.commit()
         flash(f'Registro exitoso. Código enviado a {datos["correo"]}','success')
         return redirect(url_for('verify'))
+    except contrasenas.ServicioOcupado:
+        db.session.rollback(); flash('El servidor está ocupado, intenta nuevamente','error'); return redirect(url_for('index'))
     except:
         db.session.rollback(); flash('Error en el registro','error'); return redirect(url_for('index'))
 
 # -- autenticacion -- #
-@app.route('/login',methods=['GET','POST'])
+@ruta('/login',methods=['GET','POST'])
 def login():
     if request.method=='POST':
-        usuario=Usuario.query.filter_by(email=request.form.get('correo','').strip().lower()).first()
-        if not usuario or not check_password_hash(usuario.password_hash,request.form.get('password','')):
+        correo=request.form.get('correo','').strip().lower()
+        if espera:=limitador.excedido(email=correo,gastar=False): return demasiados_intentos(espera,'login.html')  # antes de gastar CPU en el hash
+        usuario=Usuario.query.filter_by(email=correo).first()
+        password=request.form.get('password','')
+        try: valida=bool(usuario) and contrasenas.verificar(usuario.password_hash,password)
+        except contrasenas.ServicioOcupado: flash('El servidor está ocupado, intenta nuevamente','error'); return render_template('login.html'),503
+        if not valida:
+            limitador.gastar(email=correo)  # solo los intentos fallidos gastan las fichas del correo
             flash('Correo o contraseña incorrectos','error')
         elif usuario.tipo=='postulante' and not usuario.verificado:
+            session['correo_verificar']=usuario.email
             flash('Debes verificar tu correo primero','error'); return redirect(url_for('verify'))
         else:
+            if contrasenas.necesita_rehash(usuario.password_hash):  # migra el hash a la politica actual
+                try: usuario.password_hash=contrasenas.hashear(password); db.session.commit()
+                except contrasenas.ServicioOcupado: pass  # con el pool lleno se migra en el proximo login
             session.update({'user_id':usuario.id,'email':usuario.email,'tipo_usuario':usuario.tipo})
             flash('Bienvenido!','success')
             return redirect(url_for('admin_dashboard' if usuario.tipo=='admin' else 'dashboard'))
     return render_template('login.html')
 
 # -- verificacion de correo -- #
-@app.route('/verify',methods=['GET','POST'])
+@ruta('/verify',methods=['GET','POST'])
 def verify():
+    correo=request.form.get('correo',session.get('correo_verificar','')).strip().lower()
     if request.method=='POST':
-        if request.form.get('codigo')==session.get('codigo_verificacion'):
-            if usuario:=Usuario.query.filter_by(email=session.get('correo_verificar')).first():
-                usuario.verificado=True; db.session.commit()
-            session.pop('correo_verificar',None); session.pop('codigo_verificacion',None)
+        if espera:=limitador.excedido(email=correo,gastar=False): return demasiados_intentos(espera,'verify.html',correo=correo)
+        resultado=verificacion.comprobar_codigo(correo,request.form.get('codigo','').strip())
+        if resultado!='ok': limitador.gastar(email=correo)
+        if resultado=='ok':
+            session.pop('correo_verificar',None)
             flash('Correo verificado! Ya puedes iniciar sesión','success'); return redirect(url_for('login'))
-        flash('Código incorrecto','error')
-    return render_template('verify.html')
+        flash(verificacion.MENSAJES[resultado],'error')
+    return render_template('verify.html',correo=correo)
 
-@app.route('/logout')
+# 02: envia un codigo nuevo; la respuesta es la misma exista o no el correo
+@ruta('/verify/reenviar',methods=['POST'])
+def reenviar_codigo():
+    correo=request.form.get('correo','').strip().lower()
+    if not correo: flash('Ingresa tu correo','error'); return redirect(url_for('verify'))
+    if espera:=limitador.excedido(email=correo): return demasiados_intentos(espera,'verify.html',correo=correo)
+    usuario=Usuario.query.filter_by(email=correo).first()
+    if usuario and not usuario.verificado and usuario.postulante:
+        codigo=verificacion.emitir_codigo(correo)
+        cola.encolar_tras_commit(db.session,'correo.enviar',destinatarios=[correo],asunto="Verifica tu correo en App Iestpoxapampa",
+            html=render_template("verify_email.html",nombres=usuario.postulante.nombres,codigo=codigo))
+        db.session.commit()
+    session['correo_verificar']=correo
+    flash(f'Si {correo} tiene un registro pendiente, le enviamos un código nuevo','success')
+    return redirect(url_for('verify'))
+
+@ruta('/logout')
 def logout():
     session.clear(); flash('Sesión cerrada','success'); return redirect(url_for('login'))
 
 # -- area de usuarios -- #
-@app.route('/dashboard')
+@ruta('/dashboard')
 @login_required
 def dashboard():
     if session.get('tipo_usuario')=='admin': return redirect(url_for('admin_dashboard'))
-    postulante=Postulante.query.filter_by(usuario_id=session['user_id']).first()
+    usuario=usuario_actual()
+    postulante=usuario.postulante if usuario else None
     return render_template('dashboard.html',estado=postulante.estado if postulante else 'pendiente')
 
-@app.route('/perfil')
+@ruta('/perfil')
 @login_required
 def perfil():
-    usuario=Usuario.query.get(session['user_id'])
-    postulante=Postulante.query.filter_by(usuario_id=session['user_id']).first()
+    usuario=usuario_actual()
+    if not usuario: session.clear(); return redirect(url_for('login'))  # la cuenta ya no existe
+    postulante=usuario.postulante
     return render_template('profile.html',usuario={'email':usuario.email,'nombres':postulante.nombres if postulante else '',
         'apellidos':postulante.apellidos if postulante else '','dni':postulante.dni if postulante else ''})
 
-@app.route('/perfil/editar',methods=['POST'])
+@ruta('/perfil/editar',methods=['POST'])
 @login_required
 def editar_perfil():
     dni=request.form.get('dni','').strip()
@@ -212,16 +258,16 @@ def editar_perfil():
         postulante.nombres=request.form.get('nombres','').strip()
         postulante.apellidos=request.form.get('apellidos','').strip()
         postulante.dni=dni
-        db.session.commit(); flash('Perfil actualizado','success')
+        db.session.commit(); invalidar_usuario(session['user_id']); fragmentos.invalidar('fila_postulante',postulante.id); flash('Perfil actualizado','success')
     return redirect(url_for('perfil'))
 
 # -- manejo de archivos usuarios -- #
-@app.route('/mis_archivos')
+@ruta('/mis_archivos')
 @login_required
 def mis_archivos():
     return render_template('files.html',archivos=Archivo.query.filter_by(usuario_id=session['user_id']).order_by(Archivo.fecha_subida.desc()).all())
 
-@app.route('/subir_archivo',methods=['POST'])
+@ruta('/subir_archivo',methods=['POST'])
 @login_required
 def subir_archivo():
     archivo,error=guardar_archivo(request.files.get('archivo'))
@@ -229,79 +275,139 @@ def subir_archivo():
     else: db.session.commit(); flash('Archivo subido correctamente','success')
     return redirect(url_for('mis_archivos'))
 
-@app.route('/archivo/<int:file_id>')
+@ruta('/archivo/<int:file_id>')
 @login_required
 def descargar_archivo(file_id):
     archivo=Archivo.query.filter_by(id=file_id,usuario_id=session['user_id']).first_or_404()
-    if archivo.ruta.startswith('https://res.cloudinary.com'): return redirect(archivo.ruta)  # cloudinary
-    return send_file(archivo.ruta,as_attachment=True,download_name=archivo.nombre_original)  # local
+    return descargas.enviar_archivo(archivo,adjunto=request.args.get('ver')!='1')  # ?ver=1 abre en el navegador
 
-@app.route('/archivo/<int:file_id>/eliminar',methods=['POST'])
+# miniatura o vista previa (webp) para el dueño o un admin
+@ruta('/archivo/<int:file_id>/vista/<tamano>.webp')
+@login_required
+def vista_previa(file_id,tamano):
+    archivo=db.get_or_404(Archivo,file_id)
+    if archivo.usuario_id!=session['user_id'] and ((usuario:=usuario_actual()) is None or usuario.tipo!='admin'): abort(404)
+    return derivados.enviar(archivo,tamano)
+
+@ruta('/archivo/<int:file_id>/eliminar',methods=['POST'])
 @login_required
 def eliminar_archivo(file_id):
     archivo=Archivo.query.filter_by(id=file_id,usuario_id=session['user_id']).first()
     if archivo:
         try:
-            if archivo.ruta.startswith('https://res.cloudinary.com'):
-                parts=archivo.ruta.split('/upload/')
-                if len(parts)>1:
-                    public_id=parts[1].split('/')[-1].split('.')[0]
-                    delete_from_cloudinary(public_id)  # elimina de cloudinary
-            elif os.path.exists(archivo.ruta): os.remove(archivo.ruta)  # elimina local
-            
+            almacenamiento.eliminar_tras_commit(db.session,[archivo])  # el backend lo borra despues del commit
             db.session.delete(archivo); db.session.commit(); flash('Archivo eliminado','success')
         except Exception as e:
             db.session.rollback(); flash(f'Error al eliminar: {str(e)}','error')
     return redirect(url_for('mis_archivos'))
 
 # -- area de administracion -- #
-@app.route('/admin/dashboard')
+@ruta('/admin/dashboard')
 @admin_required
 def admin_dashboard():
+    stats=contadores.leer()  # sin COUNT(*) por visita
     return render_template('admin_dashboard.html',
-        total_usuarios=Usuario.query.filter_by(tipo='postulante').count(),
-        total_archivos=Archivo.query.count(),
-        postulantes_pendientes=Postulante.query.filter_by(estado='pendiente').count())
+        total_usuarios=stats['usuarios'],
+        total_archivos=stats['archivos'],
+        postulantes_pendientes=stats['postulantes']['pendiente'])
 
-@app.route('/admin/usuarios')
+@ruta('/admin/estadisticas.json')
+def admin_estadisticas():
+    token=current_app.config['ESTADISTICAS_TOKEN']
+    autorizado=bool(token) and hmac.compare_digest(request.headers.get('Authorization',''),f'Bearer {token}')
+    if not autorizado:
+        usuario=usuario_actual()
+        if not usuario or usuario.tipo!='admin': return jsonify(error='no autorizado'),403
+    return jsonify(contadores.leer())
+
+@ruta('/admin/usuarios')
 @admin_required
 def admin_usuarios():
-    return render_template('admin_usuarios.html',postulantes=Postulante.query.join(Usuario).filter(Usuario.tipo=='postulante').all())
+    filtros={k:request.args.get(k,'').strip() for k in ['estado','dni','email']}
+    filtros['email']=filtros['email'].lower()
+    query=Postulante.query.join(Usuario).filter(Usuario.tipo=='postulante').options(contains_eager(Postulante.usuario))  # carga el usuario en el mismo join
+    if filtros['estado'] in ESTADOS_POSTULANTE: query=query.filter(Postulante.estado==filtros['estado'])
+    if filtros['dni']: query=query.filter(Postulante.dni==filtros['dni'] if validar_dni(filtros['dni']) else filtro_prefijo(Postulante.dni,filtros['dni']))
+    if filtros['email']: query=query.filter(filtro_prefijo(Usuario.email,filtros['email']))
+    postulantes,siguiente=paginar_keyset(query,[Postulante.fecha_registro,Postulante.id],request.args.get('cursor'),leer_limite(request.args.get('limite')))
+    return render_template('admin_usuarios.html',postulantes=postulantes,siguiente=siguiente,filtros={k:v for k,v in filtros.items() if v})
 
-@app.route('/admin/cambiar_estado/<int:postulante_id>',methods=['POST'])
+@ruta('/admin/cambiar_estado/<int:postulante_id>',methods=['POST'])
 @admin_required
 def cambiar_estado_postulante(postulante_id):
     postulante=Postulante.query.get_or_404(postulante_id)
-    if (estado:=request.form.get('estado')) in ['pendiente','aprobado','rechazado']:
-        postulante.estado=estado; db.session.commit(); flash(f'Estado cambiado a {estado}','success')
+    if (estado:=request.form.get('estado')) in ESTADOS_POSTULANTE:
+        postulante.estado=estado; db.session.commit(); invalidar_usuario(postulante.usuario_id); fragmentos.invalidar('fila_postulante',postulante.id)
+        flash(f'Estado cambiado a {estado}','success')
+    return redirect(url_for('admin_usuarios'))
+
+@ruta('/admin/postulantes/estado_masivo',methods=['POST'])
+@admin_required
+def cambiar_estado_masivo():
+    estado=request.form.get('estado')
+    quiere_json=request.accept_mimetypes.best=='application/json'
+    def rechazar(mensaje):
+        if quiere_json: return jsonify(error=mensaje),400
+        flash(mensaje,'error'); return redirect(url_for('admin_usuarios'))
+    if estado not in ESTADOS_POSTULANTE: return rechazar('Estado no válido')
+    # alcance: ids marcados en la tabla o un filtro (ej. pendientes con archivo subido)
+    if request.form.get('alcance','seleccionados')=='seleccionados':
+        ids=sorted({int(i) for i in request.form.getlist('ids') if i.isdigit()})
+        condiciones=[Postulante.id.in_(ids)]; criterio={'ids':ids}
+    else:
+        filtro_estado=request.form.get('filtro_estado'); con_archivo=request.form.get('con_archivo')=='1'
+        condiciones=[]; criterio={'filtro_estado':filtro_estado,'con_archivo':con_archivo}
+        if filtro_estado in ESTADOS_POSTULANTE: condiciones.append(Postulante.estado==filtro_estado)
+        if con_archivo: condiciones.append(exists().where(Archivo.usuario_id==Postulante.usuario_id))
+    if not condiciones or criterio.get('ids')==[]: return rechazar('Selecciona postulantes o un filtro')  # nunca actualiza la tabla completa
+    # un solo UPDATE; se omiten los que ya estan en el estado destino
+    resultado=db.session.execute(update(Postulante).where(Postulante.estado.is_distinct_from(estado),*condiciones).values(estado=estado,fecha_actualizacion=datetime.utcnow())
+        .execution_options(synchronize_session=False))
+    cantidad=resultado.rowcount
+    db.session.add(AuditoriaEstado(admin_id=usuario_actual().id,estado_nuevo=estado,criterio=json.dumps(criterio),cantidad=cantidad))
+    db.session.commit()
+    contadores.invalidar(); identidades.cache.limpiar(); fragmentos.limpiar()  # el UPDATE masivo no pasa por los eventos de sesion
+    if quiere_json: return jsonify(afectados=cantidad,estado=estado)
+    flash(f'{cantidad} postulantes cambiados a {estado}','success')
     return redirect(url_for('admin_usuarios'))
 
-@app.route('/admin/archivos')
+@ruta('/admin/archivos')
 @admin_required
 def admin_archivos():
-    return render_template('admin_archivos.html',archivos=Archivo.query.join(Usuario).order_by(Archivo.fecha_subida.desc()).all())
+    filtros={k:request.args.get(k,'').strip().lower() for k in ['extension','usuario','desde','hasta']}
+    query=Archivo.query.join(Usuario).options(contains_eager(Archivo.usuario))  # carga el dueño en el mismo join
+    if filtros['extension'] in EXTENSIONES_PERMITIDAS: query=query.filter(Archivo.extension==filtros['extension'])
+    if filtros['usuario']: query=query.filter(filtro_prefijo(Usuario.email,filtros['usuario']))
+    if desde:=leer_fecha(filtros['desde']): query=query.filter(Archivo.fecha_subida>=desde)
+    if hasta:=leer_fecha(filtros['hasta']): query=query.filter(Archivo.fecha_subida<hasta+timedelta(days=1))  # incluye el dia completo
+    archivos,siguiente=paginar_keyset(query,[Archivo.fecha_subida,Archivo.id],request.args.get('cursor'),leer_limite(request.args.get('limite')))
+    return render_template('admin_archivos.html',archivos=archivos,siguiente=siguiente,filtros={k:v for k,v in filtros.items() if v},
+        extensiones=sorted(EXTENSIONES_PERMITIDAS))
 
-@app.route('/admin/descargar_archivo/<int:file_id>')
+@ruta('/admin/buscar')
+@admin_required
+def admin_buscar():
+    tipo=request.args.get('tipo','todo')
+    if tipo not in ('todo','postulantes','archivos'): return jsonify(error='tipo no válido'),400
+    resultado=busqueda.buscar(request.args.get('q',''),tipo,request.args.get('limite',busqueda.LIMITE_POR_DEFECTO,type=int))
+    return jsonify(
+        postulantes=[{'id':p.id,'nombres':p.nombres,'apellidos':p.apellidos,'dni':p.dni,'email':p.usuario.email,'estado':p.estado,
+            'url':url_for('admin_usuarios',dni=p.dni)} for p in resultado['postulantes']],
+        archivos=[{'id':a.id,'nombre':a.nombre_original,'email':a.usuario.email,
+            'url':url_for('admin_descargar_archivo',file_id=a.id,ver=1)} for a in resultado['archivos']])
+
+@ruta('/admin/descargar_archivo/<int:file_id>')
 @admin_required
 def admin_descargar_archivo(file_id):
     archivo = Archivo.query.get_or_404(file_id)
-    if archivo.ruta.startswith('https://res.cloudinary.com'):
-        return redirect(archivo.ruta)  # redirige a cloudinary
-    return send_file(archivo.ruta, as_attachment=True, download_name=archivo.nombre_original)
+    return descargas.enviar_archivo(archivo, adjunto=request.args.get('ver') != '1')  # ?ver=1 abre en el navegador
 
-@app.route('/admin/archivo/<int:file_id>/eliminar', methods=['POST'])
+@ruta('/admin/archivo/<int:file_id>/eliminar', methods=['POST'])
 @admin_required
 def admin_eliminar_archivo(file_id):
     archivo = Archivo.query.get_or_404(file_id)
     try:
-        if archivo.ruta.startswith('https://res.cloudinary.com'):
-            parts = archivo.ruta.split('/upload/')
-            if len(parts) > 1:
-                public_id = parts[1].split('/')[-1].split('.')[0]
-                delete_from_cloudinary(public_id)  # elimina de cloudinary
-        elif os.path.exists(archivo.ruta):
-            os.remove(archivo.ruta)  # elimina localmente
-        
+        almacenamiento.eliminar_tras_commit(db.session, [archivo])  # el backend lo borra tras el commit
         db.session.delete(archivo)
         db.session.commit()
         flash('Archivo eliminado correctamente', 'success')
@@ -311,20 +417,74 @@ def admin_eliminar_archivo(file_id):
     return redirect(url_for('admin_archivos'))
 
 # -- funciones adicionales -- #
-@app.route('/cambiar-tema', methods=['POST'])
+@ruta('/cambiar-tema', methods=['POST'])
 def cambiar_tema():
     modo = request.form.get('modo')
     resp = make_response(redirect(request.form.get('next', url_for('index'))))
     resp.set_cookie('modo_claro', 'true' if modo == 'claro' else 'false', max_age=30*24*60*60)  # cookie por 30 dias
     return resp
 
-@app.errorhandler(413)
 def archivo_demasiado_grande(e):
     flash('El archivo supera el tamaño máximo permitido (5MB)','error')
     return redirect(request.referrer or url_for('index'))
 
 # -- inicializacion -- #
-with app.app_context(): db.create_all()  # crea tablas si no existen
+# 01: crea y configura la app. Una por proceso: cola, contadores, metricas y el resto son instancias
+# compartidas del modulo. Importar este archivo no toca la base de datos; el esquema se crea aparte
+# con `flask --app app db migrar`, y con gunicorn --preload la app se arma una vez en el maestro.
+def crear_app(config=None):
+    """Devuelve la app configurada; `config` reemplaza valores antes de inicializar las extensiones"""
+    load_dotenv()  # carga las variables del archivo .env (una sola vez, antes de leer la configuracion)
+    app = Flask(__name__)
+    app.secret_key = os.environ['SECRET_KEY']  # clave secreta desde variables de entorno
+
+    # 02: limites de archivos y opciones generales (la base de datos se configura en config_db.py)
+    app.config.update(
+        MAX_CONTENT_LENGTH=5*1024*1024,  # limite de 5MB para archivos
+        ALMACENAMIENTO_DIFERIDO=(os.environ.get('ALMACENAMIENTO_DIFERIDO') or os.environ.get('CLOUDINARY_SUBIDA_DIFERIDA'))=='True',  # guarda local y mueve al backend remoto en segundo plano
+        ESTADISTICAS_RECONCILIAR=int(os.environ.get('ESTADISTICAS_RECONCILIAR',300)),  # segundos entre recuentos reales
+        ESTADISTICAS_TOKEN=os.environ.get('ESTADISTICAS_TOKEN'),  # token Bearer para el endpoint de monitoreo
+        USUARIO_CACHE_TTL=float(os.environ.get('USUARIO_CACHE_TTL',0))  # segundos que se reusa la identidad entre peticiones (0 = sin cache)
+    )
+    if config: app.config.update(config)
+    # proxies de confianza (router de heroku, nginx): sin esto request.remote_addr es la ip del proxy y
+    # todos los postulantes comparten la misma cubeta de LIMITE_IP
+    if hops:=app.config.setdefault('PROXY_HOPS',int(os.environ.get('PROXY_HOPS',0))):
+        app.wsgi_app=ProxyFix(app.wsgi_app,x_for=hops,x_proto=hops)
+    carpeta_archivos=app.config.setdefault('CARPETA_ARCHIVOS',os.environ.get('CARPETA_ARCHIVOS') or os.path.join(BASE_DIR,'uploads'))
+
+    # 03: extensiones
+    init_db(app,BASE_DIR)  # DATABASE_URL, pool de conexiones y pragmas de sqlite
+    if app.config.setdefault('MIGRAR_AL_ARRANCAR',os.environ.get('MIGRAR_AL_ARRANCAR','False')=='True'):
+        with app.app_context(): migraciones.migrar_sqlite_al_arrancar(db.engine,app.logger.warning)  # opcional, solo sqlite; lo normal es la fase release
+    metricas.init_app(app)  # opcional: /metrics con latencia, SQL por ruta y N+1 (METRICAS=True)
+    init_mail(app)
+    cola.init_app(app)  # cola de tareas (correos y operaciones de almacenamiento)
+    cola.vincular_sesion(db.session)  # las tareas diferidas se encolan solo si hay commit
+    contadores.init_app(app,db.session)  # contadores del panel admin mantenidos por eventos
+    identidades.init_app(app)  # usuario actual cacheado por peticion (y opcionalmente por proceso)
+    contrasenas.init_app(app)  # politica de hash y pool de verificacion
+    limitador.init_app(app)  # limites de frecuencia por IP y por correo
+    verificacion.init_app(app)  # codigos de verificacion en la base de datos
+    os.makedirs(carpeta_archivos, exist_ok=True)  # crea carpeta si no existe
+    almacen.init_app(app,carpeta_archivos)  # blobs por contenido en uploads/ab/cd/<sha256>
+    almacenamiento.init_app(app)  # backend activo (local, cloudinary o s3); el SDK de cloudinary se importa al primer uso
+    derivados.init_app(app)  # miniaturas webp y vistas previas de PDF con cache LRU en disco
+    descargas.init_app(app,carpeta_archivos)  # ETag, rangos y X-Accel-Redirect/X-Sendfile
+    fragmentos.init_app(app)  # {% cache %} para las filas de las tablas del admin
+    estaticos.init_app(app)  # static con huella de contenido, cache de un año y gzip/brotli
+
+    # 04: rutas y comandos
+    for regla,vista,opciones in RUTAS: app.add_url_rule(regla,view_func=vista,**opciones)
+    app.add_template_global(miniatura_url)
+    app.register_error_handler(413,archivo_demasiado_grande)
+    registrar_comandos(app,validar_dni)  # flask postulantes importar | exportar
+    migraciones.init_app(app)  # flask db migrar | estado | verificar
+    busqueda.init_app(app)  # flask busqueda reindexar
+    return app
+
+create_app = crear_app  # nombre que busca `flask --app app`
+
 if __name__=="__main__":
     port=int(os.environ.get("PORT",5000))
-    app.run(host="0.0.0.0",port=port)
\ No newline at end of file
+    crear_app().run(host="0.0.0.0",port=port)
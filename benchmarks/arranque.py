@@ -0,0 +1,113 @@
+# -- Benchmark de arranque -- #
+# Mide lo que paga cada proceso nuevo (gunicorn al arrancar o reiniciar un worker, crear_admin.py, la cli):
+# importar app.py, crear_app() y la primera peticion, cada repeticion en un interprete nuevo. Informa ademas
+# que integraciones opcionales quedaron importadas (cloudinary, boto3, PIL...) y, con --gunicorn, el tiempo
+# hasta la primera respuesta con y sin preload.
+# Uso: python benchmarks/arranque.py [--repeticiones 10] [--gunicorn --workers 4] [--json salida.json] [--comparar base.json]
+import argparse, json, os, shutil, socket, statistics, subprocess, sys, tempfile, time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPCIONALES = ['cloudinary', 'boto3', 'PIL', 'pypdfium2', 'brotli']
+FASES = ['importar_ms', 'crear_app_ms', 'primera_peticion_ms', 'segunda_peticion_ms']
+
+# -- entorno -- #
+# 01: base sqlite migrada en una carpeta temporal (migraciones.py no importa app.py)
+def preparar_entorno(carpeta):
+    entorno = dict(os.environ, SECRET_KEY='benchmark', DATABASE_URL=f"sqlite:///{os.path.join(carpeta, 'app.db')}",
+                   CARPETA_ARCHIVOS=os.path.join(carpeta, 'uploads'), TAREAS_DB=os.path.join(carpeta, 'tareas.db'),
+                   DERIVADOS_DIR=os.path.join(carpeta, 'derivados'), ESTATICOS_DIR=os.path.join(carpeta, 'estaticos'))
+    subprocess.run([sys.executable, os.path.join(RAIZ, 'migraciones.py'), 'migrar'], env=entorno, check=True, stdout=subprocess.DEVNULL)
+    return entorno
+
+# -- medicion en un proceso nuevo -- #
+# 01: se ejecuta con --hijo; imprime un json con la duracion de cada fase
+def medir_hijo():
+    sys.path.insert(0, RAIZ)
+    inicio = time.perf_counter()
+    from app import crear_app
+    importado = time.perf_counter()
+    app = crear_app()
+    creado = time.perf_counter()
+    cliente = app.test_client()
+    respuesta = cliente.get('/login')  # plantilla sin compilar, primera conexion a la base, hilos de la cola
+    primera = time.perf_counter()
+    cliente.get('/login')
+    segunda = time.perf_counter()
+    print(json.dumps({'importar_ms': (importado - inicio) * 1000, 'crear_app_ms': (creado - importado) * 1000,
+                      'primera_peticion_ms': (primera - creado) * 1000, 'segunda_peticion_ms': (segunda - primera) * 1000,
+                      'estado': respuesta.status_code, 'opcionales': [m for m in OPCIONALES if m in sys.modules]}))
+
+# 02: lanza `repeticiones` interpretes y resume cada fase (mediana y maximo)
+def medir_procesos(entorno, repeticiones):
+    muestras = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--hijo'], env=entorno, cwd=RAIZ,
+                                check=True, capture_output=True, text=True).stdout
+        muestras.append(json.loads(salida.strip().splitlines()[-1]))
+    resultados = [{'medida': fase, 'mediana_ms': statistics.median(m[fase] for m in muestras), 'max_ms': max(m[fase] for m in muestras)}
+                  for fase in FASES]
+    return resultados, muestras[-1]
+
+# -- gunicorn -- #
+# 01: milisegundos desde lanzar gunicorn hasta que /login responde
+def medir_gunicorn(entorno, workers, preload):
+    with socket.socket() as s: s.bind(('127.0.0.1', 0)); puerto = s.getsockname()[1]
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(RAIZ, 'gunicorn.conf.py'),
+                                '-w', str(workers), '-b', f'127.0.0.1:{puerto}', '--chdir', RAIZ],
+                               env=dict(entorno, GUNICORN_PRELOAD=str(preload)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - inicio < 60:
+            try:
+                with urlopen(f'http://127.0.0.1:{puerto}/login', timeout=5): return (time.perf_counter() - inicio) * 1000
+            except (URLError, ConnectionError): time.sleep(0.01)
+        raise RuntimeError('gunicorn no respondio en 60 segundos')
+    finally:
+        proceso.terminate(); proceso.wait()
+
+# -- comparacion -- #
+# 01: una medida empeora si su mediana supera la anterior en mas de `tolerancia`
+def comparar(base, actuales, tolerancia):
+    anteriores = {r['medida']: r for r in base['resultados']}
+    return [f"{r['medida']}: {anteriores[r['medida']]['mediana_ms']:.1f} -> {r['mediana_ms']:.1f} ms" for r in actuales
+            if r['medida'] in anteriores and r['mediana_ms'] > anteriores[r['medida']]['mediana_ms'] * (1 + tolerancia)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiempo de importacion, creacion de la app y primera peticion')
+    parser.add_argument('--hijo', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--repeticiones', type=int, default=10, help='interpretes nuevos por medicion')
+    parser.add_argument('--gunicorn', action='store_true', help='mide tambien el arranque de gunicorn con y sin preload')
+    parser.add_argument('--workers', type=int, default=4, help='workers de gunicorn')
+    parser.add_argument('--json', help='guarda los resultados en este archivo')
+    parser.add_argument('--comparar', help='resultados anteriores (json); sale con codigo 1 si hay regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='aumento de la mediana tolerado al comparar')
+    args = parser.parse_args()
+    if args.hijo: return medir_hijo()
+
+    carpeta = tempfile.mkdtemp(prefix='benchmark-arranque-')
+    try:
+        entorno = preparar_entorno(carpeta)
+        resultados, ultima = medir_procesos(entorno, args.repeticiones)
+        if args.gunicorn:
+            for preload in (True, False):
+                tiempos = [medir_gunicorn(entorno, args.workers, preload) for _ in range(max(1, args.repeticiones // 3))]
+                resultados.append({'medida': f"gunicorn_{'preload' if preload else 'sin_preload'}_ms",
+                                   'mediana_ms': statistics.median(tiempos), 'max_ms': max(tiempos)})
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    print(f"{'medida':<28}{'mediana ms':>12}{'max ms':>10}")
+    for r in resultados: print(f"{r['medida']:<28}{r['mediana_ms']:>12.1f}{r['max_ms']:>10.1f}")
+    print(f"# /login respondio {ultima['estado']}; opcionales importados: {', '.join(ultima['opcionales']) or 'ninguno'}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'repeticiones': args.repeticiones, 'resultados': resultados}, f, indent=2)
+    if args.comparar:
+        with open(args.comparar) as f: regresiones = comparar(json.load(f), resultados, args.tolerancia)
+        for linea in regresiones: print(f'REGRESION {linea}', file=sys.stderr)
+        if regresiones: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# -- Benchmark de hash de contraseñas -- #
+# Mide cuantos logins por segundo y por nucleo soporta cada PASSWORD_HASH_METHOD.
+# Uso: python benchmarks/hash_contrasenas.py [--metodos scrypt:16384:8:1 pbkdf2:sha256:600000] [--segundos 3] [--procesos 4]
+import argparse, json, os, time
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+METODOS = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'scrypt:8192:8:1',
+           'pbkdf2:sha256:1000000', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000']
+
+# 01: verifica el mismo hash en bucle durante `segundos` y devuelve verificaciones/s
+def medir(metodo, segundos):
+    hash_guardado = generate_password_hash('Contraseña-de-prueba-1', method=metodo)
+    total, inicio = 0, time.perf_counter()
+    while (transcurrido := time.perf_counter() - inicio) < segundos:
+        check_password_hash(hash_guardado, 'Contraseña-de-prueba-1'); total += 1
+    return total / transcurrido
+
+# 02: corre la medicion en `procesos` procesos a la vez (escalado real del host)
+def medir_paralelo(metodo, segundos, procesos):
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return sum(pool.map(medir, [metodo] * procesos, [segundos] * procesos))
+
+def main():
+    parser = argparse.ArgumentParser(description='Logins por segundo y por nucleo para cada metodo de hash')
+    parser.add_argument('--metodos', nargs='+', default=METODOS)
+    parser.add_argument('--segundos', type=float, default=3.0)
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--json', help='guarda los resultados en este archivo')
+    args = parser.parse_args()
+
+    resultados = []
+    print(f"{'metodo':<26}{'ms/login':>10}{'logins/s/nucleo':>18}{f'logins/s x{args.procesos}':>18}")
+    for metodo in args.metodos:
+        por_nucleo = medir(metodo, args.segundos)
+        total = medir_paralelo(metodo, args.segundos, args.procesos) if args.procesos > 1 else por_nucleo
+        resultados.append({'metodo': metodo, 'ms_por_login': 1000 / por_nucleo, 'logins_s_nucleo': por_nucleo,
+                           'procesos': args.procesos, 'logins_s_total': total})
+        print(f'{metodo:<26}{1000 / por_nucleo:>10.1f}{por_nucleo:>18.1f}{total:>18.1f}')
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(resultados, f, indent=2)
+
+if __name__ == '__main__':
+    main()
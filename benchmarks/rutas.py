@@ -0,0 +1,290 @@
+# -- Benchmark de rutas -- #
+# Siembra N postulantes con archivos sinteticos y mide postular, verify, login, subir_archivo, mis_archivos,
+# admin_usuarios y admin_archivos: rendimiento, p50/p95/p99 y consultas SQL por peticion (cabecera Server-Timing).
+# El correo se suprime y Cloudinary se reemplaza por un doble local: corre sin red y sin tocar uploads/ ni instance/.
+# Uso: python benchmarks/rutas.py [--tamanos 100 1000 10000] [--peticiones 200] [--json salida.json] [--comparar base.json]
+#      python benchmarks/rutas.py --modo http --workers 4 --concurrencia 16 --segundos 10   # contra gunicorn local
+import argparse, io, json, os, platform, random, re, shutil, socket, statistics, subprocess, sys, tempfile, threading, time, uuid
+from datetime import date, datetime, timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, build_opener
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'Contraseña-de-prueba-1'
+ESTADOS = ['pendiente'] * 6 + ['aprobado'] * 3 + ['rechazado']  # proporcion tipica de una convocatoria
+NOMBRES = ['Ana', 'Luis', 'Rosa', 'Jorge', 'Carmen', 'Pedro', 'Lucia', 'Miguel', 'Elena', 'Raul']
+APELLIDOS = ['Quispe', 'Huaman', 'Rojas', 'Flores', 'Mendoza', 'Torres', 'Ramos', 'Castillo', 'Vargas', 'Cruz']
+EXTENSIONES = ['pdf', 'pdf', 'pdf', 'jpg', 'png', 'docx']
+ESPERADO = {'postular': 302, 'verify': 302, 'login': 302, 'subir_archivo': 302}  # el resto responde 200
+ESCENARIOS_HTTP = ['login', 'mis_archivos', 'admin_usuarios', 'admin_archivos']  # solo lecturas y login: repetibles en paralelo
+
+# -- entorno -- #
+# 01: todo en una carpeta temporal; limites de frecuencia desactivados y metricas activas para contar consultas
+def preparar_entorno(carpeta, args):
+    os.environ.update(
+        SECRET_KEY='benchmark', DATABASE_URL=f"sqlite:///{os.path.join(carpeta, 'app.db')}",
+        CARPETA_ARCHIVOS=os.path.join(carpeta, 'uploads'), TAREAS_DB=os.path.join(carpeta, 'tareas.db'),
+        DERIVADOS_DIR=os.path.join(carpeta, 'derivados'), ESTATICOS_DIR=os.path.join(carpeta, 'estaticos'),
+        ESTADISTICAS_MARCA=os.path.join(carpeta, 'estadisticas.marca'), ALMACENAMIENTO=args.almacenamiento,
+        CLOUDINARY_CLOUD_NAME='benchmark', CLOUDINARY_API_KEY='benchmark', CLOUDINARY_API_SECRET='benchmark',
+        LIMITE_IP='1000000000/1', LIMITE_EMAIL='1000000000/1', METRICAS='True', MAIL_DEFAULT_SENDER='benchmark@bench.test')
+    if args.hash: os.environ['PASSWORD_HASH_METHOD'] = args.hash
+    sys.path.insert(0, RAIZ)
+
+# 02: importa la app y reemplaza los servicios externos
+def cargar_app():
+    from app import crear_app
+    from flask_mail import email_dispatched
+    from models import db
+    import migraciones
+    app = crear_app({'TAREAS_SINCRONO': True})  # las tareas (correo incluido) corren dentro de la peticion medida
+    with app.app_context(): migraciones.migrar(db.engine, salida=lambda linea: None)  # esquema e indices de produccion
+    app.extensions['mail'].suppress = True  # flask-mail arma el mensaje pero no abre conexion SMTP
+    codigos = {}
+
+    @email_dispatched.connect_via(app, weak=False)
+    def _guardar_codigo(app, message):  # el codigo de verificacion que el postulante leeria en su correo
+        if coincidencia := re.search(r'>\s*(\d{6})\s*<', message.html or ''): codigos[message.recipients[0]] = coincidencia.group(1)
+    cloudinary_falso()
+    return app, codigos
+
+# 03: respuestas con la forma de la API de Cloudinary, sin red
+def cloudinary_falso():
+    import cloudinary.api, cloudinary.uploader
+    def subir(archivo, **opciones):
+        datos = archivo.read() if hasattr(archivo, 'read') else open(archivo, 'rb').read()
+        public_id = f"{opciones.get('folder', 'postulantes')}/{uuid.uuid4().hex}"
+        return {'public_id': public_id, 'resource_type': opciones.get('resource_type', 'raw'), 'bytes': len(datos),
+                'secure_url': f'https://res.cloudinary.com/benchmark/raw/upload/{public_id}', 'format': '', 'created_at': ''}
+    cloudinary.uploader.upload = subir
+    cloudinary.uploader.upload_large = lambda archivo, chunk_size=None, **opciones: subir(archivo, **opciones)
+    cloudinary.api.delete_resources = lambda ids, **opciones: {'deleted': dict.fromkeys(ids, 'deleted')}
+
+# -- datos sinteticos -- #
+# 01: agrega postulantes (con sus archivos) hasta llegar a `total`; todos comparten contraseña y un blob local
+def sembrar(app, total, archivos_por_postulante, lote=1000):
+    from sqlalchemy import func, insert, select
+    from models import db, Usuario, Postulante, Archivo
+    from almacen import almacen
+    import contrasenas
+    from estadisticas import contadores
+    with app.app_context():
+        existentes = db.session.scalar(select(func.count()).where(Usuario.email.like('postulante%@bench.test')))  # sin los de `postular`
+        if not db.session.scalar(select(Usuario.id).where(Usuario.email == 'admin@bench.test')):
+            db.session.add(Usuario(email='admin@bench.test', password_hash=contrasenas.hashear(PASSWORD), tipo='admin', verificado=True))
+            db.session.commit()
+        password_hash = contrasenas.hashear(PASSWORD)  # un solo hash: sembrar no mide el costo del hash
+        sha256, tamano, _ = almacen.guardar(io.BytesIO(b'%PDF-1.4 benchmark\n' * 512))
+        aleatorio, ahora = random.Random(existentes), datetime.utcnow()
+        for inicio in range(existentes, total, lote):
+            indices = range(inicio, min(inicio + lote, total))
+            db.session.execute(insert(Usuario), [{'email': f'postulante{i}@bench.test', 'password_hash': password_hash, 'tipo': 'postulante',
+                                                  'verificado': True, 'fecha_creacion': ahora} for i in indices])
+            ids = dict(db.session.execute(select(Usuario.email, Usuario.id).where(Usuario.email.in_([f'postulante{i}@bench.test' for i in indices]))).all())
+            db.session.execute(insert(Postulante), [{
+                'usuario_id': ids[f'postulante{i}@bench.test'], 'nombres': aleatorio.choice(NOMBRES), 'apellidos': aleatorio.choice(APELLIDOS),
+                'fecha_nacimiento': date(2000, 1, 1) + timedelta(days=aleatorio.randrange(3650)), 'dni': str(10000000 + i),
+                'estado': aleatorio.choice(ESTADOS), 'fecha_registro': ahora - timedelta(minutes=aleatorio.randrange(90 * 24 * 60))} for i in indices])
+            db.session.execute(insert(Archivo), [{
+                'usuario_id': ids[f'postulante{i}@bench.test'], 'nombre_original': f'documento{j}.{ext}', 'nombre_guardado': f'{uuid.uuid4()}.{ext}',
+                'extension': ext, 'mime_type': 'application/octet-stream', 'ruta': almacen.ruta_de(sha256), 'tamano': tamano,
+                'fecha_subida': ahora - timedelta(minutes=aleatorio.randrange(90 * 24 * 60)), 'sha256': sha256, 'backend': 'local',
+                'clave': almacen.clave_de(sha256)} for i in indices for j in range(archivos_por_postulante) for ext in [aleatorio.choice(EXTENSIONES)]])
+            db.session.commit()
+        contadores.invalidar()  # los insert masivos no pasan por los eventos de sesion
+        return dict(db.session.execute(select(Usuario.email, Usuario.id).where(Usuario.email.in_(['admin@bench.test', 'postulante0@bench.test']))).all())
+
+# -- medicion -- #
+# 01: sentencias SQL de la peticion, tal como las informa metricas.py
+def consultas_de(cabeceras):
+    coincidencia = re.search(r'sql;dur=[\d.]+;desc="(\d+)"', cabeceras.get('Server-Timing', ''))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+# 02: resumen de una serie de peticiones
+def resumir(escenario, tamano, latencias, consultas, errores, transcurrido):
+    latencias = sorted(latencias)
+    cortes = statistics.quantiles(latencias, n=100, method='inclusive') if len(latencias) > 1 else latencias * 99
+    consultas = [c for c in consultas if c is not None]
+    return {'tamano': tamano, 'escenario': escenario, 'peticiones': len(latencias), 'errores': errores,
+            'rps': len(latencias) / transcurrido if transcurrido else 0.0,
+            'p50_ms': cortes[49] * 1000, 'p95_ms': cortes[94] * 1000, 'p99_ms': cortes[98] * 1000,
+            'consultas_media': statistics.fmean(consultas) if consultas else None, 'consultas_max': max(consultas, default=None)}
+
+# -- cliente de pruebas -- #
+# 01: cada escenario prepara la peticion i (cliente, sesion, formulario) fuera de la medicion
+def escenarios_cliente(app, ids, tamano, n, codigos):
+    cliente = app.test_client()
+    ronda = uuid.uuid4().hex[:6]  # correos nuevos en cada tamaño
+    postulante = lambda i: random.randrange(tamano)
+
+    def como(usuario_id, tipo):
+        with cliente.session_transaction() as sesion:
+            sesion.clear(); sesion.update(user_id=usuario_id, tipo_usuario=tipo)
+
+    def postular(i):
+        return app.test_client(), 'POST', '/postular', {'data': {'nombres': 'Ana', 'apellidos': 'Quispe', 'fecha_nacimiento': '2001-05-04', 'dni': f'{i % 100000000:08d}',
+                                              'correo': f'nuevo{i}-{ronda}@bench.test', 'password': PASSWORD, 'password_confirm': PASSWORD}}
+
+    def verify(i):
+        correo = f'nuevo{i}-{ronda}@bench.test'
+        return app.test_client(), 'POST', '/verify', {'data': {'correo': correo, 'codigo': codigos.get(correo, '000000')}}
+
+    def login(i):
+        return app.test_client(), 'POST', '/login', {'data': {'correo': f'postulante{postulante(i)}@bench.test', 'password': PASSWORD}}
+
+    def subir_archivo(i):
+        como(ids['postulante0@bench.test'], 'postulante')
+        return cliente, 'POST', '/subir_archivo', {'data': {'archivo': (io.BytesIO(os.urandom(64 * 1024)), f'escaneo{i}.docx')}, 'content_type': 'multipart/form-data'}
+
+    def mis_archivos(i):
+        como(ids['postulante0@bench.test'], 'postulante')
+        return cliente, 'GET', '/mis_archivos', {}
+
+    def admin_usuarios(i):
+        como(ids['admin@bench.test'], 'admin')
+        return cliente, 'GET', '/admin/usuarios?' + ['', 'estado=pendiente', f'dni={10000000 + postulante(i)}', 'email=postulante1'][i % 4], {}
+
+    def admin_archivos(i):
+        como(ids['admin@bench.test'], 'admin')
+        return cliente, 'GET', '/admin/archivos?' + ['', 'extension=pdf', 'usuario=postulante1'][i % 3], {}
+
+    escenarios = dict(postular=postular, verify=verify, login=login, subir_archivo=subir_archivo, mis_archivos=mis_archivos,
+                      admin_usuarios=admin_usuarios, admin_archivos=admin_archivos)
+    for nombre, preparar in escenarios.items():
+        latencias, consultas, errores, transcurrido = [], [], 0, 0.0
+        for i in range(n):
+            navegador, metodo, url, opciones = preparar(i)
+            inicio = time.perf_counter()
+            respuesta = navegador.open(url, method=metodo, **opciones)
+            latencias.append(duracion := time.perf_counter() - inicio); transcurrido += duracion
+            if respuesta.status_code != ESPERADO.get(nombre, 200): errores += 1
+            consultas.append(consultas_de(respuesta.headers))
+        yield resumir(nombre, tamano, latencias, consultas, errores, transcurrido)
+
+# -- http contra gunicorn -- #
+# 01: levanta gunicorn con la base sembrada y espera a que acepte conexiones
+def iniciar_gunicorn(workers):
+    with socket.socket() as s: s.bind(('127.0.0.1', 0)); puerto = s.getsockname()[1]
+    proceso = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(RAIZ, 'gunicorn.conf.py'),
+                                '-w', str(workers), '-b', f'127.0.0.1:{puerto}', '--chdir', RAIZ],
+                               env=dict(os.environ, WEB_CONCURRENCY=str(workers)), stdout=subprocess.DEVNULL)
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        try:
+            with socket.create_connection(('127.0.0.1', puerto), timeout=1): return proceso, f'http://127.0.0.1:{puerto}'
+        except OSError: time.sleep(0.2)
+    proceso.kill(); raise RuntimeError('gunicorn no arranco en 60 segundos')
+
+# 02: cookies propias y sin seguir redirecciones: cada peticion medida es una sola ida y vuelta
+class SinRedireccion(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs): return None  # urllib entrega el 302 como HTTPError
+
+def navegador_http():
+    return build_opener(HTTPCookieProcessor(CookieJar()), SinRedireccion())
+
+def pedir(navegador, url, datos=None):
+    try:
+        with navegador.open(url, urlencode(datos).encode() if datos else None) as respuesta:
+            respuesta.read(); return respuesta.status, respuesta.headers
+    except HTTPError as e:
+        return e.code, e.headers
+
+# 03: una sesion http logueada como `correo`
+def sesion_http(base, correo):
+    navegador = navegador_http()
+    pedir(navegador, base + '/login', {'correo': correo, 'password': PASSWORD})
+    return navegador
+
+# 04: `concurrencia` hilos repiten el escenario durante `segundos`
+def escenario_http(base, nombre, tamano, concurrencia, segundos):
+    latencias, consultas, errores = [], [], [0]
+    candado = threading.Lock()
+
+    def trabajar(hilo):
+        aleatorio = random.Random(hilo)
+        correo = 'admin@bench.test' if nombre.startswith('admin') else f'postulante{aleatorio.randrange(tamano)}@bench.test'
+        navegador = None if nombre == 'login' else sesion_http(base, correo)
+        url = {'mis_archivos': '/mis_archivos', 'admin_usuarios': '/admin/usuarios', 'admin_archivos': '/admin/archivos'}.get(nombre)
+        fin = time.monotonic() + segundos
+        while time.monotonic() < fin:
+            if nombre == 'login': navegador, datos = navegador_http(), {'correo': f'postulante{aleatorio.randrange(tamano)}@bench.test', 'password': PASSWORD}
+            else: datos = None
+            inicio = time.perf_counter()
+            estado, cabeceras = pedir(navegador, base + (url or '/login'), datos)
+            duracion = time.perf_counter() - inicio
+            with candado:
+                latencias.append(duracion); consultas.append(consultas_de(cabeceras))
+                if estado != ESPERADO.get(nombre, 200): errores[0] += 1
+
+    hilos = [threading.Thread(target=trabajar, args=(h,)) for h in range(concurrencia)]
+    inicio = time.perf_counter()
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    return resumir(nombre, tamano, latencias, consultas, errores[0], time.perf_counter() - inicio)
+
+# -- comparacion -- #
+# 01: regresiones contra una corrida anterior: p95 peor que la tolerancia o mas consultas por peticion
+def comparar(base, actuales, tolerancia):
+    anteriores = {(r['tamano'], r['escenario']): r for r in base['resultados']}
+    regresiones = []
+    for r in actuales:
+        if not (a := anteriores.get((r['tamano'], r['escenario']))): continue
+        if r['p95_ms'] > a['p95_ms'] * (1 + tolerancia):
+            regresiones.append(f"{r['escenario']} N={r['tamano']}: p95 {a['p95_ms']:.1f} -> {r['p95_ms']:.1f} ms")
+        if (r['consultas_media'] or 0) > (a['consultas_media'] or 0) + 0.01:
+            regresiones.append(f"{r['escenario']} N={r['tamano']}: consultas {a['consultas_media']:.1f} -> {r['consultas_media']:.1f}")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento y consultas por peticion de las rutas principales')
+    parser.add_argument('--tamanos', nargs='+', type=int, default=[100, 1000, 10000], help='postulantes sembrados en cada paso')
+    parser.add_argument('--archivos', type=int, default=2, help='archivos por postulante')
+    parser.add_argument('--peticiones', type=int, default=200, help='peticiones por escenario (modo cliente)')
+    parser.add_argument('--modo', choices=['cliente', 'http'], default='cliente')
+    parser.add_argument('--workers', type=int, default=2, help='workers de gunicorn (modo http)')
+    parser.add_argument('--concurrencia', type=int, default=8, help='hilos del generador de carga (modo http)')
+    parser.add_argument('--segundos', type=float, default=10.0, help='duracion de cada escenario (modo http)')
+    parser.add_argument('--almacenamiento', choices=['local', 'cloudinary'], default='local')
+    parser.add_argument('--hash', help='PASSWORD_HASH_METHOD para login y registro (por defecto el de la app)')
+    parser.add_argument('--json', help='guarda los resultados en este archivo')
+    parser.add_argument('--comparar', help='resultados anteriores (json); sale con codigo 1 si hay regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='aumento de p95 tolerado al comparar')
+    parser.add_argument('--conservar', action='store_true', help='no borra la carpeta temporal con la base sembrada')
+    args = parser.parse_args()
+
+    carpeta = tempfile.mkdtemp(prefix='benchmark-rutas-')
+    preparar_entorno(carpeta, args)
+    app, codigos = cargar_app()
+    resultados = []
+    print(f"{'N':>7} {'escenario':<16}{'peticiones':>11}{'errores':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL/req':>9}")
+    try:
+        for tamano in sorted(args.tamanos):
+            inicio = time.perf_counter()
+            ids = sembrar(app, tamano, args.archivos)
+            print(f'# {tamano} postulantes sembrados en {time.perf_counter() - inicio:.1f} s', file=sys.stderr)
+            if args.modo == 'cliente':
+                filas = escenarios_cliente(app, ids, tamano, args.peticiones, codigos)
+            else:
+                proceso, base = iniciar_gunicorn(args.workers)
+                try: filas = [escenario_http(base, nombre, tamano, args.concurrencia, args.segundos) for nombre in ESCENARIOS_HTTP]
+                finally: proceso.terminate(); proceso.wait()
+            for r in filas:
+                resultados.append(r)
+                print(f"{r['tamano']:>7} {r['escenario']:<16}{r['peticiones']:>11}{r['errores']:>8}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}"
+                      f"{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['consultas_media'] or 0:>9.1f}")
+    finally:
+        if not args.conservar: shutil.rmtree(carpeta, ignore_errors=True)
+
+    salida = {'fecha': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(), 'modo': args.modo,
+              'parametros': {k: v for k, v in vars(args).items() if k not in ('json', 'comparar', 'conservar')}, 'resultados': resultados}
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(salida, f, indent=2)
+    if args.comparar:
+        with open(args.comparar) as f: regresiones = comparar(json.load(f), resultados, args.tolerancia)
+        for linea in regresiones: print('REGRESION', linea)
+        if regresiones: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# -- Busqueda de postulantes y archivos -- #
+# Por nombres, apellidos, dni, correo y nombre de archivo, sin distinguir tildes ni mayusculas y con
+# cada palabra como prefijo ('jose qui' encuentra a José Quispe). Usa el indice que crea la migracion
+# 0008: FTS5 en sqlite, trigramas (pg_trgm + unaccent) en postgres. Sin el indice recurre a prefijos
+# sobre los indices normales (dni y correo).
+# 01: imports
+import re, unicodedata
+import click
+from sqlalchemy import func, inspect, literal, or_, select, text
+from sqlalchemy.orm import contains_eager
+from models import db, Usuario, Postulante, Archivo
+from paginacion import filtro_prefijo
+
+LIMITE_POR_DEFECTO = 10
+LIMITE_MAXIMO = 50
+MINIMO_CARACTERES = 2  # una sola letra coincide con demasiadas filas para autocompletar
+
+_motores = {}  # url de la base -> 'fts5' | 'trigramas' | 'prefijos'
+
+# 02: flask busqueda reindexar
+def init_app(app):
+    @app.cli.group('busqueda')
+    def grupo():
+        """Indice de busqueda de postulantes y archivos"""
+
+    @grupo.command('reindexar')
+    def _reindexar():
+        """Crea o reconstruye el indice y sus triggers"""
+        click.echo(f'indice {reindexar()} reconstruido')
+
+# -- texto -- #
+# 01: palabras de la consulta, en minusculas y sin tildes ('Peña  Ñahui' -> ['pena', 'nahui'])
+def terminos(consulta):
+    sin_tildes = ''.join(c for c in unicodedata.normalize('NFKD', consulta or '') if not unicodedata.combining(c))
+    return re.findall(r'[^\W_]+', sin_tildes.lower())[:8]  # mas palabras no afinan un autocompletado
+
+# 02: motor disponible en esta base, resuelto una vez por proceso
+def motor():
+    clave = str(db.engine.url)
+    if clave not in _motores:
+        tablas = set(inspect(db.engine).get_table_names())
+        _motores[clave] = 'fts5' if 'postulantes_fts' in tablas else 'trigramas' if 'busqueda_postulantes' in tablas else 'prefijos'
+    return _motores[clave]
+
+# -- consultas -- #
+# 01: ids de postulantes ordenados por relevancia
+def _ids_postulantes(palabras, limite):
+    if motor() == 'fts5':
+        consulta = ' '.join(f'"{p}"*' for p in palabras)  # AND implicito; * usa los indices de prefijo
+        return db.session.scalars(text('SELECT rowid FROM postulantes_fts WHERE postulantes_fts MATCH :q ORDER BY rank LIMIT :limite'),
+                                  {'q': consulta, 'limite': limite}).all()
+    if motor() == 'trigramas':
+        indice = db.Table('busqueda_postulantes', db.MetaData(), db.Column('postulante_id', db.Integer), db.Column('texto', db.Text))
+        return db.session.scalars(select(indice.c.postulante_id)
+                                  .where(*[indice.c.texto.like('%' + p + '%') for p in palabras])
+                                  .order_by(func.similarity(indice.c.texto, ' '.join(palabras)).desc()).limit(limite)).all()
+    primera = palabras[0]
+    condiciones = [filtro_prefijo(Usuario.email, primera)]
+    if primera.isdigit(): condiciones.append(filtro_prefijo(Postulante.dni, primera))
+    return db.session.scalars(select(Postulante.id).join(Usuario).where(or_(*condiciones)).limit(limite)).all()
+
+# 02: ids de archivos ordenados por relevancia
+def _ids_archivos(palabras, limite):
+    if motor() == 'fts5':
+        consulta = ' '.join(f'"{p}"*' for p in palabras)
+        return db.session.scalars(text('SELECT rowid FROM archivos_fts WHERE archivos_fts MATCH :q ORDER BY rank LIMIT :limite'),
+                                  {'q': consulta, 'limite': limite}).all()
+    if motor() == 'trigramas':
+        nombre = func.f_unaccent(func.lower(Archivo.nombre_original))  # la misma expresion del indice gin
+        return db.session.scalars(select(Archivo.id).where(*[nombre.like('%' + p + '%') for p in palabras])
+                                  .order_by(func.similarity(nombre, literal(' '.join(palabras))).desc()).limit(limite)).all()
+    return db.session.scalars(select(Archivo.id).join(Usuario).where(filtro_prefijo(Usuario.email, palabras[0]))
+                              .order_by(Archivo.id.desc()).limit(limite)).all()
+
+# 03: filas completas en el orden de relevancia (una consulta mas con el usuario en el mismo join)
+def _en_orden(ids, modelo):
+    if not ids: return []
+    filas = {f.id: f for f in modelo.query.join(Usuario).options(contains_eager(modelo.usuario)).filter(modelo.id.in_(ids))}
+    return [filas[i] for i in ids if i in filas]
+
+# 04: busqueda para el autocompletado del panel admin
+def buscar(consulta, tipo='todo', limite=LIMITE_POR_DEFECTO):
+    """Devuelve {'postulantes': [...], 'archivos': [...]} con objetos del ORM"""
+    palabras = terminos(consulta)
+    resultado = {'postulantes': [], 'archivos': []}
+    if not palabras or sum(map(len, palabras)) < MINIMO_CARACTERES: return resultado
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    if tipo in ('todo', 'postulantes'): resultado['postulantes'] = _en_orden(_ids_postulantes(palabras, limite), Postulante)
+    if tipo in ('todo', 'archivos'): resultado['archivos'] = _en_orden(_ids_archivos(palabras, limite), Archivo)
+    return resultado
+
+# -- mantenimiento -- #
+# 01: vuelve a crear tablas, triggers y contenido del indice (p. ej. tras restaurar una copia sin el)
+def reindexar():
+    from migraciones import SQLITE_BUSQUEDA, POSTGRES_BUSQUEDA
+    sentencias = SQLITE_BUSQUEDA if db.engine.dialect.name == 'sqlite' else POSTGRES_BUSQUEDA
+    with db.engine.begin() as con:
+        for sentencia in sentencias: con.exec_driver_sql(sentencia)
+    _motores.clear()
+    return 'fts5' if db.engine.dialect.name == 'sqlite' else 'trigramas'
@@ -0,0 +1,149 @@
+# -- Importacion y exportacion masiva de postulantes -- #
+# 01: imports
+import csv, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import islice
+import click
+from flask import current_app
+from sqlalchemy import insert, select
+from werkzeug.security import generate_password_hash
+from models import db, Usuario, Postulante, Archivo
+import contrasenas
+from estadisticas import contadores
+
+CAMPOS = ['nombres', 'apellidos', 'fecha_nacimiento', 'correo', 'dni', 'password']
+
+# -- lectura -- #
+# 01: itera (numero de linea, fila) de un csv o jsonl sin cargar el archivo completo. Una linea jsonl que no
+# se puede leer sale como el JSONDecodeError, para que validar_fila la cuente como invalida
+def leer_filas(archivo, formato):
+    if formato == 'jsonl':
+        for numero, linea in enumerate(archivo, start=1):
+            if not linea.strip(): continue
+            try: yield numero, json.loads(linea)
+            except json.JSONDecodeError as e: yield numero, e
+    else:
+        lector = csv.DictReader(archivo)
+        for fila in lector: yield lector.line_num, fila
+
+# 02: limpia y valida una fila; devuelve (datos, error)
+def validar_fila(fila, validar_dni):
+    if isinstance(fila, json.JSONDecodeError): return None, f'JSON invalido: {fila.msg} (columna {fila.colno})'
+    if not isinstance(fila, dict): return None, 'se esperaba un objeto JSON'
+    datos = {k: str(fila.get(k) or '').strip() for k in CAMPOS}
+    datos['correo'] = (datos['correo'] or str(fila.get('email') or '').strip()).lower()  # acepta 'email' como alias
+    faltantes = [k for k in CAMPOS if not datos[k]]
+    if faltantes: return None, f"faltan campos: {', '.join(faltantes)}"
+    if not validar_dni(datos['dni']): return None, 'el DNI debe tener 8 dígitos'
+    try: datos['fecha_nacimiento'] = datetime.strptime(datos['fecha_nacimiento'], '%Y-%m-%d').date()
+    except ValueError: return None, 'fecha_nacimiento debe ser YYYY-MM-DD'
+    return datos, None
+
+# -- importacion -- #
+# 01: inserta un lote ya validado con dos executemany (usuarios y postulantes)
+def insertar_lote(lote, hashes, verificados):
+    db.session.execute(insert(Usuario), [
+        {'email': d['correo'], 'password_hash': h, 'tipo': 'postulante', 'verificado': verificados}
+        for d, h in zip(lote, hashes)])
+    ids = dict(db.session.execute(select(Usuario.email, Usuario.id).where(Usuario.email.in_([d['correo'] for d in lote]))).all())
+    db.session.execute(insert(Postulante), [
+        {'usuario_id': ids[d['correo']], 'nombres': d['nombres'], 'apellidos': d['apellidos'],
+         'fecha_nacimiento': d['fecha_nacimiento'], 'dni': d['dni'], 'estado': 'pendiente'}
+        for d in lote])
+    db.session.commit()
+
+# 02: recorre la entrada por lotes: valida, descarta duplicados, hashea en paralelo e inserta
+def importar(archivo, formato, tamano_lote, procesos, verificados, validar_dni, errores=sys.stderr):
+    procesos = procesos or os.cpu_count() or 1
+    vistos = set()  # correos ya procesados en este archivo
+    resumen = {'insertados': 0, 'duplicados': 0, 'invalidos': 0}
+    hashear = partial(generate_password_hash, method=contrasenas.metodo_actual())
+    filas = leer_filas(archivo, formato)
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        while bloque := list(islice(filas, tamano_lote)):
+            lote = []
+            for numero, fila in bloque:
+                datos, error = validar_fila(fila, validar_dni)
+                if error:
+                    resumen['invalidos'] += 1; print(f'linea {numero}: {error}', file=errores); continue
+                if datos['correo'] in vistos: resumen['duplicados'] += 1; continue
+                vistos.add(datos['correo']); lote.append(datos)
+            existentes = set(db.session.scalars(select(Usuario.email).where(Usuario.email.in_([d['correo'] for d in lote])))) if lote else set()
+            resumen['duplicados'] += len(existentes)
+            lote = [d for d in lote if d['correo'] not in existentes]
+            if not lote: continue
+            hashes = list(pool.map(hashear, [d['password'] for d in lote], chunksize=max(1, len(lote) // (procesos * 4))))
+            insertar_lote(lote, hashes, verificados)
+            resumen['insertados'] += len(lote)
+    if resumen['insertados']: contadores.invalidar()  # los INSERT masivos no pasan por los eventos de sesion
+    return resumen
+
+# -- exportacion -- #
+# 01: postulantes y archivos ordenados por usuario, leidos por bloques y unidos en memoria de a uno
+def iterar_postulantes(tamano_bloque=1000):
+    postulantes = db.session.execute(
+        select(Postulante, Usuario.email, Usuario.verificado).join(Usuario, Usuario.id == Postulante.usuario_id)
+        .order_by(Postulante.usuario_id).execution_options(yield_per=tamano_bloque))
+    archivos = iter(db.session.execute(
+        select(Archivo.usuario_id, Archivo.nombre_original, Archivo.extension, Archivo.tamano, Archivo.fecha_subida)
+        .order_by(Archivo.usuario_id, Archivo.id).execution_options(yield_per=tamano_bloque)))
+    siguiente = next(archivos, None)
+    for postulante, email, verificado in postulantes:
+        propios = []
+        while siguiente is not None and siguiente.usuario_id <= postulante.usuario_id:
+            if siguiente.usuario_id == postulante.usuario_id: propios.append(siguiente)
+            siguiente = next(archivos, None)
+        yield postulante, email, verificado, propios
+
+# 02: escribe csv (archivos resumidos) o jsonl (archivos detallados)
+def exportar(salida, formato, tamano_bloque=1000):
+    total = 0
+    escritor = None
+    for p, email, verificado, archivos in iterar_postulantes(tamano_bloque):
+        fila = {'id': p.id, 'correo': email, 'nombres': p.nombres, 'apellidos': p.apellidos, 'dni': p.dni,
+                'fecha_nacimiento': p.fecha_nacimiento.isoformat(), 'estado': p.estado, 'verificado': bool(verificado),
+                'fecha_registro': p.fecha_registro.isoformat() if p.fecha_registro else None}
+        if formato == 'jsonl':
+            fila['archivos'] = [{'nombre': a.nombre_original, 'extension': a.extension, 'tamano': a.tamano,
+                                 'fecha_subida': a.fecha_subida.isoformat() if a.fecha_subida else None} for a in archivos]
+            salida.write(json.dumps(fila, ensure_ascii=False) + '\n')
+        else:
+            fila.update(archivos=len(archivos), bytes_archivos=sum(a.tamano for a in archivos),
+                        nombres_archivos='|'.join(a.nombre_original for a in archivos))
+            if escritor is None:
+                escritor = csv.DictWriter(salida, fieldnames=list(fila)); escritor.writeheader()
+            escritor.writerow(fila)
+        total += 1
+    return total
+
+# -- comandos -- #
+# 01: flask postulantes importar | exportar
+def registrar_comandos(app, validar_dni):
+    @app.cli.group('postulantes')
+    def grupo():
+        """Carga y descarga masiva de postulantes"""
+
+    @grupo.command('importar')
+    @click.argument('archivo', type=click.File('r', encoding='utf-8-sig'))
+    @click.option('--formato', type=click.Choice(['csv', 'jsonl']), default=None, help='por defecto segun la extension')
+    @click.option('--lote', default=1000, show_default=True, help='filas por transaccion')
+    @click.option('--procesos', default=None, type=int, help='procesos para hashear (por defecto, nucleos)')
+    @click.option('--verificados/--no-verificados', default=True, show_default=True, help='marca los correos como verificados')
+    def _importar(archivo, formato, lote, procesos, verificados):
+        """Importa postulantes desde CSV o JSONL (nombres, apellidos, fecha_nacimiento, correo, dni, password)"""
+        formato = formato or ('jsonl' if archivo.name.endswith('.jsonl') else 'csv')
+        resumen = importar(archivo, formato, lote, procesos, verificados, validar_dni)
+        click.echo(json.dumps(resumen))
+        if resumen['insertados']:
+            click.echo('contadores del panel invalidados: los workers de este servidor los recalculan en la proxima lectura '
+                       f"(otros servidores, en hasta ESTADISTICAS_RECONCILIAR={current_app.config['ESTADISTICAS_RECONCILIAR']} s)", err=True)
+
+    @grupo.command('exportar')
+    @click.argument('salida', type=click.File('w', encoding='utf-8'), default='-')
+    @click.option('--formato', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+    def _exportar(salida, formato):
+        """Exporta postulantes, estado y metadatos de sus archivos"""
+        total = exportar(salida, formato)
+        click.echo(f'{total} postulantes exportados', err=True)
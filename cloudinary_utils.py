@@ -1,14 +1,12 @@
 # -- configuracion de Cloudinary -- #
-# 01: imports y configuracion del servicio
+# 01: imports y configuracion del servicio. almacenamiento.py importa este modulo (y el SDK) recien
+# cuando se usa el backend cloudinary; el .env ya lo cargo crear_app
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 import os
-import tempfile
-from datetime import datetime
-from dotenv import load_dotenv  # para cargar variables de entorno
-
-load_dotenv()  # carga las variables del archivo .env
+from subidas import ArchivoDemasiadoGrande, LectorLimitado, tamano_stream
+from metricas import metricas  # tiempo en llamadas a cloudinary (si METRICAS=True)
 
 # configura cloudinary con las credenciales
 cloudinary.config(
@@ -18,54 +16,74 @@ cloudinary.config(
     secure=True  # usa https
 )
 
+# archivos mas grandes que esto se suben por partes de este tamaño. cloudinary rechaza partes de menos de 5MB,
+# asi que con MAX_CONTENT_LENGTH (5MB) las subidas de la app van siempre en una sola llamada a upload(stream)
+MINIMO_PARTE = 5*1024*1024
+TAMANO_PARTE = max(int(os.environ.get('CLOUDINARY_CHUNK_SIZE', 20*1024*1024)), MINIMO_PARTE)
+
 # -- funciones para manejo de archivos en cloudinary -- #
-# 01: sube un archivo a cloudinary
-def upload_to_cloudinary(file_obj, folder="postulantes", resource_type="auto"):
+# 01: sube el stream de la peticion directo a cloudinary, sin pasar por disco
+def upload_stream_to_cloudinary(file_obj, folder="postulantes", resource_type="auto", max_bytes=None, chunk_size=None):
+    """Sube un FileStorage leyendo su stream; lanza ArchivoDemasiadoGrande si supera max_bytes"""
+    chunk_size = max(chunk_size or TAMANO_PARTE, MINIMO_PARTE)
+    tamano = tamano_stream(file_obj.stream)
+    if max_bytes and tamano is not None and tamano > max_bytes:
+        raise ArchivoDemasiadoGrande(f'El archivo supera {max_bytes} bytes')  # corta antes de enviar nada
+    stream = LectorLimitado(file_obj.stream, max_bytes) if max_bytes else file_obj.stream
+    opciones = dict(folder=folder, resource_type=resource_type, filename=file_obj.filename, **_opciones_subida())
     try:
-        # crea un archivo temporal para subir
-        temp_path = os.path.join(
-            tempfile.gettempdir(),
-            f"{datetime.now().timestamp()}_{file_obj.filename}"  # nombre unico con timestamp
-        )
-        file_obj.save(temp_path)  # guarda el archivo en disco temporal
-
-        # sube el archivo a cloudinary
-        result = cloudinary.uploader.upload(
-            temp_path,
-            folder=folder,  # carpeta donde se guardara
-            resource_type=resource_type,  # tipo de recurso (imagen, video, etc)
-            use_filename=True,  # usa el nombre original
-            unique_filename=True,  # asegura que sea unico
-            overwrite=False,  # no sobreescribe
-            quality="auto:good",  # calidad automatica
-            fetch_format="auto"  # formato optimo
-        )
-
-        os.remove(temp_path)  # elimina el archivo temporal
-
-        # retorna los datos importantes
-        return {
-            'success': True,
-            'public_id': result['public_id'],  # identificador unico en cloudinary
-            'secure_url': result['secure_url'],  # url para acceder al archivo
-            'format': result['format'],  # formato del archivo
-            'bytes': result['bytes'],  # tamaño en bytes
-            'resource_type': result['resource_type']  # tipo de recurso
-        }
-
+        with metricas.medir('cloudinary', 'subir'):
+            if tamano is not None and tamano > chunk_size:
+                result = cloudinary.uploader.upload_large(stream, chunk_size=chunk_size, **opciones)  # subida por partes
+            else:
+                result = cloudinary.uploader.upload(stream, **opciones)
+        return _resultado(result)
+    except ArchivoDemasiadoGrande:
+        raise
     except Exception as e:
-        # si hay error, retorna falso con el mensaje
         return {'success': False, 'error': str(e)}
 
+# 01b: opciones comunes de subida
+def _opciones_subida():
+    return dict(
+        use_filename=True,  # usa el nombre original
+        unique_filename=True,  # asegura que sea unico
+        overwrite=False,  # no sobreescribe
+        quality="auto:good",  # calidad automatica
+        fetch_format="auto"  # formato optimo
+    )
+
+# 01c: retorna los datos importantes de la respuesta
+def _resultado(result):
+    return {
+        'success': True,
+        'public_id': result['public_id'],  # identificador unico en cloudinary
+        'secure_url': result['secure_url'],  # url para acceder al archivo
+        'format': result['format'],  # formato del archivo
+        'bytes': result['bytes'],  # tamaño en bytes
+        'resource_type': result['resource_type']  # tipo de recurso
+    }
+
 # 02: elimina archivo de cloudinary
 def delete_from_cloudinary(public_id):
     """Elimina archivo de Cloudinary"""
     try:
-        result = cloudinary.uploader.destroy(public_id)  # elimina usando public_id
+        with metricas.medir('cloudinary', 'eliminar'):
+            result = cloudinary.uploader.destroy(public_id)  # elimina usando public_id
         return {'success': True, 'result': result}
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
+# 02b: eliminacion como tarea en segundo plano (lanza excepcion para que se reintente); la registra almacenamiento.py
+def tarea_eliminar_cloudinary(public_id, resource_type='image'):
+    try:
+        with metricas.medir('cloudinary', 'eliminar'):
+            result = cloudinary.uploader.destroy(public_id, resource_type=resource_type)
+    except Exception as e:
+        raise RuntimeError(f'No se pudo eliminar {public_id}: {e}')
+    if result.get('result') not in ('ok', 'not found'):  # 'not found' ya esta borrado, no se reintenta
+        raise RuntimeError(f'Cloudinary respondio {result} para {public_id}')
+
 # 03: genera url segura con opciones
 def get_secure_url(public_id, **options):
     """Genera URL segura con opciones de transformación"""
@@ -0,0 +1,44 @@
+# -- Configuracion de la base de datos -- #
+# 01: imports
+import os
+from sqlalchemy import event
+from models import db
+
+# 02: url desde DATABASE_URL; sin ella usa el sqlite local de siempre
+def url_base_de_datos(base_dir):
+    url = os.getenv('DATABASE_URL') or f"sqlite:///{os.path.join(base_dir, 'instance', 'app.db')}"
+    if url.startswith('postgres://'): url = 'postgresql://' + url[len('postgres://'):]  # formato que entrega heroku
+    return url
+
+# 03: opciones del pool segun el motor
+def opciones_motor(url):
+    if url.startswith('sqlite'):
+        # flask-sqlalchemy ya usa StaticPool para ':memory:'; aqui solo la espera por bloqueos del driver
+        return {'connect_args': {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)) / 1000}}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),  # conexiones fijas por worker de gunicorn
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),  # conexiones extra en picos
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),  # segundos esperando una conexion libre
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),  # renueva antes de que el servidor corte conexiones ociosas
+        'pool_pre_ping': True,  # descarta conexiones muertas antes de usarlas
+    }
+
+# 04: pragmas por conexion para sqlite (WAL permite leer mientras otro worker escribe)
+def _pragmas_sqlite(dbapi_con, registro):
+    cursor = dbapi_con.cursor()
+    memoria = cursor.execute('PRAGMA database_list').fetchone()[2] == ''  # ruta vacia = base en memoria
+    if not memoria: cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')  # seguro con WAL y mucho mas rapido que FULL
+    cursor.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))}")
+    cursor.execute(f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}")
+    cursor.close()
+
+# 05: configura y vincula SQLAlchemy con la app
+def init_db(app, base_dir):
+    """Configura la conexion a la base de datos para la aplicacion flask"""
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', url_base_de_datos(base_dir))
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', opciones_motor(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite': event.listen(db.engine, 'connect', _pragmas_sqlite)
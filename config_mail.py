@@ -1,10 +1,10 @@
 # -- Configuracion del sistema de correo -- #
 # 01: imports y setup inicial de flask-mail
 import os
-from dotenv import load_dotenv  # para manejar variables de entorno
-from flask_mail import Mail  # extension de flask para enviar correos
+from flask_mail import Mail, Message  # extension de flask para enviar correos
+from tareas import cola  # cola de tareas en segundo plano
+from metricas import metricas  # tiempo en SMTP (si METRICAS=True)
 
-load_dotenv()  # carga las variables del archivo .env
 mail = Mail()  # crea una instancia de Mail
 
 # 02: funcion para configurar el correo en la app
@@ -21,4 +21,12 @@ def init_mail(app):
     # remitente por defecto
     app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
     # inicializa la extension con la app
-    mail.init_app(app)  # vincula mail con la aplicacion flask
\ No newline at end of file
+    mail.init_app(app)  # vincula mail con la aplicacion flask
+
+# 03: envio de correo como tarea en segundo plano (se reintenta si el SMTP falla)
+@cola.tarea('correo.enviar')
+def enviar_correo(destinatarios, asunto, html):
+    """Envia un correo html; cualquier excepcion hace que la cola lo reintente"""
+    msg = Message(asunto, recipients=destinatarios)
+    msg.html = html
+    with metricas.medir('smtp', 'enviar'): mail.send(msg)
@@ -0,0 +1,74 @@
+# -- Hash de contraseñas configurable -- #
+# 01: imports y configuracion
+import os, threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TiempoAgotado
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+METODO_POR_DEFECTO = 'scrypt:32768:8:1'  # el mismo que usa werkzeug por defecto
+
+class ServicioOcupado(Exception):
+    """El pool de hash de este proceso esta lleno o no respondio a tiempo"""
+
+_politica = {'metodo': os.environ.get('PASSWORD_HASH_METHOD', METODO_POR_DEFECTO), 'timeout': 10.0}
+_pool = None
+_cupos = None  # hashes en curso o en espera admitidos por este proceso
+
+# 02: lee PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS, PASSWORD_HASH_COLA y PASSWORD_HASH_TIMEOUT de la app.
+# Cada worker de gunicorn tiene su pool: por defecto se reparten los nucleos entre WEB_CONCURRENCY procesos
+# para que entre todos no corran mas hashes a la vez que nucleos hay
+def init_app(app):
+    global _pool, _cupos
+    metodo = app.config.setdefault('PASSWORD_HASH_METHOD', os.environ.get('PASSWORD_HASH_METHOD', METODO_POR_DEFECTO))
+    _politica['metodo'] = normalizar_metodo(metodo)  # falla al arrancar si el metodo no es valido
+    _politica['timeout'] = app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10.0)
+    por_proceso = max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)))
+    workers = app.config.setdefault('PASSWORD_HASH_WORKERS', int(os.environ.get('PASSWORD_HASH_WORKERS', por_proceso)))
+    cola = app.config.setdefault('PASSWORD_HASH_COLA', int(os.environ.get('PASSWORD_HASH_COLA', 2 * workers)))  # hashes esperando turno
+    _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hash')  # hashlib libera el GIL mientras calcula
+    _cupos = threading.BoundedSemaphore(workers + cola)
+
+# -- politica -- #
+# 01: completa los parametros por defecto ('scrypt' -> 'scrypt:32768:8:1') para poder comparar
+def normalizar_metodo(metodo):
+    nombre, *args = metodo.split(':')
+    if nombre == 'scrypt':
+        return 'scrypt:' + ':'.join(args if args else ['32768', '8', '1'])
+    if nombre == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iteraciones = args[1] if len(args) > 1 else str(DEFAULT_PBKDF2_ITERATIONS)
+        return f'pbkdf2:{hash_name}:{iteraciones}'
+    raise ValueError(f'Metodo de hash no soportado: {metodo}')
+
+# 02: metodo vigente, ya normalizado
+def metodo_actual():
+    return normalizar_metodo(_politica['metodo'])
+
+# 03: metodo con el que se genero un hash guardado
+def metodo_de(password_hash):
+    return password_hash.split('$', 1)[0]
+
+# 04: True si el hash guardado no sigue la politica actual
+def necesita_rehash(password_hash):
+    try: return normalizar_metodo(metodo_de(password_hash)) != metodo_actual()
+    except ValueError: return True
+
+# -- operaciones -- #
+# 01: ejecuta en el pool; sin pool (scripts) corre en el hilo actual. Si el pool y su cola estan llenos
+# rechaza en el acto (503) en vez de esperar. El cupo se libera cuando el hash termina de verdad: un hash
+# ya iniciado no se puede cancelar y sigue ocupando un nucleo aunque quien lo pidio deje de esperar
+def _en_pool(funcion, *args):
+    if _pool is None: return funcion(*args)
+    if not _cupos.acquire(blocking=False): raise ServicioOcupado('Demasiadas verificaciones de contraseña en curso')
+    futuro = _pool.submit(funcion, *args)
+    futuro.add_done_callback(lambda _: _cupos.release())  # tambien corre si se cancela antes de empezar
+    try: return futuro.result(timeout=_politica['timeout'])
+    except TiempoAgotado:
+        futuro.cancel(); raise ServicioOcupado('Demasiadas verificaciones de contraseña en curso')
+
+# 02: hash con la politica actual (o un metodo explicito)
+def hashear(password, metodo=None):
+    return _en_pool(generate_password_hash, password, metodo or _politica['metodo'])
+
+# 03: compara contra el hash guardado fuera del hilo de la peticion
+def verificar(password_hash, password):
+    return _en_pool(check_password_hash, password_hash, password)
@@ -4,11 +4,12 @@ import os
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))  # añade ruta actual al path
 
-from app import app, db
-from models import Usuario
-from werkzeug.security import generate_password_hash
+from app import crear_app
+from models import db, Usuario
+import contrasenas
 
 def crear_admin():
+    app = crear_app()  # las tablas las crea `flask --app app db migrar`
     with app.app_context():  # contexto de la app para acceder a db
         print("\n" + "="*50)
         print("CREACIÓN DE USUARIO ADMINISTRADOR")
@@ -35,7 +36,7 @@ def crear_admin():
             # crea usuario admin
             admin = Usuario(
                 email=email,
-                password_hash=generate_password_hash(password),
+                password_hash=contrasenas.hashear(password),  # usa PASSWORD_HASH_METHOD
                 tipo='admin',
                 verificado=True  # admin no necesita verificacion
             )
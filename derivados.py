@@ -0,0 +1,191 @@
+# -- Miniaturas y vistas previas -- #
+# WebP de tamaño fijo para imagenes y para la primera pagina de los PDF. Se generan en la cola de
+# tareas (fuera de la peticion) y se guardan en disco con un tope de tamaño (se borran las menos usadas).
+# Requiere Pillow; los PDF ademas pypdfium2 (ambos en requirements.txt). Sin ellos no hay derivados, las vistas
+# muestran el enlace y init_app lo avisa en el log. Se importan recien al renderizar (en la cola), no al arrancar.
+# 01: imports
+import functools, hashlib, importlib.util, io, logging, os, threading, time, uuid
+import click
+from flask import abort, current_app, request, url_for
+from sqlalchemy import select
+from werkzeug.utils import send_file
+from models import db, Archivo
+from almacenamiento import almacenamiento, EXTENSIONES_IMAGEN
+from tareas import cola
+
+log = logging.getLogger(__name__)
+
+TAMANOS = {'mini': 240, 'vista': 800}  # lado mayor en px (mini se muestra a 120px, x2 para pantallas densas)
+MAX_PIXELES = 40_000_000  # tope de pixeles a decodificar (~120MB en RGB); las imagenes mayores se quedan sin derivado
+PENDIENTE = ('<svg xmlns="http://www.w3.org/2000/svg" width="120" height="120"><rect width="100%" height="100%" fill="#2a2d3a"/>'
+             '<text x="50%" y="50%" fill="#a6a8b3" font-size="12" text-anchor="middle">Generando…</text></svg>')
+
+# 02: True si hay con que generar derivados para esta extension
+def soporta(extension):
+    if not _instalado('PIL'): return False
+    return extension in EXTENSIONES_IMAGEN or (extension == 'pdf' and _instalado('pypdfium2'))
+
+# 03: la libreria esta instalada; find_spec la ubica sin importarla
+@functools.cache
+def _instalado(modulo):
+    return importlib.util.find_spec(modulo) is not None
+
+class DerivadoImposible(Exception):
+    """El archivo no admite derivado (demasiado grande); no se reintenta"""
+
+# -- render -- #
+# 01: abre la imagen (o renderiza la primera pagina del PDF) a un tamaño cercano al pedido.
+# `origen` es una ruta local o los bytes del archivo
+def _imagen(origen, extension, lado):
+    from PIL import Image, ImageOps
+    if extension == 'pdf':
+        import pypdfium2 as pdfium
+        documento = pdfium.PdfDocument(origen)
+        try:
+            pagina = documento[0]
+            try: return pagina.render(scale=lado / max(pagina.get_size())).to_pil()  # el bitmap no depende de la pagina
+            finally: pagina.close()
+        finally: documento.close()  # libera la memoria de pdfium sin esperar al recolector
+    try: imagen = Image.open(origen if isinstance(origen, str) else io.BytesIO(origen))  # solo lee la cabecera
+    except Image.DecompressionBombError as e: raise DerivadoImposible(str(e))
+    with imagen:
+        imagen.draft('RGB', (lado, lado))  # jpeg: decodifica ya reducido, mucho mas rapido
+        if imagen.width * imagen.height > MAX_PIXELES:
+            raise DerivadoImposible(f'{imagen.width}x{imagen.height} supera {MAX_PIXELES} pixeles')
+        return ImageOps.exif_transpose(imagen)  # copia decodificada; el archivo se cierra al salir
+
+# 02: webp de `lado` px como maximo, sin agrandar
+def renderizar(origen, extension, lado):
+    imagen = _imagen(origen, extension, lado)
+    imagen.thumbnail((lado, lado))
+    if imagen.mode not in ('RGB', 'RGBA'): imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() else 'RGB')
+    salida = io.BytesIO()
+    imagen.save(salida, 'WEBP', quality=80, method=4)
+    return salida.getvalue()
+
+# -- cache en disco -- #
+class Derivados:
+    """Derivados en <carpeta>/<ab>/<clave>-<tamano>.webp; el mtime marca el ultimo uso"""
+    def __init__(self):
+        self.carpeta = None
+        self.max_bytes = 0
+        self._ocupado = None  # bytes estimados en disco por este proceso
+        self._encolados = {}  # clave -> monotonic, evita encolar lo mismo en cada peticion
+        self._candado = threading.Lock()
+
+    # 02: DERIVADOS_DIR, DERIVADOS_MAX_BYTES y DERIVADOS_MAX_AGE (cache del navegador)
+    def init_app(self, app):
+        self.carpeta = app.config.setdefault('DERIVADOS_DIR', os.environ.get('DERIVADOS_DIR') or os.path.join(app.instance_path, 'derivados'))
+        self.max_bytes = app.config.setdefault('DERIVADOS_MAX_BYTES', int(os.environ.get('DERIVADOS_MAX_BYTES', 256 * 1024 * 1024)))
+        app.config.setdefault('DERIVADOS_MAX_AGE', 86400)
+        os.makedirs(self.carpeta, exist_ok=True)
+        app.extensions['derivados'] = self
+        if not _instalado('PIL'): log.warning('Pillow no esta instalado: no se generan miniaturas ni vistas previas')
+        elif not _instalado('pypdfium2'): log.warning('pypdfium2 no esta instalado: los PDF no tienen vista previa')
+
+        # comandos: flask derivados generar
+        @app.cli.group('derivados')
+        def grupo():
+            """Miniaturas y vistas previas"""
+
+        @grupo.command('generar')
+        def _generar():
+            """Encola los derivados de todos los archivos que los admiten"""
+            total = 0
+            for archivo_id, extension in db.session.execute(select(Archivo.id, Archivo.extension)):
+                if soporta(extension): cola.encolar('derivados.generar', archivo_id=archivo_id); total += 1
+            click.echo(f'{total} archivos encolados')
+
+    soporta = staticmethod(soporta)
+
+    # 03: identifica el contenido: el sha256 del blob local o el backend y la clave
+    @staticmethod
+    def clave(archivo):
+        return archivo.sha256 or hashlib.sha256(f'{archivo.backend}:{archivo.clave}'.encode()).hexdigest()
+
+    def ruta(self, clave, tamano):
+        return os.path.join(self.carpeta, clave[:2], f'{clave}-{tamano}.webp')
+
+    # -- uso desde las rutas -- #
+    # 01: url de la ruta de derivados, None si no se puede generar
+    def url(self, archivo, tamano='mini'):
+        return url_for('vista_previa', file_id=archivo.id, tamano=tamano) if soporta(archivo.extension) else None
+
+    # 02: envia el derivado cacheado; si no existe lo encola y responde un marcador sin cache
+    def enviar(self, archivo, tamano):
+        if tamano not in TAMANOS or not soporta(archivo.extension): abort(404)
+        clave = self.clave(archivo)
+        ruta = self.ruta(clave, tamano)
+        try: os.utime(ruta)  # ultimo uso para el LRU
+        except FileNotFoundError:
+            self.programar(archivo.id, clave)
+            return current_app.response_class(PENDIENTE, mimetype='image/svg+xml', headers={'Cache-Control': 'no-store'})
+        respuesta = send_file(ruta, request.environ, mimetype='image/webp', conditional=True,
+                              etag=f'{clave[:32]}-{tamano}', response_class=current_app.response_class)
+        respuesta.cache_control.no_cache = None
+        respuesta.cache_control.private = True  # solo el navegador del usuario; el contenido no cambia para la misma url
+        respuesta.cache_control.max_age = current_app.config['DERIVADOS_MAX_AGE']
+        return respuesta
+
+    # 03: encola la generacion como mucho una vez por minuto por clave en este proceso
+    def programar(self, archivo_id, clave):
+        ahora = time.monotonic()
+        with self._candado:
+            if ahora - self._encolados.get(clave, float('-inf')) < 60: return
+            self._encolados[clave] = ahora
+            if len(self._encolados) > 10000: self._encolados.clear()
+        cola.encolar('derivados.generar', archivo_id=archivo_id)
+
+    # -- generacion -- #
+    # 01: genera todos los tamaños que falten para un archivo (en un worker de la cola). Los blobs locales se
+    # leen desde su ruta; los remotos se traen a memoria con el mismo tope que una subida
+    def generar(self, archivo):
+        clave = self.clave(archivo)
+        faltantes = {t: lado for t, lado in TAMANOS.items() if not os.path.exists(self.ruta(clave, t))}
+        if not faltantes: return 0
+        backend = almacenamiento.de(archivo.backend)
+        if not (origen := backend.ruta_local(archivo.clave)):
+            limite = current_app.config['MAX_CONTENT_LENGTH']
+            with backend.abrir(archivo.clave) as f: origen = f.read(limite + 1)
+            if len(origen) > limite: raise DerivadoImposible(f'el archivo supera {limite} bytes')
+        escritos = 0
+        for tamano, lado in faltantes.items():
+            escritos += self._guardar(self.ruta(clave, tamano), renderizar(origen, archivo.extension, lado))
+        self._recortar(escritos)
+        return len(faltantes)
+
+    # 02: escritura atomica; devuelve los bytes escritos
+    def _guardar(self, ruta, contenido):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f'{ruta}.{uuid.uuid4().hex}.parcial'
+        with open(temporal, 'wb') as f: f.write(contenido)
+        os.replace(temporal, ruta)
+        return len(contenido)
+
+    # 03: si se paso del tope, borra los menos usados hasta quedar en el 90%
+    def _recortar(self, nuevos):
+        with self._candado:
+            if self._ocupado is None: self._ocupado = sum(e.stat().st_size for e in self._entradas())
+            else: self._ocupado += nuevos
+            if self._ocupado <= self.max_bytes: return
+            entradas = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in self._entradas())
+            self._ocupado = sum(tamano for _, tamano, _ in entradas)  # recalcula: otros procesos tambien escriben
+            for _, tamano, ruta in entradas:
+                if self._ocupado <= self.max_bytes * 0.9: break
+                try: os.remove(ruta); self._ocupado -= tamano
+                except FileNotFoundError: pass
+
+    def _entradas(self):
+        for sub in os.scandir(self.carpeta):
+            if sub.is_dir():
+                for e in os.scandir(sub.path):
+                    if e.name.endswith('.webp'): yield e
+
+derivados = Derivados()
+
+# 01: un archivo sin derivado posible se registra y no se reintenta; la vista sigue mostrando el enlace
+@cola.tarea('derivados.generar')
+def tarea_generar(archivo_id):
+    if not (archivo := db.session.get(Archivo, archivo_id)): return
+    try: derivados.generar(archivo)
+    except DerivadoImposible as e: log.warning('Archivo %s sin derivados: %s', archivo_id, e)
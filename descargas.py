@@ -0,0 +1,56 @@
+# -- Descarga de archivos -- #
+# 01: imports
+import hashlib, os
+from urllib.parse import quote
+from flask import abort, current_app, redirect, request
+from werkzeug.utils import send_file
+from almacenamiento import almacenamiento
+
+# 02: DESCARGAS_OFFLOAD ('', 'x-accel' o 'x-sendfile'), prefijo interno de nginx y cache del navegador
+def init_app(app, carpeta):
+    app.config.setdefault('DESCARGAS_CARPETA', carpeta)
+    app.config.setdefault('DESCARGAS_OFFLOAD', os.environ.get('DESCARGAS_OFFLOAD', ''))
+    app.config.setdefault('DESCARGAS_ACCEL_PREFIJO', os.environ.get('DESCARGAS_ACCEL_PREFIJO', '/_uploads/'))  # location internal de nginx
+    app.config.setdefault('DESCARGAS_MAX_AGE', int(os.environ.get('DESCARGAS_MAX_AGE', 0)))  # 0 = el navegador revalida siempre
+
+# -- cabeceras -- #
+# 01: ETag a partir de los metadatos guardados; no toca el disco ni la red
+def etag_archivo(archivo):
+    firma = f'{archivo.id}:{archivo.backend}:{archivo.clave}:{archivo.tamano}:{archivo.fecha_subida}'
+    return hashlib.sha256(firma.encode()).hexdigest()[:32]
+
+# 02: cache solo en el navegador del usuario (nunca en proxies compartidos)
+def _cache_privada(respuesta, etag):
+    respuesta.set_etag(etag)
+    max_age = current_app.config['DESCARGAS_MAX_AGE']
+    respuesta.cache_control.public = None
+    respuesta.cache_control.private = True
+    respuesta.cache_control.no_cache = None if max_age else True
+    respuesta.cache_control.max_age = max_age
+    respuesta.expires = None
+    respuesta.headers['X-Content-Type-Options'] = 'nosniff'
+    return respuesta
+
+# -- envio -- #
+# 01: punto unico para descargar un Archivo, de cualquier backend
+def enviar_archivo(archivo, adjunto=True):
+    etag = etag_archivo(archivo)
+    if request.if_none_match.contains_weak(etag):  # el navegador ya tiene esta version
+        return _cache_privada(current_app.response_class(status=304), etag)
+    backend = almacenamiento.de(archivo.backend)
+    if url := backend.url_directa(archivo.clave, archivo.nombre_original, adjunto):  # cloudinary o s3 sirven rangos desde su CDN
+        return _cache_privada(redirect(url), etag)
+    ruta = backend.ruta_local(archivo.clave)
+    if not os.path.isfile(ruta): abort(404)
+
+    modo = current_app.config['DESCARGAS_OFFLOAD']
+    relativa = os.path.relpath(ruta, current_app.config['DESCARGAS_CARPETA'])
+    delegar = modo == 'x-sendfile' or (modo == 'x-accel' and not relativa.startswith('..'))
+    # sin delegar, werkzeug atiende If-None-Match, If-Range y Range (206) leyendo el archivo por bloques
+    respuesta = send_file(ruta, request.environ, as_attachment=adjunto, download_name=archivo.nombre_original,
+                          conditional=not delegar, etag=etag, last_modified=archivo.fecha_subida,
+                          use_x_sendfile=delegar, response_class=current_app.response_class)
+    if delegar and modo == 'x-accel':  # nginx sirve el archivo (y los rangos) y libera al worker
+        del respuesta.headers['X-Sendfile']
+        respuesta.headers['X-Accel-Redirect'] = current_app.config['DESCARGAS_ACCEL_PREFIJO'].rstrip('/') + '/' + quote(relativa.replace(os.sep, '/'))
+    return _cache_privada(respuesta, etag)
@@ -0,0 +1,98 @@
+# -- Contadores del panel de administracion -- #
+# 01: imports
+import copy, os, threading, time
+from collections import Counter
+from sqlalchemy import event, func, inspect
+from models import db, Usuario, Postulante, Archivo
+
+ESTADOS = ('pendiente', 'aprobado', 'rechazado')
+
+# -- cache de contadores -- #
+# 01: contadores en memoria que se actualizan con los eventos de sesion
+class ContadoresAdmin:
+    """Cache por proceso; se reconcilia con COUNT(*) reales cada `intervalo` segundos o cuando otro proceso
+    del mismo servidor toca la marca (importacion por cli, cambio de estado masivo en otro worker)"""
+    def __init__(self):
+        self._datos = None
+        self._reconciliado = 0.0
+        self._candado = threading.Lock()
+        self.intervalo = 300
+        self.marca = None
+
+    # 02: toma la configuracion y conecta los eventos de sesion
+    def init_app(self, app, session):
+        self.intervalo = app.config.setdefault('ESTADISTICAS_RECONCILIAR', 300)
+        self.marca = app.config.setdefault('ESTADISTICAS_MARCA', os.environ.get('ESTADISTICAS_MARCA') or os.path.join(app.instance_path, 'estadisticas.marca'))
+        event.listen(session, 'after_flush', self._acumular)
+        event.listen(session, 'after_commit', self._aplicar)
+        event.listen(session, 'after_soft_rollback', lambda s, t: s.info.pop('deltas_estadisticas', None))
+        app.extensions['estadisticas'] = self
+
+    # -- lectura -- #
+    # 01: devuelve una copia, reconciliando si el cache esta vacio o viejo
+    def leer(self):
+        if self._datos is None or time.time() - self._reconciliado > self.intervalo or self._marcada(): self.reconciliar()
+        with self._candado: return copy.deepcopy(self._datos)
+
+    # 02: recalcula todo contra la base de datos
+    def reconciliar(self):
+        inicio = time.time()  # una marca tocada durante los COUNT vuelve a reconciliar en la proxima lectura
+        archivos, bytes_ = db.session.query(func.count(Archivo.id), func.coalesce(func.sum(Archivo.tamano), 0)).one()
+        datos = {
+            'usuarios': Usuario.query.filter_by(tipo='postulante').count(),
+            'archivos': archivos,
+            'bytes_archivos': int(bytes_),
+            'postulantes': dict.fromkeys(ESTADOS, 0),
+        }
+        for estado, total in db.session.query(Postulante.estado, func.count(Postulante.id)).group_by(Postulante.estado):
+            datos['postulantes'][estado or 'pendiente'] = datos['postulantes'].get(estado or 'pendiente', 0) + total
+        with self._candado:
+            self._datos, self._reconciliado = datos, inicio
+        return datos
+
+    # 03: fuerza la reconciliacion en la proxima lectura (tras UPDATE/DELETE/INSERT masivos) en este proceso
+    # y, por la marca, en los demas procesos del servidor
+    def invalidar(self):
+        with self._candado: self._datos = None
+        if self.marca:
+            os.makedirs(os.path.dirname(self.marca), exist_ok=True)
+            with open(self.marca, 'a'): os.utime(self.marca)
+
+    def _marcada(self):
+        try: return self.marca is not None and os.stat(self.marca).st_mtime > self._reconciliado
+        except FileNotFoundError: return False
+
+    # -- eventos -- #
+    # 01: junta los cambios de cada flush en la sesion hasta el commit
+    def _acumular(self, session, contexto):
+        deltas = session.info.setdefault('deltas_estadisticas', Counter())
+        for obj, signo in [(o, 1) for o in session.new] + [(o, -1) for o in session.deleted]:
+            if isinstance(obj, Usuario) and (obj.tipo or 'postulante') == 'postulante': deltas['usuarios'] += signo
+            elif isinstance(obj, Archivo): deltas['archivos'] += signo; deltas['bytes_archivos'] += signo * (obj.tamano or 0)
+            elif isinstance(obj, Postulante): deltas['estado:' + (obj.estado or 'pendiente')] += signo
+        for obj in session.dirty:
+            if isinstance(obj, Postulante):
+                historial = inspect(obj).attrs.estado.history
+                if historial.added and historial.deleted:
+                    deltas['estado:' + historial.deleted[0]] -= 1; deltas['estado:' + historial.added[0]] += 1
+                elif historial.added: deltas['reconciliar'] = 1  # se asigno sin cargar (objeto expirado): no hay valor anterior
+            elif isinstance(obj, Archivo):
+                historial = inspect(obj).attrs.tamano.history
+                if historial.added and historial.deleted: deltas['bytes_archivos'] += historial.added[0] - historial.deleted[0]
+                elif historial.added: deltas['reconciliar'] = 1
+
+    # 02: aplica lo acumulado solo si la transaccion se confirmo
+    def _aplicar(self, session):
+        deltas = session.info.pop('deltas_estadisticas', None)
+        if not deltas: return
+        with self._candado:
+            if deltas.pop('reconciliar', 0): self._datos = None
+            if self._datos is None: return  # se calculara completo en la proxima lectura
+            for clave, valor in deltas.items():
+                if clave.startswith('estado:'):
+                    estado = clave.split(':', 1)[1]
+                    self._datos['postulantes'][estado] = self._datos['postulantes'].get(estado, 0) + valor
+                else:
+                    self._datos[clave] += valor
+
+contadores = ContadoresAdmin()  # instancia compartida, se vincula en app.py
@@ -0,0 +1,94 @@
+# -- Archivos estaticos con huella -- #
+# Al arrancar se calcula el sha256 de cada archivo de static/ y url_for('static', ...) pasa a devolver
+# 'css/styles.<hash>.css'. Esas urls no cambian mientras no cambie el contenido, asi que se sirven con
+# un año de cache e `immutable`. Los archivos de texto se comprimen una vez con gzip (y brotli si esta
+# instalado) y se envia la variante que acepte el navegador.
+# 01: imports
+import gzip, hashlib, mimetypes, os, uuid
+from flask import current_app, request
+from werkzeug.utils import send_file
+
+try: import brotli  # opcional: pip install brotli
+except ImportError: brotli = None
+
+UN_ANO = 365 * 24 * 3600
+COMPRIMIBLES = {'.css', '.js', '.svg', '.json', '.txt', '.map', '.ico', '.html'}
+
+# 02: 'css/styles.css' + '3f2a9c1d4b5e' -> 'css/styles.3f2a9c1d4b5e.css'
+def con_huella(nombre, huella):
+    base, extension = os.path.splitext(nombre)
+    return f'{base}.{huella}{extension}'
+
+# -- manifiesto -- #
+class Estaticos:
+    def __init__(self):
+        self.huellas = {}  # original -> con huella
+        self.originales = {}  # con huella -> original
+        self.variantes = {}  # con huella -> {'br', 'gzip'}
+        self.carpeta = None
+
+    # 02: ESTATICOS_HUELLAS (desactivar al editar css/js en vivo) y ESTATICOS_DIR (comprimidos)
+    def init_app(self, app):
+        app.config.setdefault('ESTATICOS_HUELLAS', os.environ.get('ESTATICOS_HUELLAS', 'True') == 'True')
+        self.carpeta = app.config.setdefault('ESTATICOS_DIR', os.environ.get('ESTATICOS_DIR') or os.path.join(app.instance_path, 'estaticos'))
+        app.extensions['estaticos'] = self
+        if not app.config['ESTATICOS_HUELLAS'] or not app.static_folder: return
+        self.preparar(app.static_folder)
+
+        @app.url_defaults
+        def _huella(endpoint, valores):
+            if endpoint == 'static' and (nombre := self.huellas.get(valores.get('filename'))): valores['filename'] = nombre
+
+        app.view_functions['static'] = self.servir
+
+    # 03: calcula las huellas y genera los comprimidos que falten (el nombre incluye la huella: nunca quedan viejos)
+    def preparar(self, raiz):
+        os.makedirs(self.carpeta, exist_ok=True)
+        for directorio, _, archivos in os.walk(raiz):
+            for archivo in archivos:
+                ruta = os.path.join(directorio, archivo)
+                original = os.path.relpath(ruta, raiz).replace(os.sep, '/')
+                with open(ruta, 'rb') as f: datos = f.read()
+                nombre = con_huella(original, hashlib.sha256(datos).hexdigest()[:12])
+                self.huellas[original], self.originales[nombre] = nombre, original
+                if os.path.splitext(archivo)[1].lower() in COMPRIMIBLES: self.variantes[nombre] = self._comprimir(nombre, datos)
+
+    # 04: guarda <nombre>.gz y <nombre>.br solo si ahorran al menos un 10%
+    def _comprimir(self, nombre, datos):
+        variantes = set()
+        for codificacion, sufijo, comprimir in [('gzip', '.gz', lambda d: gzip.compress(d, 9, mtime=0)),
+                                                ('br', '.br', brotli and (lambda d: brotli.compress(d, quality=11)))]:
+            if comprimir is None: continue
+            destino = self.ruta_comprimida(nombre, sufijo)
+            if not os.path.exists(destino):
+                contenido = comprimir(datos)
+                if len(contenido) > len(datos) * 0.9: continue
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                temporal = f'{destino}.{uuid.uuid4().hex}.parcial'  # varios workers pueden arrancar a la vez
+                with open(temporal, 'wb') as f: f.write(contenido)
+                os.replace(temporal, destino)
+            variantes.add(codificacion)
+        return variantes
+
+    def ruta_comprimida(self, nombre, sufijo):
+        return os.path.join(self.carpeta, *nombre.split('/')) + sufijo
+
+    # -- envio -- #
+    # 01: reemplaza la vista 'static'; las urls sin huella siguen funcionando con la cache corta de siempre
+    def servir(self, filename):
+        original = self.originales.get(filename)
+        if original is None: return current_app.send_static_file(filename)
+        ruta, codificacion = os.path.join(current_app.static_folder, *original.split('/')), None
+        for candidata, sufijo in [('br', '.br'), ('gzip', '.gz')]:
+            if candidata in self.variantes.get(filename, ()) and request.accept_encodings[candidata]:
+                ruta, codificacion = self.ruta_comprimida(filename, sufijo), candidata; break
+        respuesta = send_file(ruta, request.environ, mimetype=mimetypes.guess_type(original)[0] or 'application/octet-stream',
+                              conditional=True, etag=f"{filename}-{codificacion or 'id'}", max_age=UN_ANO,
+                              response_class=current_app.response_class)
+        if codificacion: respuesta.headers['Content-Encoding'] = codificacion
+        if self.variantes.get(filename): respuesta.vary.add('Accept-Encoding')
+        respuesta.cache_control.public = True
+        respuesta.cache_control.immutable = True
+        return respuesta
+
+estaticos = Estaticos()
@@ -0,0 +1,69 @@
+# -- Cache de fragmentos de plantillas -- #
+# {% cache 'fila_postulante', postulante.id, postulante.fecha_actualizacion %} ... {% endcache %}
+# guarda el html del bloque en memoria del proceso. El primer argumento y el segundo identifican el
+# fragmento; el resto es su version: si cambia (p. ej. fecha_actualizacion al cambiar el estado) el
+# bloque se vuelve a renderizar, asi que ningun worker sirve html viejo aunque no se entere del cambio.
+# 01: imports
+import os, threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+# -- cache -- #
+# 01: LRU (nombre, id) -> (version, html); una sola version por fragmento
+class CacheFragmentos:
+    def __init__(self, maximo=5000):
+        self.maximo = maximo
+        self.activo = True
+        self.aciertos = self.fallos = 0
+        self._datos = OrderedDict()
+        self._candado = threading.Lock()
+
+    # 02: FRAGMENTOS_CACHE y FRAGMENTOS_MAX (fragmentos por worker); registra la etiqueta {% cache %}
+    def init_app(self, app):
+        self.activo = app.config.setdefault('FRAGMENTOS_CACHE', os.environ.get('FRAGMENTOS_CACHE', 'True') == 'True')
+        self.maximo = app.config.setdefault('FRAGMENTOS_MAX', int(os.environ.get('FRAGMENTOS_MAX', 5000)))
+        app.jinja_env.add_extension(ExtensionCache)
+        app.extensions['fragmentos'] = self
+
+    # 03: devuelve el html cacheado si la version coincide; si no, lo renderiza con `generar`
+    def obtener(self, nombre, id_, version, generar):
+        if not self.activo: return generar()
+        clave = (nombre, id_)
+        with self._candado:
+            entrada = self._datos.get(clave)
+            if entrada is not None and entrada[0] == version:
+                self._datos.move_to_end(clave); self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+        html = generar()  # fuera del candado: otras filas se sirven mientras tanto
+        with self._candado:
+            self._datos[clave] = (version, html)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo: self._datos.popitem(last=False)
+        return html
+
+    def invalidar(self, nombre, id_):
+        with self._candado: self._datos.pop((nombre, id_), None)
+
+    def limpiar(self):
+        with self._candado: self._datos.clear()
+
+fragmentos = CacheFragmentos()
+
+# -- etiqueta de jinja -- #
+# 01: compila el bloque a una llamada que pasa por la cache; el cuerpo solo se evalua en un fallo
+class ExtensionCache(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        argumentos = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'): argumentos.append(parser.parse_expression())
+        if len(argumentos) < 2: parser.fail('cache requiere un nombre y un id', lineno)
+        cuerpo = parser.parse_statements(('name:endcache',), drop_needle=True)
+        llamada = self.call_method('_renderizar', [argumentos[0], argumentos[1], nodes.Tuple(argumentos[2:], 'load')])
+        return nodes.CallBlock(llamada, [], [], cuerpo).set_lineno(lineno)
+
+    def _renderizar(self, nombre, id_, version, caller):
+        return fragmentos.obtener(nombre, id_, version, caller)  # caller() devuelve Markup: no se vuelve a escapar
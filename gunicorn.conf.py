@@ -0,0 +1,17 @@
+# -- Configuracion de gunicorn -- #
+# `gunicorn -c gunicorn.conf.py` (ver Procfile). Con preload la app se importa y se arma una sola vez en el
+# proceso maestro y los workers la heredan al hacer fork: arrancan (y se reinician) sin volver a pagar los
+# imports ni la huella de static/. Lo que no se puede compartir entre procesos se abre despues del fork:
+# las conexiones de la base (ver post_fork) y los hilos de la cola de tareas (primera peticion de cada worker).
+# 01: imports
+import os
+
+wsgi_app = 'app:crear_app()'  # bind y workers: gunicorn ya los toma de PORT y WEB_CONCURRENCY
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'  # False: cada worker importa la app por su cuenta
+
+# 02: el maestro no deberia haber abierto conexiones, pero si lo hizo los workers no pueden compartirlas
+def post_fork(server, worker):
+    if not preload_app: return
+    from models import db
+    with server.app.wsgi().app_context():
+        for engine in db.engines.values(): engine.dispose(close=False)  # descarta el pool heredado sin cerrar los sockets del maestro
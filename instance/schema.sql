@@ -26,6 +26,7 @@ CREATE TABLE IF NOT EXISTS postulantes (
     estado TEXT DEFAULT 'pendiente'
         CHECK (estado IN ('pendiente', 'aprobado', 'rechazado')),
     fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (usuario_id)
         REFERENCES usuarios(id)
         ON DELETE CASCADE
@@ -49,22 +50,118 @@ CREATE TABLE IF NOT EXISTS archivos (
     tamano INTEGER NOT NULL
         CHECK (tamano > 0 AND tamano <= 5242880),
     fecha_subida DATETIME DEFAULT CURRENT_TIMESTAMP,
+    sha256 TEXT,
+    backend TEXT NOT NULL DEFAULT 'local'
+        CHECK (backend IN ('local', 'cloudinary', 's3')),
+    clave TEXT NOT NULL,
     FOREIGN KEY (usuario_id)
         REFERENCES usuarios(id)
         ON DELETE CASCADE
 );
 
+-- =========================
+-- TABLA AUDITORIA_ESTADOS
+-- =========================
+CREATE TABLE IF NOT EXISTS auditoria_estados (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    admin_id INTEGER,
+    estado_nuevo TEXT NOT NULL
+        CHECK (estado_nuevo IN ('pendiente', 'aprobado', 'rechazado')),
+    criterio TEXT NOT NULL,
+    cantidad INTEGER NOT NULL,
+    fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (admin_id)
+        REFERENCES usuarios(id)
+        ON DELETE SET NULL
+);
+
+-- =========================
+-- TABLA CODIGOS_VERIFICACION
+-- =========================
+CREATE TABLE IF NOT EXISTS codigos_verificacion (
+    email TEXT PRIMARY KEY,
+    codigo_hash TEXT NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    expira DATETIME NOT NULL,
+    creado DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
 -- =========================
 -- ÍNDICES
 -- =========================
 CREATE UNIQUE INDEX IF NOT EXISTS idx_usuarios_email
 ON usuarios(email);
 
+CREATE INDEX IF NOT EXISTS idx_usuarios_tipo
+ON usuarios(tipo);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_postulantes_usuario_id
+ON postulantes(usuario_id);
+
 CREATE INDEX IF NOT EXISTS idx_postulantes_estado
 ON postulantes(estado);
 
+CREATE INDEX IF NOT EXISTS idx_postulantes_fecha_id
+ON postulantes(fecha_registro, id);
+
+CREATE INDEX IF NOT EXISTS idx_postulantes_estado_fecha_id
+ON postulantes(estado, fecha_registro, id);
+
+CREATE INDEX IF NOT EXISTS idx_postulantes_dni
+ON postulantes(dni);
+
 CREATE INDEX IF NOT EXISTS idx_archivos_usuario
 ON archivos(usuario_id);
 
+CREATE INDEX IF NOT EXISTS idx_archivos_usuario_fecha
+ON archivos(usuario_id, fecha_subida);
+
+CREATE INDEX IF NOT EXISTS idx_archivos_fecha_id
+ON archivos(fecha_subida, id);
+
+CREATE INDEX IF NOT EXISTS idx_archivos_sha256
+ON archivos(sha256);
+
 CREATE UNIQUE INDEX IF NOT EXISTS idx_archivos_unico
-ON archivos(usuario_id, nombre_guardado);
\ No newline at end of file
+ON archivos(usuario_id, nombre_guardado);
+
+CREATE INDEX IF NOT EXISTS idx_codigos_verificacion_expira
+ON codigos_verificacion(expira);
+
+-- =========================
+-- BÚSQUEDA (FTS5, sin tildes y con prefijos; ver migración 0008)
+-- =========================
+CREATE VIRTUAL TABLE IF NOT EXISTS postulantes_fts USING fts5(nombres, apellidos, dni, email, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4');
+
+CREATE VIRTUAL TABLE IF NOT EXISTS archivos_fts USING fts5(nombre, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4');
+
+CREATE TRIGGER IF NOT EXISTS trg_postulantes_fts_insert AFTER INSERT ON postulantes BEGIN
+        INSERT INTO postulantes_fts (rowid, nombres, apellidos, dni, email)
+        SELECT new.id, new.nombres, new.apellidos, new.dni, email FROM usuarios WHERE id = new.usuario_id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_postulantes_fts_update AFTER UPDATE OF nombres, apellidos, dni, usuario_id ON postulantes BEGIN
+        DELETE FROM postulantes_fts WHERE rowid = old.id;
+        INSERT INTO postulantes_fts (rowid, nombres, apellidos, dni, email)
+        SELECT new.id, new.nombres, new.apellidos, new.dni, email FROM usuarios WHERE id = new.usuario_id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_postulantes_fts_delete AFTER DELETE ON postulantes BEGIN
+        DELETE FROM postulantes_fts WHERE rowid = old.id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_email AFTER UPDATE OF email ON usuarios BEGIN
+        UPDATE postulantes_fts SET email = new.email WHERE rowid IN (SELECT id FROM postulantes WHERE usuario_id = new.id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_archivos_fts_insert AFTER INSERT ON archivos BEGIN
+        INSERT INTO archivos_fts (rowid, nombre) VALUES (new.id, new.nombre_original);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_archivos_fts_update AFTER UPDATE OF nombre_original ON archivos BEGIN
+        UPDATE archivos_fts SET nombre = new.nombre_original WHERE rowid = new.id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS trg_archivos_fts_delete AFTER DELETE ON archivos BEGIN
+        DELETE FROM archivos_fts WHERE rowid = old.id;
+    END;
@@ -0,0 +1,67 @@
+# -- Limites de frecuencia por IP y por correo -- #
+# 01: imports
+import os, threading, time
+from collections import OrderedDict
+from flask import request
+
+# -- cubetas de fichas -- #
+# 01: una cubeta por clave; se llena de a `capacidad / periodo` fichas por segundo
+class CubetasTokens:
+    """En memoria del proceso; las claves mas antiguas se descartan al superar `maximo`"""
+    def __init__(self, capacidad, periodo, maximo=10000):
+        self.capacidad, self.tasa, self.maximo = float(capacidad), capacidad / periodo, maximo
+        self._cubetas = OrderedDict()  # clave -> (fichas, ultimo_llenado)
+        self._candado = threading.Lock()
+
+    # 02: consume una ficha; devuelve 0 si se permitio o los segundos a esperar
+    def consumir(self, clave):
+        ahora = time.monotonic()
+        with self._candado:
+            fichas, ultimo = self._cubetas.pop(clave, (self.capacidad, ahora))
+            fichas = min(self.capacidad, fichas + (ahora - ultimo) * self.tasa)
+            espera = 0.0 if fichas >= 1 else (1 - fichas) / self.tasa
+            self._cubetas[clave] = (fichas - 1 if not espera else fichas, ahora)
+            while len(self._cubetas) > self.maximo: self._cubetas.popitem(last=False)
+            return espera
+
+    # 03: como consumir, pero sin gastar la ficha
+    def esperar(self, clave):
+        ahora = time.monotonic()
+        with self._candado:
+            fichas, ultimo = self._cubetas.get(clave, (self.capacidad, ahora))
+        fichas = min(self.capacidad, fichas + (ahora - ultimo) * self.tasa)
+        return 0.0 if fichas >= 1 else (1 - fichas) / self.tasa
+
+    def limpiar(self):
+        with self._candado: self._cubetas.clear()
+
+# -- limitador de la app -- #
+# 01: cubetas por ambito ('ip', 'email') configuradas como 'fichas/segundos'
+class Limitador:
+    def __init__(self):
+        self.cubetas = {}
+
+    # 02: LIMITE_IP y LIMITE_EMAIL; el total se reparte entre los workers de gunicorn (WEB_CONCURRENCY)
+    def init_app(self, app):
+        workers = app.config.setdefault('LIMITE_WORKERS', int(os.environ.get('WEB_CONCURRENCY', 1)))
+        for ambito, defecto in [('ip', '30/60'), ('email', '5/300')]:
+            fichas, segundos = app.config.setdefault(f'LIMITE_{ambito.upper()}', os.environ.get(f'LIMITE_{ambito.upper()}', defecto)).split('/')
+            self.cubetas[ambito] = CubetasTokens(max(1.0, float(fichas) / workers), float(segundos))
+        app.extensions['limites'] = self
+
+    # 03: consume en cada ambito indicado; devuelve los segundos a esperar (0 = permitido). Con gastar=False
+    # el correo solo se revisa: login y verify lo gastan con `gastar` cuando el intento falla
+    def excedido(self, gastar=True, **claves):
+        claves.setdefault('ip', request.remote_addr)  # ip real del cliente si PROXY_HOPS esta configurado (ver crear_app)
+        return max((self._cubeta(ambito, clave, gastar or ambito == 'ip') for ambito, clave in claves.items() if clave), default=0.0)
+
+    # 04: gasta una ficha sin revisar (intento fallido)
+    def gastar(self, **claves):
+        for ambito, clave in claves.items():
+            if clave: self._cubeta(ambito, clave, True)
+
+    def _cubeta(self, ambito, clave, gastar):
+        cubetas, clave = self.cubetas[ambito], f'{request.endpoint}:{clave}'
+        return cubetas.consumir(clave) if gastar else cubetas.esperar(clave)
+
+limitador = Limitador()
@@ -0,0 +1,195 @@
+# -- Metricas de peticiones, SQL y servicios externos -- #
+# Opcional (METRICAS=True): latencia por ruta, consultas SQL por peticion, deteccion de N+1 y tiempo
+# en SMTP/Cloudinary, expuestos en /metrics con el formato de texto de Prometheus. Cada worker de
+# gunicorn lleva sus propios contadores (la etiqueta `pid` permite sumarlos).
+# 01: imports
+import cProfile, hmac, logging, os, random, threading, time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from models import db
+from usuario_actual import usuario_actual
+
+log = logging.getLogger(__name__)
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100)
+
+# -- series -- #
+# 01: histograma acumulado por etiquetas (buckets, suma y cantidad)
+class Histograma:
+    def __init__(self, nombre, ayuda, limites):
+        self.nombre, self.ayuda, self.limites = nombre, ayuda, limites
+        self.series = defaultdict(lambda: [[0] * len(limites), 0.0, 0])  # etiquetas -> [buckets, suma, cantidad]
+
+    def observar(self, etiquetas, valor):
+        serie = self.series[etiquetas]
+        indice = bisect_left(self.limites, valor)
+        if indice < len(self.limites): serie[0][indice] += 1
+        serie[1] += valor; serie[2] += 1
+
+    def exportar(self, base):
+        yield f'# HELP {self.nombre} {self.ayuda}'
+        yield f'# TYPE {self.nombre} histogram'
+        for etiquetas, (buckets, suma, cantidad) in sorted(self.series.items()):
+            acumulado = 0
+            for limite, n in zip(self.limites, buckets):
+                acumulado += n
+                yield f'{self.nombre}_bucket{_etiquetas(base + etiquetas + (("le", limite),))} {acumulado}'
+            yield f'{self.nombre}_bucket{_etiquetas(base + etiquetas + (("le", "+Inf"),))} {cantidad}'
+            yield f'{self.nombre}_sum{_etiquetas(base + etiquetas)} {suma}'
+            yield f'{self.nombre}_count{_etiquetas(base + etiquetas)} {cantidad}'
+
+# 02: contador monotono por etiquetas
+class Contador:
+    def __init__(self, nombre, ayuda):
+        self.nombre, self.ayuda = nombre, ayuda
+        self.series = Counter()
+
+    def sumar(self, etiquetas, valor=1):
+        self.series[etiquetas] += valor
+
+    def exportar(self, base):
+        yield f'# HELP {self.nombre} {self.ayuda}'
+        yield f'# TYPE {self.nombre} counter'
+        for etiquetas, valor in sorted(self.series.items()):
+            yield f'{self.nombre}{_etiquetas(base + etiquetas)} {valor}'
+
+# 03: (('endpoint', 'login'), ...) -> {endpoint="login",...}
+def _etiquetas(pares):
+    texto = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pares)
+    return '{' + texto + '}' if texto else ''
+
+# -- registro -- #
+class Metricas:
+    """Registro del proceso; los hooks solo se instalan si METRICAS=True"""
+    def __init__(self):
+        self.activo = False
+        self.umbral_n1 = 5
+        self._candado = threading.Lock()
+        self._perfil_en_curso = threading.Lock()  # cProfile admite un solo perfil activo por proceso
+        self.peticiones = Contador('app_peticiones_total', 'Peticiones atendidas por ruta y codigo')
+        self.latencia = Histograma('app_peticion_segundos', 'Duracion de la peticion por ruta', LIMITES_SEGUNDOS)
+        self.consultas = Histograma('app_sql_consultas_por_peticion', 'Sentencias SQL por peticion', LIMITES_CONSULTAS)
+        self.sql_segundos = Contador('app_sql_segundos_total', 'Tiempo en SQL por ruta')
+        self.repetidas = Contador('app_sql_repetidas_total', 'Peticiones con la misma sentencia repetida (posible N+1)')
+        self.externos = Histograma('app_externo_segundos', 'Llamadas a servicios externos (smtp, cloudinary)', LIMITES_SEGUNDOS)
+        self.externos_errores = Contador('app_externo_errores_total', 'Llamadas a servicios externos que fallaron')
+
+    # 02: METRICAS, METRICAS_TOKEN, METRICAS_N1 y el perfilado por muestreo (METRICAS_PERFIL*)
+    def init_app(self, app):
+        self.activo = app.config.setdefault('METRICAS', os.environ.get('METRICAS') == 'True')
+        app.config.setdefault('METRICAS_TOKEN', os.environ.get('METRICAS_TOKEN'))  # token Bearer para el scraper
+        self.umbral_n1 = app.config.setdefault('METRICAS_N1', int(os.environ.get('METRICAS_N1', 5)))  # repeticiones de una sentencia
+        app.config.setdefault('METRICAS_PERFIL', {r for r in os.environ.get('METRICAS_PERFIL', '').split(',') if r})  # endpoints
+        app.config.setdefault('METRICAS_PERFIL_MUESTREO', float(os.environ.get('METRICAS_PERFIL_MUESTREO', 0.01)))
+        app.config.setdefault('METRICAS_PERFIL_DIR', os.path.join(app.instance_path, 'perfiles'))
+        app.extensions['metricas'] = self
+        if not self.activo: return
+
+        app.before_request(self._iniciar)
+        app.after_request(self._registrar)
+        app.teardown_request(self._cerrar)
+        app.add_url_rule('/metrics', 'metricas', self.exportar)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._antes_sql)
+            event.listen(db.engine, 'after_cursor_execute', self._despues_sql)
+
+    # -- servicios externos -- #
+    # 01: mide un bloque (`with metricas.medir('smtp', 'enviar'):`); sin metricas no hace nada
+    @contextmanager
+    def medir(self, servicio, operacion):
+        if not self.activo:
+            yield; return
+        inicio = time.perf_counter()
+        try: yield
+        except Exception:
+            with self._candado: self.externos_errores.sumar((('servicio', servicio), ('operacion', operacion)))
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            with self._candado: self.externos.observar((('servicio', servicio), ('operacion', operacion)), duracion)
+            if has_request_context() and 'metricas' in g: g.metricas['externo'] += duracion
+
+    # -- peticiones -- #
+    # 01: arranca el reloj y, si toca, el perfilador
+    def _iniciar(self):
+        g.metricas = {'inicio': time.perf_counter(), 'sentencias': Counter(), 'sql': 0.0, 'externo': 0.0}
+        config = current_app.config
+        if request.endpoint in config['METRICAS_PERFIL'] and random.random() < config['METRICAS_PERFIL_MUESTREO']:
+            if self._perfil_en_curso.acquire(blocking=False):
+                g.perfil = cProfile.Profile(); g.perfil.enable()
+
+    # 02: acumula latencia, SQL y repeticiones de la peticion
+    def _registrar(self, respuesta):
+        datos = g.pop('metricas', None)
+        if datos is None: return respuesta
+        duracion = self._anotar(datos, respuesta.status_code)
+        respuesta.headers['Server-Timing'] = (f'app;dur={duracion * 1000:.1f}, sql;dur={datos["sql"] * 1000:.1f};desc="{sum(datos["sentencias"].values())}", '
+                                              f'externo;dur={datos["externo"] * 1000:.1f}')
+        return respuesta
+
+    # 02b: si after_request no llego a correr (la excepcion se propago o fallo otro hook) se anota como 500
+    def _cerrar(self, error=None):
+        if (datos := g.pop('metricas', None)) is not None: self._anotar(datos, 500)
+        self._detener_perfil()
+
+    # 02c: suma la peticion a las series; devuelve su duracion
+    def _anotar(self, datos, codigo):
+        duracion = time.perf_counter() - datos['inicio']
+        ruta = (('endpoint', request.endpoint or 'sin_ruta'),)
+        sentencias = datos['sentencias']
+        repetidas = {s: n for s, n in sentencias.items() if n >= self.umbral_n1}
+        with self._candado:
+            self.peticiones.sumar(ruta + (('codigo', codigo),))
+            self.latencia.observar(ruta, duracion)
+            self.consultas.observar(ruta, sum(sentencias.values()))
+            self.sql_segundos.sumar(ruta, datos['sql'])
+            if repetidas: self.repetidas.sumar(ruta)
+        for sentencia, n in repetidas.items():
+            log.warning('Posible N+1 en %s: %s veces %s', ruta[0][1], n, ' '.join(sentencia.split())[:200])
+        return duracion
+
+    # 03: guarda el perfil como <endpoint>-<ms>-<pid>.prof (se abre con snakeviz o pstats)
+    def _detener_perfil(self):
+        perfil = g.pop('perfil', None)
+        if perfil is None: return
+        try:
+            perfil.disable()
+            carpeta = current_app.config['METRICAS_PERFIL_DIR']
+            os.makedirs(carpeta, exist_ok=True)
+            perfil.dump_stats(os.path.join(carpeta, f'{request.endpoint}-{int(time.time() * 1000)}-{os.getpid()}.prof'))
+        finally:
+            self._perfil_en_curso.release()
+
+    # -- sql -- #
+    # 01: el inicio se guarda en el contexto de ejecucion de cada sentencia: si falla, el contexto se descarta
+    # con el y no queda un inicio viejo en la conexion que se le atribuya a la siguiente
+    def _antes_sql(self, conn, cursor, sentencia, parametros, contexto, executemany):
+        if contexto is not None: contexto.metricas_inicio = time.perf_counter()
+
+    # 02: solo se atribuye a la peticion en curso (las tareas de la cola no tienen contexto de peticion)
+    def _despues_sql(self, conn, cursor, sentencia, parametros, contexto, executemany):
+        if (inicio := getattr(contexto, 'metricas_inicio', None)) is None: return  # sentencias internas del dialecto
+        duracion = time.perf_counter() - inicio
+        if has_request_context() and 'metricas' in g:
+            g.metricas['sentencias'][sentencia] += 1
+            g.metricas['sql'] += duracion
+
+    # -- exportacion -- #
+    # 01: GET /metrics con token Bearer (METRICAS_TOKEN) o sesion de admin
+    def exportar(self):
+        token = current_app.config['METRICAS_TOKEN']
+        autorizado = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+        if not autorizado:
+            usuario = usuario_actual()
+            if not usuario or usuario.tipo != 'admin': return 'no autorizado\n', 403, {'Content-Type': 'text/plain'}
+        base = (('pid', os.getpid()),)
+        with self._candado:
+            lineas = [linea for serie in (self.peticiones, self.latencia, self.consultas, self.sql_segundos,
+                                          self.repetidas, self.externos, self.externos_errores) for linea in serie.exportar(base)]
+        return '\n'.join(lineas) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8', 'Cache-Control': 'no-store'}
+
+metricas = Metricas()
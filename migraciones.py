@@ -0,0 +1,311 @@
+# -- Migraciones versionadas del esquema -- #
+# Se ejecutan aparte del arranque de la app (sqlite puede migrar tambien al arrancar, ver 04 de ejecucion):
+#   python migraciones.py migrar | estado | verificar
+#   flask --app app db migrar | estado | verificar
+# 01: imports
+import logging, os, re, sqlite3, sys
+from datetime import datetime
+import click
+from sqlalchemy import create_engine, desc, func, inspect, select, text, tuple_
+from models import db, Usuario, Postulante, Archivo, CodigoVerificacion
+from config_db import url_base_de_datos, opciones_motor
+
+MIGRACIONES = []  # (version, nombre, funcion) en orden
+
+log = logging.getLogger(__name__)
+
+# 02: registra una migracion; la funcion recibe una conexion dentro de una transaccion
+def migracion(version, nombre):
+    def decorador(f):
+        MIGRACIONES.append((version, nombre, f))
+        return f
+    return decorador
+
+# -- utilidades idempotentes -- #
+# 01: crea un indice si no existe (sqlite y postgres soportan IF NOT EXISTS)
+def crear_indice(con, nombre, tabla, columnas, unico=False):
+    con.execute(text(f"CREATE {'UNIQUE ' if unico else ''}INDEX IF NOT EXISTS {nombre} ON {tabla} ({', '.join(columnas)})"))
+
+# 02: agrega una columna solo si la tabla aun no la tiene
+def agregar_columna(con, tabla, columna, ddl):
+    if columna not in {c['name'] for c in inspect(con).get_columns(tabla)}:
+        con.execute(text(f'ALTER TABLE {tabla} ADD COLUMN {columna} {ddl}'))
+
+# -- migraciones -- #
+@migracion(1, 'esquema_base')
+def _esquema_base(con):
+    db.metadata.create_all(con)  # solo crea las tablas que falten
+
+@migracion(2, 'indices_claves_y_busquedas')
+def _indices(con):
+    crear_indice(con, 'idx_usuarios_tipo', 'usuarios', ['tipo'])
+    crear_indice(con, 'idx_archivos_usuario_fecha', 'archivos', ['usuario_id', 'fecha_subida'])  # mis_archivos y FK
+    crear_indice(con, 'idx_archivos_fecha_id', 'archivos', ['fecha_subida', 'id'])
+    crear_indice(con, 'idx_postulantes_estado_fecha_id', 'postulantes', ['estado', 'fecha_registro', 'id'])  # cubre estado
+    crear_indice(con, 'idx_postulantes_fecha_id', 'postulantes', ['fecha_registro', 'id'])
+    crear_indice(con, 'idx_postulantes_dni', 'postulantes', ['dni'])
+
+@migracion(3, 'postulante_unico_por_usuario')
+def _postulante_unico(con):
+    repetidos = con.execute(text('SELECT usuario_id FROM postulantes GROUP BY usuario_id HAVING COUNT(*) > 1 LIMIT 10')).scalars().all()
+    if repetidos: raise RuntimeError(f'Hay usuarios con mas de un postulante, corrige antes de migrar: {repetidos}')
+    crear_indice(con, 'uq_postulantes_usuario_id', 'postulantes', ['usuario_id'], unico=True)  # tambien indexa la FK
+
+@migracion(4, 'codigos_verificacion')
+def _codigos_verificacion(con):
+    CodigoVerificacion.__table__.create(con, checkfirst=True)  # incluye el indice por expira
+
+@migracion(5, 'archivos_por_contenido')
+def _archivos_por_contenido(con):
+    agregar_columna(con, 'archivos', 'sha256', 'VARCHAR(64)')
+    crear_indice(con, 'idx_archivos_sha256', 'archivos', ['sha256'])
+
+# 01: clave '<resource_type>/<public_id>' a partir de una url de entrega de cloudinary (solo para filas viejas).
+# Si la url no tiene el formato esperado usa el public_id que el codigo anterior guardaba en nombre_guardado;
+# None si tampoco hay eso
+def _clave_cloudinary(url, public_id=None):
+    if coincidencia := re.match(r'https://res\.cloudinary\.com/[^/]+/([a-z]+)/upload/(?:v\d+/)?(.+)$', url):
+        resource_type, public_id = coincidencia.groups()
+        if resource_type != 'raw': public_id = os.path.splitext(public_id)[0]  # en raw la extension es parte del public_id
+        return f'{resource_type}/{public_id}'
+    if not public_id: return None
+    resource_type = re.search(r'/(image|raw|video)/', url)
+    return f"{resource_type.group(1) if resource_type else 'image'}/{public_id}"
+
+# 02: completa backend y clave de las filas que no la tienen; devuelve los ids cuya clave no se pudo deducir
+def _rellenar_claves(con):
+    cambios, dudosos, omitidos = [], [], []
+    for id_, ruta, sha256, guardado in con.execute(text('SELECT id, ruta, sha256, nombre_guardado FROM archivos WHERE clave IS NULL')):
+        if ruta.startswith('https://res.cloudinary.com/'):
+            clave = _clave_cloudinary(ruta)
+            if clave is None and (clave := _clave_cloudinary(ruta, guardado)): dudosos.append(id_)
+            if clave is None: omitidos.append(id_); continue
+            cambios.append({'i': id_, 'b': 'cloudinary', 'c': clave})
+        elif sha256: cambios.append({'i': id_, 'b': 'local', 'c': f'{sha256[:2]}/{sha256[2:4]}/{sha256}'})
+        else: cambios.append({'i': id_, 'b': 'local', 'c': os.path.basename(ruta)})  # uploads/<uuid>.<ext>
+    if cambios: con.execute(text('UPDATE archivos SET backend = :b, clave = :c WHERE id = :i'), cambios)
+    if dudosos: log.warning('archivos con url de cloudinary irreconocible, clave tomada de nombre_guardado: %s', dudosos)
+    if omitidos: log.warning('archivos sin clave (url de cloudinary irreconocible y sin public_id): %s', omitidos)
+    return omitidos
+
+@migracion(6, 'archivos_backend_y_clave')
+def _archivos_backend_y_clave(con):
+    agregar_columna(con, 'archivos', 'backend', "VARCHAR(20) NOT NULL DEFAULT 'local'")
+    agregar_columna(con, 'archivos', 'clave', 'VARCHAR(255)')  # nullable hasta rellenarla; la 0009 la hace obligatoria
+    _rellenar_claves(con)
+
+@migracion(7, 'postulantes_fecha_actualizacion')
+def _postulantes_fecha_actualizacion(con):
+    agregar_columna(con, 'postulantes', 'fecha_actualizacion', 'TIMESTAMP')
+    con.execute(text('UPDATE postulantes SET fecha_actualizacion = COALESCE(fecha_registro, CURRENT_TIMESTAMP) WHERE fecha_actualizacion IS NULL'))
+
+# 08: indice de busqueda: FTS5 en sqlite (sin tildes y con indices de prefijo), trigramas en postgres.
+# Los triggers lo mantienen al dia, incluso con los INSERT/UPDATE masivos que no pasan por el ORM.
+FTS5_TOKENIZER = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4'"
+SQLITE_BUSQUEDA = [
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS postulantes_fts USING fts5(nombres, apellidos, dni, email, {FTS5_TOKENIZER})',
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS archivos_fts USING fts5(nombre, {FTS5_TOKENIZER})',
+    """CREATE TRIGGER IF NOT EXISTS trg_postulantes_fts_insert AFTER INSERT ON postulantes BEGIN
+        INSERT INTO postulantes_fts (rowid, nombres, apellidos, dni, email)
+        SELECT new.id, new.nombres, new.apellidos, new.dni, email FROM usuarios WHERE id = new.usuario_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_postulantes_fts_update AFTER UPDATE OF nombres, apellidos, dni, usuario_id ON postulantes BEGIN
+        DELETE FROM postulantes_fts WHERE rowid = old.id;
+        INSERT INTO postulantes_fts (rowid, nombres, apellidos, dni, email)
+        SELECT new.id, new.nombres, new.apellidos, new.dni, email FROM usuarios WHERE id = new.usuario_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_postulantes_fts_delete AFTER DELETE ON postulantes BEGIN
+        DELETE FROM postulantes_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_email AFTER UPDATE OF email ON usuarios BEGIN
+        UPDATE postulantes_fts SET email = new.email WHERE rowid IN (SELECT id FROM postulantes WHERE usuario_id = new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_archivos_fts_insert AFTER INSERT ON archivos BEGIN
+        INSERT INTO archivos_fts (rowid, nombre) VALUES (new.id, new.nombre_original);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_archivos_fts_update AFTER UPDATE OF nombre_original ON archivos BEGIN
+        UPDATE archivos_fts SET nombre = new.nombre_original WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_archivos_fts_delete AFTER DELETE ON archivos BEGIN
+        DELETE FROM archivos_fts WHERE rowid = old.id;
+    END""",
+    'DELETE FROM postulantes_fts',
+    """INSERT INTO postulantes_fts (rowid, nombres, apellidos, dni, email)
+       SELECT p.id, p.nombres, p.apellidos, p.dni, u.email FROM postulantes p JOIN usuarios u ON u.id = p.usuario_id""",
+    'DELETE FROM archivos_fts',
+    'INSERT INTO archivos_fts (rowid, nombre) SELECT id, nombre_original FROM archivos',
+]
+# unaccent() no es IMMUTABLE y no se puede indexar; f_unaccent fija el diccionario y si lo es
+POSTGRES_BUSQUEDA = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    """CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+       AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$""",
+    """CREATE TABLE IF NOT EXISTS busqueda_postulantes (
+        postulante_id INTEGER PRIMARY KEY REFERENCES postulantes(id) ON DELETE CASCADE,
+        texto TEXT NOT NULL)""",
+    'CREATE INDEX IF NOT EXISTS idx_busqueda_postulantes_texto ON busqueda_postulantes USING gin (texto gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS idx_archivos_nombre_trgm ON archivos USING gin (f_unaccent(lower(nombre_original)) gin_trgm_ops)',
+    """CREATE OR REPLACE FUNCTION busqueda_postulantes_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO busqueda_postulantes (postulante_id, texto)
+        SELECT p.id, f_unaccent(lower(concat_ws(' ', p.nombres, p.apellidos, p.dni, u.email)))
+        FROM postulantes p JOIN usuarios u ON u.id = p.usuario_id
+        WHERE (TG_TABLE_NAME = 'postulantes' AND p.id = NEW.id) OR (TG_TABLE_NAME = 'usuarios' AND p.usuario_id = NEW.id)
+        ON CONFLICT (postulante_id) DO UPDATE SET texto = EXCLUDED.texto;
+        RETURN NULL;
+    END $$""",
+    'DROP TRIGGER IF EXISTS trg_busqueda_postulantes ON postulantes',
+    """CREATE TRIGGER trg_busqueda_postulantes AFTER INSERT OR UPDATE OF nombres, apellidos, dni, usuario_id ON postulantes
+       FOR EACH ROW EXECUTE FUNCTION busqueda_postulantes_sync()""",
+    'DROP TRIGGER IF EXISTS trg_busqueda_usuarios ON usuarios',
+    """CREATE TRIGGER trg_busqueda_usuarios AFTER UPDATE OF email ON usuarios
+       FOR EACH ROW EXECUTE FUNCTION busqueda_postulantes_sync()""",
+    """INSERT INTO busqueda_postulantes (postulante_id, texto)
+       SELECT p.id, f_unaccent(lower(concat_ws(' ', p.nombres, p.apellidos, p.dni, u.email)))
+       FROM postulantes p JOIN usuarios u ON u.id = p.usuario_id
+       ON CONFLICT (postulante_id) DO UPDATE SET texto = EXCLUDED.texto""",
+]
+
+@migracion(8, 'indice_de_busqueda')
+def _indice_de_busqueda(con):
+    if con.dialect.name == 'sqlite':
+        opciones = {fila[0] for fila in con.exec_driver_sql('PRAGMA compile_options')}
+        if 'ENABLE_FTS5' not in opciones: return  # sqlite sin FTS5: la busqueda usa prefijos sobre los indices normales
+        sentencias = SQLITE_BUSQUEDA
+    else:
+        sentencias = POSTGRES_BUSQUEDA  # CREATE EXTENSION requiere un rol con permiso en la base
+    for sentencia in sentencias: con.exec_driver_sql(sentencia)
+
+# la columna que agrego la 0006 quedo nullable en bases viejas; models.py y schema.sql la declaran NOT NULL.
+# sqlite no puede cambiar una columna sin reconstruir la tabla (y los triggers de busqueda que dependen de ella):
+# ahi la restriccion la imponen dos triggers
+@migracion(9, 'archivos_clave_obligatoria')
+def _archivos_clave_obligatoria(con):
+    if omitidos := _rellenar_claves(con):
+        raise RuntimeError(f'Hay archivos sin clave, corrige su ruta o nombre_guardado antes de migrar: {omitidos[:10]}')
+    if not next(c for c in inspect(con).get_columns('archivos') if c['name'] == 'clave')['nullable']: return
+    if con.dialect.name != 'sqlite':
+        con.execute(text('ALTER TABLE archivos ALTER COLUMN clave SET NOT NULL')); return
+    for evento in ('INSERT', 'UPDATE OF clave'):
+        con.exec_driver_sql(f"""CREATE TRIGGER IF NOT EXISTS archivos_clave_{evento.split()[0].lower()} BEFORE {evento} ON archivos
+            WHEN NEW.clave IS NULL BEGIN SELECT RAISE(ABORT, 'NOT NULL constraint failed: archivos.clave'); END""")
+
+# -- ejecucion -- #
+# 01: tabla de control con las versiones aplicadas
+def versiones_aplicadas(engine):
+    with engine.begin() as con:
+        con.execute(text('CREATE TABLE IF NOT EXISTS schema_migraciones (version INTEGER PRIMARY KEY, nombre VARCHAR(100) NOT NULL, aplicada TIMESTAMP NOT NULL)'))
+        return set(con.execute(text('SELECT version FROM schema_migraciones')).scalars())
+
+# 01b: migraciones que faltan aplicar, en orden
+def pendientes(engine):
+    aplicadas = versiones_aplicadas(engine)
+    return [m for m in sorted(MIGRACIONES) if m[0] not in aplicadas]
+
+# 02: aplica en orden las pendientes, cada una en su transaccion
+def migrar(engine, salida=print):
+    faltantes = pendientes(engine)
+    for version, nombre, funcion in faltantes:
+        with engine.begin() as con:
+            funcion(con)
+            con.execute(text('INSERT INTO schema_migraciones (version, nombre, aplicada) VALUES (:v, :n, :a)'),
+                        {'v': version, 'n': nombre, 'a': datetime.utcnow()})
+        salida(f'aplicada {version:04d}_{nombre}')
+    return len(faltantes)
+
+# 03: listado de migraciones con su estado
+def estado(engine):
+    aplicadas = versiones_aplicadas(engine)
+    return [(version, nombre, version in aplicadas) for version, nombre, _ in sorted(MIGRACIONES)]
+
+# 04: con MIGRAR_AL_ARRANCAR=True crear_app aplica aqui las pendientes de una base sqlite, que vive en el disco
+# del propio servidor (en Heroku sin DATABASE_URL la fase release migra un disco que se descarta).
+# Los workers sin preload arrancan a la vez: un BEGIN EXCLUSIVE sobre '<base>-migrar' deja migrar a uno solo
+# (sqlite lo suelta aunque el proceso muera) y los demas, al entrar, ya no encuentran pendientes
+def migrar_sqlite_al_arrancar(engine, salida=print):
+    if engine.dialect.name != 'sqlite' or not pendientes(engine): return 0
+    ruta = engine.url.database
+    if not ruta or ruta == ':memory:': return migrar(engine, salida)
+    candado = sqlite3.connect(ruta + '-migrar', timeout=300, isolation_level=None)
+    try:
+        candado.execute('BEGIN EXCLUSIVE')
+        return migrar(engine, salida)
+    finally:
+        candado.close()
+
+# -- verificacion de planes de consulta -- #
+# 01: las consultas que hacen las rutas, con valores de ejemplo
+def consultas_de_rutas():
+    fecha, tope = datetime(2025, 1, 1), 2**31
+    keyset_postulantes = [desc(Postulante.fecha_registro), desc(Postulante.id)]
+    return {
+        'login': select(Usuario).where(Usuario.email == 'a@b.pe'),
+        'dashboard/perfil': select(Postulante).where(Postulante.usuario_id == 1),
+        'mis_archivos': select(Archivo).where(Archivo.usuario_id == 1).order_by(desc(Archivo.fecha_subida)),
+        'verify': select(CodigoVerificacion).where(CodigoVerificacion.email == 'a@b.pe'),
+        'purga de codigos': select(CodigoVerificacion.email).where(CodigoVerificacion.expira < fecha).limit(500),
+        'referencias de un blob': select(Archivo.id).where(Archivo.sha256 == 'ab' * 32).limit(1),
+        'descargar_archivo': select(Archivo).where(Archivo.id == 1, Archivo.usuario_id == 1),
+        'estadisticas usuarios': select(func.count(Usuario.id)).where(Usuario.tipo == 'postulante'),
+        'estadisticas pendientes': select(func.count(Postulante.id)).where(Postulante.estado == 'pendiente'),
+        'admin_usuarios': select(Postulante, Usuario).join(Usuario, Usuario.id == Postulante.usuario_id)
+            .where(tuple_(Postulante.fecha_registro, Postulante.id) < tuple_(fecha, tope)).order_by(*keyset_postulantes).limit(51),
+        'admin_usuarios estado': select(Postulante, Usuario).join(Usuario, Usuario.id == Postulante.usuario_id)
+            .where(Postulante.estado == 'pendiente').order_by(*keyset_postulantes).limit(51),
+        'admin_usuarios dni': select(Postulante).where(Postulante.dni == '12345678'),
+        'admin_archivos': select(Archivo, Usuario).join(Usuario, Usuario.id == Archivo.usuario_id)
+            .where(tuple_(Archivo.fecha_subida, Archivo.id) < tuple_(fecha, tope))
+            .order_by(desc(Archivo.fecha_subida), desc(Archivo.id)).limit(51),
+    }
+
+# 02: devuelve el plan de una consulta como lista de lineas
+def plan(con, consulta):
+    compilado = consulta.compile(dialect=con.dialect)
+    params = compilado.params
+    if compilado.positional: params = tuple(params[k] for k in compilado.positiontup)
+    if con.dialect.name == 'sqlite':
+        return [fila[-1] for fila in con.exec_driver_sql('EXPLAIN QUERY PLAN ' + compilado.string, params)]
+    con.exec_driver_sql('SET LOCAL enable_seqscan = off')  # en tablas chicas postgres preferiria leer todo
+    return [fila[0] for fila in con.exec_driver_sql('EXPLAIN ' + compilado.string, params)]
+
+# 03: una consulta falla si recorre una tabla completa o necesita ordenar en memoria
+def sin_indice(lineas):
+    return [l for l in lineas if (l.startswith('SCAN ') and 'INDEX' not in l) or 'TEMP B-TREE' in l or 'Seq Scan' in l]
+
+# 04: revisa todas las consultas; devuelve {ruta: lineas problematicas}
+def verificar_indices(engine):
+    fallas = {}
+    with engine.connect() as con:
+        for ruta, consulta in consultas_de_rutas().items():
+            with con.begin():
+                if malas := sin_indice(plan(con, consulta)): fallas[ruta] = malas
+    return fallas
+
+# -- comandos -- #
+def _ejecutar(accion, engine):
+    if accion == 'migrar':
+        total = migrar(engine, click.echo)
+        click.echo(f'{total} migraciones aplicadas')
+    elif accion == 'estado':
+        for version, nombre, aplicada in estado(engine):
+            click.echo(f"{'[x]' if aplicada else '[ ]'} {version:04d}_{nombre}")
+    else:
+        fallas = verificar_indices(engine)
+        for ruta, lineas in fallas.items(): click.echo(f'{ruta}: {" | ".join(lineas)}', err=True)
+        if fallas: sys.exit(1)
+        click.echo('todas las consultas usan indices')
+
+# 01: flask db migrar | estado | verificar
+def init_app(app):
+    @app.cli.group('db')
+    def grupo():
+        """Migraciones del esquema"""
+
+    for accion, ayuda in [('migrar', 'Aplica las migraciones pendientes'), ('estado', 'Lista las migraciones aplicadas'),
+                          ('verificar', 'Falla si alguna consulta de las rutas no usa indices')]:
+        grupo.command(accion, help=ayuda)(lambda accion=accion: _ejecutar(accion, db.engine))
+
+if __name__ == '__main__':
+    url = url_base_de_datos(os.path.abspath(os.path.dirname(__file__)))
+    _ejecutar(sys.argv[1] if len(sys.argv) > 1 else 'migrar', create_engine(url, **opciones_motor(url)))
@@ -19,6 +19,10 @@ class Usuario(db.Model):
     postulante = db.relationship('Postulante', backref='usuario', uselist=False, cascade="all, delete-orphan")
     # relacion uno a muchos con Archivo
     archivos = db.relationship('Archivo', backref='usuario', cascade="all, delete-orphan")
+    # indice para los conteos por tipo de las estadisticas (ver migraciones.py)
+    __table_args__ = (
+        db.Index('idx_usuarios_tipo', 'tipo'),
+    )
 
 # -- modelo Postulante -- #
 # 01: info especifica de los postulantes
@@ -32,6 +36,14 @@ class Postulante(db.Model):
     dni = db.Column(db.String(20))  # documento de identidad
     estado = db.Column(db.String(20), default='pendiente')  # pendiente, aprobado, rechazado
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)  # cuando se registro
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # version de la fila (cache de fragmentos)
+    # indices para la paginacion por cursor y los filtros del panel admin (ver migraciones.py)
+    __table_args__ = (
+        db.Index('uq_postulantes_usuario_id', 'usuario_id', unique=True),  # un postulante por usuario
+        db.Index('idx_postulantes_fecha_id', 'fecha_registro', 'id'),
+        db.Index('idx_postulantes_estado_fecha_id', 'estado', 'fecha_registro', 'id'),
+        db.Index('idx_postulantes_dni', 'dni'),
+    )
 
 # -- modelo Archivo -- #
 # 01: archivos subidos por los usuarios
@@ -43,6 +55,40 @@ class Archivo(db.Model):
     nombre_guardado = db.Column(db.String(255), nullable=False)  # nombre unico en el sistema
     extension = db.Column(db.String(10), nullable=False)  # extension del archivo
     mime_type = db.Column(db.String(100), nullable=False)  # tipo MIME
-    ruta = db.Column(db.String(255), nullable=False)  # ruta local o URL cloudinary
+    ruta = db.Column(db.String(255), nullable=False)  # ruta local o URL, solo informativa (usar backend y clave)
     tamano = db.Column(db.Integer, nullable=False)  # tamaño en bytes
-    fecha_subida = db.Column(db.DateTime, default=datetime.utcnow)  # cuando se subio
\ No newline at end of file
+    fecha_subida = db.Column(db.DateTime, default=datetime.utcnow)  # cuando se subio
+    sha256 = db.Column(db.String(64))  # blob local por contenido (ver almacen.py); None si no es local
+    backend = db.Column(db.String(20), nullable=False, default='local')  # local, cloudinary o s3 (ver almacenamiento.py)
+    clave = db.Column(db.String(255), nullable=False)  # identificador dentro del backend
+    # indices para mis_archivos y la paginacion por cursor del listado admin (ver migraciones.py)
+    __table_args__ = (
+        db.Index('idx_archivos_usuario_fecha', 'usuario_id', 'fecha_subida'),
+        db.Index('idx_archivos_fecha_id', 'fecha_subida', 'id'),
+        db.Index('idx_archivos_sha256', 'sha256'),  # referencias de cada blob
+    )
+
+# -- modelo AuditoriaEstado -- #
+# 01: una fila por cada cambio masivo de estado hecho por un admin
+class AuditoriaEstado(db.Model):
+    __tablename__ = 'auditoria_estados'
+    id = db.Column(db.Integer, primary_key=True)
+    admin_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)  # admin que hizo el cambio
+    estado_nuevo = db.Column(db.String(20), nullable=False)
+    criterio = db.Column(db.Text, nullable=False)  # JSON con los ids o el filtro aplicado
+    cantidad = db.Column(db.Integer, nullable=False)  # postulantes afectados
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+# -- modelo CodigoVerificacion -- #
+# 01: codigo de verificacion vigente por correo (uno solo; registrarse de nuevo lo reemplaza)
+class CodigoVerificacion(db.Model):
+    __tablename__ = 'codigos_verificacion'
+    email = db.Column(db.String(120), primary_key=True)  # correo a verificar
+    codigo_hash = db.Column(db.String(64), nullable=False)  # HMAC del codigo, nunca el codigo en claro
+    intentos = db.Column(db.Integer, nullable=False, default=0)  # intentos fallidos
+    expira = db.Column(db.DateTime, nullable=False)
+    creado = db.Column(db.DateTime, default=datetime.utcnow)
+    # indice para borrar los vencidos por lotes (ver migraciones.py)
+    __table_args__ = (
+        db.Index('idx_codigos_verificacion_expira', 'expira'),
+    )
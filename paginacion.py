@@ -0,0 +1,54 @@
+# -- Paginacion por cursor (keyset) -- #
+# 01: imports
+import base64, json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+# -- codificacion del cursor -- #
+# 01: convierte los valores de la ultima fila en un token opaco para la url
+def codificar_cursor(*valores):
+    datos = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in valores]
+    return base64.urlsafe_b64encode(json.dumps(datos, separators=(',', ':')).encode()).decode().rstrip('=')
+
+# 02: recupera los valores del cursor, None si es invalido
+def decodificar_cursor(cursor):
+    if not cursor: return None
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return [datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in datos]
+    except (ValueError, TypeError, KeyError, RecursionError):
+        return None
+
+# 03: normaliza el limite recibido por querystring
+def leer_limite(valor):
+    try: limite = int(valor)
+    except (TypeError, ValueError): return LIMITE_POR_DEFECTO
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+# -- filtros indexables -- #
+# 01: filtro de prefijo como rango (col >= p AND col < p_siguiente) para que use el indice
+def filtro_prefijo(columna, prefijo):
+    siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+    return (columna >= prefijo) & (columna < siguiente)
+
+# -- paginacion -- #
+# 01: el cursor trae un valor del tipo de cada columna; uno alterado a mano (otro largo, listas, texto donde
+# va una fecha) se trata como primera pagina en lugar de llegar a la base como error 500
+def _coincide(valores, columnas):
+    return len(valores) == len(columnas) and all(isinstance(v, c.type.python_type) and not isinstance(v, bool)
+                                                 for v, c in zip(valores, columnas))
+
+# 02: aplica orden descendente y el cursor sobre las columnas dadas
+def paginar_keyset(query, columnas, cursor=None, limite=LIMITE_POR_DEFECTO):
+    """Devuelve (filas, siguiente_cursor); siguiente_cursor es None en la ultima pagina"""
+    valores = decodificar_cursor(cursor)
+    if valores and _coincide(valores, columnas):
+        query = query.filter(tuple_(*columnas) < tuple_(*valores))
+    filas = query.order_by(*[c.desc() for c in columnas]).limit(limite + 1).all()  # una fila extra para saber si hay mas
+    if len(filas) <= limite: return filas, None
+    filas = filas[:limite]
+    ultima = filas[-1]
+    return filas, codificar_cursor(*[getattr(ultima, c.key) for c in columnas])
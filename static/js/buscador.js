@@ -0,0 +1,79 @@
+// -- Buscador del panel admin -- #
+// 01: autocompletado de postulantes y archivos contra /admin/buscar
+document.addEventListener('DOMContentLoaded', function () {
+
+    const input = document.getElementById('buscadorAdmin');
+    if (!input) return;  // solo en las paginas del admin
+
+    const lista = document.getElementById('buscadorResultados');
+    let temporizador = null;
+    let controlador = null;  // cancela la peticion anterior si se sigue escribiendo
+
+    // -- eventos -- #
+    input.addEventListener('input', () => {
+        clearTimeout(temporizador);
+        temporizador = setTimeout(buscar, 150);  // espera a que se deje de escribir
+    });
+
+    input.addEventListener('keydown', (e) => {
+        if (e.key === 'Escape') cerrar();
+    });
+
+    document.addEventListener('click', (e) => {
+        if (!lista.contains(e.target) && e.target !== input) cerrar();
+    });
+
+    // -- funciones -- #
+    // 01: consulta al servidor (minimo 2 caracteres, igual que en el servidor)
+    async function buscar() {
+        const q = input.value.trim();
+        if (q.length < 2) return cerrar();
+        if (controlador) controlador.abort();
+        controlador = new AbortController();
+        try {
+            const respuesta = await fetch(`${input.dataset.url}?q=${encodeURIComponent(q)}`,
+                { signal: controlador.signal, headers: { 'Accept': 'application/json' } });
+            if (!respuesta.ok) return cerrar();
+            mostrar(await respuesta.json());
+        } catch (error) {
+            if (error.name !== 'AbortError') cerrar();
+        }
+    }
+
+    // 02: pinta los resultados agrupados (textContent: nada del servidor se interpreta como html)
+    function mostrar(datos) {
+        lista.replaceChildren();
+        agregarGrupo('Postulantes', datos.postulantes,
+            p => `${p.apellidos}, ${p.nombres} · ${p.dni} · ${p.email} (${p.estado})`);
+        agregarGrupo('Archivos', datos.archivos, a => `${a.nombre} · ${a.email}`);
+        if (!lista.children.length) agregarItem('Sin resultados', null);
+        lista.hidden = false;
+    }
+
+    function agregarGrupo(titulo, filas, texto) {
+        if (!filas.length) return;
+        const cabecera = document.createElement('li');
+        cabecera.className = 'buscador-grupo';
+        cabecera.textContent = titulo;
+        lista.appendChild(cabecera);
+        filas.forEach(fila => agregarItem(texto(fila), fila.url));
+    }
+
+    function agregarItem(texto, url) {
+        const item = document.createElement('li');
+        if (url) {
+            const enlace = document.createElement('a');
+            enlace.href = url;
+            enlace.textContent = texto;
+            item.appendChild(enlace);
+        } else {
+            item.textContent = texto;
+        }
+        lista.appendChild(item);
+    }
+
+    function cerrar() {
+        lista.hidden = true;
+        lista.replaceChildren();
+    }
+});
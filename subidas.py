@@ -0,0 +1,66 @@
+# -- Subida de archivos por streaming -- #
+# 01: imports y configuracion
+import os
+
+TAMANO_BLOQUE = 64 * 1024  # bytes que se leen por iteracion
+
+class ArchivoDemasiadoGrande(Exception):
+    """El stream supero el limite de bytes permitido"""
+
+# -- lectura con limite -- #
+# 01: envuelve un stream y corta la lectura en cuanto se pasa del limite (sin limite solo cuenta bytes)
+class LectorLimitado:
+    def __init__(self, stream, max_bytes=None):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.leidos = 0
+
+    def read(self, n=-1):
+        if self.max_bytes is None:
+            datos = self.stream.read(n); self.leidos += len(datos); return datos
+        restante = self.max_bytes + 1 - self.leidos  # nunca lee mas de un byte por encima del limite
+        datos = self.stream.read(restante if n is None or n < 0 else min(n, restante))
+        self.leidos += len(datos)
+        if self.leidos > self.max_bytes: raise ArchivoDemasiadoGrande(f'El archivo supera {self.max_bytes} bytes')
+        return datos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        posicion = self.stream.seek(offset, whence)
+        self.leidos = self.stream.tell()
+        return posicion
+
+    def tell(self):
+        return self.stream.tell()
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+# 02: tamaño del stream sin leerlo, None si no se puede saber
+def tamano_stream(stream):
+    try:
+        inicio = stream.tell()
+        stream.seek(0, os.SEEK_END); tamano = stream.tell(); stream.seek(inicio)
+        return tamano - inicio
+    except (AttributeError, OSError, ValueError):
+        return None
+
+# -- guardado local -- #
+# 01: copia el stream por bloques al destino y lo publica solo si termino bien
+def guardar_stream(stream, ruta_destino, max_bytes=None, tamano_bloque=TAMANO_BLOQUE, resumen=None):
+    """Devuelve los bytes escritos; si falla no deja archivos a medias. `resumen` (hashlib) se actualiza con cada bloque"""
+    origen = LectorLimitado(stream, max_bytes) if max_bytes else stream
+    ruta_parcial = ruta_destino + '.parcial'
+    escritos = 0
+    try:
+        with open(ruta_parcial, 'wb') as destino:
+            while bloque := origen.read(tamano_bloque):
+                destino.write(bloque); escritos += len(bloque)
+                if resumen is not None: resumen.update(bloque)
+        os.replace(ruta_parcial, ruta_destino)  # rename atomico
+    except BaseException:
+        if os.path.exists(ruta_parcial): os.remove(ruta_parcial)
+        raise
+    return escritos
@@ -0,0 +1,233 @@
+# -- Cola de tareas en segundo plano -- #
+# 01: imports y configuracion
+import json, logging, os, random, sqlite3, threading, time
+import click
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+# estados de una tarea: pendiente -> en_proceso -> hecha | pendiente (reintento) | muerta
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tareas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    ejecutar_en REAL NOT NULL,
+    ultimo_error TEXT,
+    creada REAL NOT NULL,
+    actualizada REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tareas_estado_ejecutar ON tareas(estado, ejecutar_en);
+"""
+
+# -- cola -- #
+# 01: cola persistente en sqlite con un pool de hilos que la consume
+class ColaTareas:
+    def __init__(self, app=None):
+        self.handlers = {}
+        self.app = None
+        self._hilo = None
+        self._despertar = threading.Event()
+        self._candado = threading.Lock()
+        if app is not None: self.init_app(app)
+
+    # 02: lee la configuracion y crea la tabla si no existe
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('TAREAS_DB', os.environ.get('TAREAS_DB') or os.path.join(app.instance_path, 'tareas.db'))
+        app.config.setdefault('TAREAS_WORKERS', int(os.environ.get('TAREAS_WORKERS', 2)))  # 0: sin hilos, solo `flask tareas procesar`
+        app.config.setdefault('TAREAS_MAX_INTENTOS', 5)
+        app.config.setdefault('TAREAS_BACKOFF_BASE', 2.0)  # segundos, se duplica en cada intento
+        app.config.setdefault('TAREAS_BACKOFF_MAX', 600.0)
+        app.config.setdefault('TAREAS_TIMEOUT', 300.0)  # una tarea en_proceso por mas tiempo se da por abandonada
+        app.config.setdefault('TAREAS_SINCRONO', False)  # ejecuta en linea (pruebas y benchmarks)
+        os.makedirs(os.path.dirname(app.config['TAREAS_DB']), exist_ok=True)
+        with self._conexion() as con:
+            con.execute('PRAGMA journal_mode=WAL')  # lectores y escritores de varios procesos no se bloquean
+            con.executescript(ESQUEMA)
+        app.extensions['tareas'] = self
+
+        @app.before_request
+        def _arrancar_workers():
+            if self._hilo is None and app.config['TAREAS_WORKERS']: self.iniciar()
+
+        # comandos: flask tareas procesar | estado | reintentar
+        @app.cli.group('tareas')
+        def grupo():
+            """Cola de tareas en segundo plano"""
+
+        @grupo.command('procesar')
+        def _procesar():
+            """Ejecuta ahora las tareas vencidas"""
+            click.echo(f'{self.procesar_pendientes()} tareas procesadas')
+
+        @grupo.command('estado')
+        def _estado():
+            """Cantidad de tareas por estado"""
+            click.echo(json.dumps(self.resumen()))
+
+        @grupo.command('reintentar')
+        def _reintentar():
+            """Devuelve las tareas muertas a la cola"""
+            click.echo(f'{self.reintentar_muertas()} tareas reencoladas')
+
+    # 03: registra un handler con un nombre estable
+    def tarea(self, nombre):
+        def decorador(f):
+            self.handlers[nombre] = f
+            return f
+        return decorador
+
+    # 04: conexion propia en autocommit; cada hilo abre la suya
+    def _abrir(self):
+        con = sqlite3.connect(self.app.config['TAREAS_DB'], timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        return con
+
+    @contextmanager
+    def _conexion(self):
+        con = self._abrir()
+        try: yield con
+        finally: con.close()
+
+    # -- encolado -- #
+    # 01: guarda la tarea y despierta a los workers
+    def encolar(self, nombre, **payload):
+        if nombre not in self.handlers: raise KeyError(f'Tarea no registrada: {nombre}')
+        if self.app.config['TAREAS_SINCRONO']:
+            return self._ejecutar_en_linea(nombre, payload)
+        ahora = time.time()
+        with self._conexion() as con:
+            tarea_id = con.execute('INSERT INTO tareas (nombre,payload,ejecutar_en,creada,actualizada) VALUES (?,?,?,?,?)',
+                                   (nombre, json.dumps(payload), ahora, ahora, ahora)).lastrowid
+        self._despertar.set()
+        return tarea_id
+
+    # 02: difiere el encolado hasta que la transaccion de la sesion haga commit
+    def encolar_tras_commit(self, session, nombre, **payload):
+        session.info.setdefault('tareas_pendientes', []).append((nombre, payload))
+
+    # 03: conecta los eventos de sesion que vacian o descartan lo diferido
+    def vincular_sesion(self, session):
+        @event.listens_for(session, 'after_commit')
+        def _tras_commit(s):
+            for nombre, payload in s.info.pop('tareas_pendientes', []):
+                try: self.encolar(nombre, **payload)
+                except Exception: log.exception('No se pudo encolar %s', nombre)
+
+        @event.listens_for(session, 'after_soft_rollback')
+        def _tras_rollback(s, transaccion_previa):
+            s.info.pop('tareas_pendientes', None)
+
+    # -- ejecucion -- #
+    # 01: arranca el hilo despachador (una vez por proceso)
+    def iniciar(self):
+        with self._candado:
+            if self._hilo is not None: return
+            self._pool = ThreadPoolExecutor(max_workers=self.app.config['TAREAS_WORKERS'], thread_name_prefix='tarea')
+            self._libres = threading.Semaphore(self.app.config['TAREAS_WORKERS'])
+            self._hilo = threading.Thread(target=self._despachar, name='tareas-despachador', daemon=True)
+            self._hilo.start()
+
+    # 02: toma tareas vencidas mientras haya workers libres
+    def _despachar(self):
+        ultima_purga = 0
+        while True:
+            try:
+                if time.time() - ultima_purga > 3600: self.purgar_hechas(); ultima_purga = time.time()
+                self._recuperar_abandonadas()
+                while self._libres.acquire(blocking=False):
+                    if not (fila := self._reclamar()):
+                        self._libres.release(); break
+                    self._pool.submit(self._ejecutar_y_liberar, fila)
+            except Exception:
+                log.exception('Error en el despachador de tareas')
+            self._despertar.wait(1.0); self._despertar.clear()
+
+    def _ejecutar_y_liberar(self, fila):
+        try: self._ejecutar(fila)
+        finally: self._libres.release(); self._despertar.set()
+
+    # 03: marca en_proceso la proxima tarea vencida de forma atomica entre procesos
+    def _reclamar(self):
+        con = self._abrir()
+        try:
+            con.execute('BEGIN IMMEDIATE')
+            fila = con.execute("SELECT * FROM tareas WHERE estado='pendiente' AND ejecutar_en<=? ORDER BY ejecutar_en, id LIMIT 1",
+                               (time.time(),)).fetchone()
+            if fila:
+                con.execute("UPDATE tareas SET estado='en_proceso', intentos=intentos+1, actualizada=? WHERE id=?", (time.time(), fila['id']))
+            con.execute('COMMIT')
+            return fila
+        except Exception:
+            con.execute('ROLLBACK'); raise
+        finally:
+            con.close()
+
+    # 04: vuelve a pendiente las tareas de workers que murieron a medias
+    def _recuperar_abandonadas(self):
+        limite = time.time() - self.app.config['TAREAS_TIMEOUT']
+        with self._conexion() as con:
+            con.execute("UPDATE tareas SET estado='pendiente' WHERE estado='en_proceso' AND actualizada<?", (limite,))
+
+    # 05: corre el handler dentro del contexto de la app y registra el resultado
+    def _ejecutar(self, fila):
+        intentos = fila['intentos'] + 1
+        try:
+            with self.app.app_context():
+                self.handlers[fila['nombre']](**json.loads(fila['payload']))
+        except Exception as e:
+            log.warning('Tarea %s #%s fallo (intento %s): %s', fila['nombre'], fila['id'], intentos, e)
+            self._registrar_fallo(fila['id'], intentos, repr(e))
+        else:
+            with self._conexion() as con:
+                con.execute("UPDATE tareas SET estado='hecha', ultimo_error=NULL, actualizada=? WHERE id=?", (time.time(), fila['id']))
+
+    # 06: reintento con backoff exponencial y jitter, o cola de muertas
+    def _registrar_fallo(self, tarea_id, intentos, error):
+        config = self.app.config
+        with self._conexion() as con:
+            if intentos >= config['TAREAS_MAX_INTENTOS']:
+                con.execute("UPDATE tareas SET estado='muerta', ultimo_error=?, actualizada=? WHERE id=?", (error, time.time(), tarea_id))
+                log.error('Tarea #%s enviada a muertas tras %s intentos', tarea_id, intentos)
+                return
+            espera = min(config['TAREAS_BACKOFF_BASE'] * 2 ** (intentos - 1), config['TAREAS_BACKOFF_MAX'])
+            espera *= random.uniform(0.8, 1.2)
+            con.execute("UPDATE tareas SET estado='pendiente', ultimo_error=?, ejecutar_en=?, actualizada=? WHERE id=?",
+                        (error, time.time() + espera, time.time(), tarea_id))
+
+    def _ejecutar_en_linea(self, nombre, payload):
+        with self.app.app_context():
+            self.handlers[nombre](**payload)
+
+    # -- mantenimiento -- #
+    # 01: procesa en el hilo actual todo lo vencido (cli y pruebas)
+    def procesar_pendientes(self):
+        procesadas = 0
+        while fila := self._reclamar():
+            self._ejecutar(fila); procesadas += 1
+        return procesadas
+
+    # 02: conteo por estado
+    def resumen(self):
+        with self._conexion() as con:
+            return {f['estado']: f['total'] for f in con.execute('SELECT estado, COUNT(*) AS total FROM tareas GROUP BY estado')}
+
+    # 03: devuelve las muertas a la cola con los intentos en cero
+    def reintentar_muertas(self):
+        with self._conexion() as con:
+            total = con.execute("UPDATE tareas SET estado='pendiente', intentos=0, ejecutar_en=?, actualizada=? WHERE estado='muerta'",
+                                (time.time(), time.time())).rowcount
+        self._despertar.set()
+        return total
+
+    # 04: borra las terminadas hace mas de `antiguedad` segundos
+    def purgar_hechas(self, antiguedad=86400):
+        with self._conexion() as con:
+            return con.execute("DELETE FROM tareas WHERE estado='hecha' AND actualizada<?", (time.time() - antiguedad,)).rowcount
+
+cola = ColaTareas()  # instancia compartida, se vincula en app.py
@@ -0,0 +1,80 @@
+# -- Fixtures de las pruebas -- #
+# Una sola app por sesion: crear_app conecta eventos a la sesion compartida de models.db, y armarla en
+# cada prueba los duplicaria. Todo lo que escribe (base, cola, archivos, marca) va a una carpeta temporal.
+# 01: imports
+from datetime import date
+import pytest
+from sqlalchemy import text
+from models import db, Usuario, Postulante
+from tareas import cola
+from estadisticas import contadores
+import migraciones
+
+@pytest.fixture(scope='session')
+def carpeta(tmp_path_factory):
+    return tmp_path_factory.mktemp('app')
+
+# 02: app con sqlite en archivo, migrada, y la cola sin hilos (las pruebas procesan a mano)
+@pytest.fixture(scope='session')
+def app(carpeta):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('SECRET_KEY', 'pruebas')
+        mp.setenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')  # hashes rapidos
+        from app import crear_app
+        app = crear_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{carpeta / 'app.db'}",
+            'TAREAS_DB': str(carpeta / 'tareas.db'),
+            'TAREAS_WORKERS': 0,
+            'CARPETA_ARCHIVOS': str(carpeta / 'uploads'),
+            'DERIVADOS_DIR': str(carpeta / 'derivados'),
+            'ESTATICOS_DIR': str(carpeta / 'estaticos'),
+            'ESTADISTICAS_MARCA': str(carpeta / 'estadisticas.marca'),
+            'ALMACENAMIENTO': 'local',
+        })
+    with app.app_context():
+        migraciones.migrar(db.engine, salida=lambda linea: None)
+    return app
+
+# 03: contexto de app por prueba; la sesion se descarta al salir
+@pytest.fixture
+def contexto(app):
+    with app.app_context():
+        yield app
+        db.session.rollback(); db.session.remove()
+
+# 04: cola vacia al empezar cada prueba
+@pytest.fixture
+def tareas(contexto):
+    with cola._conexion() as con: con.execute('DELETE FROM tareas')
+    return cola
+
+# 05: crea postulantes (usuario y postulante) en la base; se borran al terminar la prueba
+@pytest.fixture
+def postulantes(contexto):
+    creados = []
+    def crear(email, estado='pendiente', **datos):
+        usuario = Usuario(email=email, password_hash='x', tipo='postulante', verificado=True)
+        usuario.postulante = Postulante(nombres=datos.pop('nombres', 'Ana'), apellidos=datos.pop('apellidos', 'Quispe'),
+                                        fecha_nacimiento=date(2000, 1, 1), dni=datos.pop('dni', '12345678'), estado=estado, **datos)
+        db.session.add(usuario); db.session.commit()
+        creados.append(usuario.id)
+        return usuario.postulante
+    yield crear
+    db.session.rollback()
+    for tabla, columna in [('archivos', 'usuario_id'), ('postulantes', 'usuario_id'), ('usuarios', 'id')]:
+        db.session.execute(text(f'DELETE FROM {tabla} WHERE {columna} IN (SELECT value FROM json_each(:ids))'), {'ids': str(creados)})
+    db.session.commit()
+    contadores.invalidar()  # los DELETE directos no pasan por los eventos de sesion
+
+# 06: cliente con la sesion de un administrador; devuelve (cliente, id del admin)
+@pytest.fixture
+def admin(contexto):
+    usuario = Usuario(email='admin@b.pe', password_hash='x', tipo='admin', verificado=True)
+    db.session.add(usuario); db.session.commit()
+    cliente = contexto.test_client()
+    with cliente.session_transaction() as sesion: sesion.update(user_id=usuario.id, tipo_usuario='admin')
+    yield cliente, usuario.id
+    db.session.rollback()
+    db.session.execute(text('DELETE FROM auditoria_estados')); db.session.execute(text("DELETE FROM usuarios WHERE email = 'admin@b.pe'"))
+    db.session.commit()
@@ -0,0 +1,64 @@
+# -- Almacenamiento local por contenido -- #
+# 01: imports
+import hashlib, io, os, time
+import pytest
+from models import db, Archivo
+from almacen import AlmacenContenido
+from subidas import ArchivoDemasiadoGrande
+
+# 01: almacen propio en una carpeta temporal; la gracia se ajusta en cada prueba
+@pytest.fixture
+def almacen(contexto, tmp_path):
+    contenido = AlmacenContenido()
+    contenido.raiz, contenido.gracia = str(tmp_path), 3600
+    os.makedirs(contenido.temporales)
+    return contenido
+
+def envejecer(ruta, segundos=7200):
+    antes = time.time() - segundos
+    os.utime(ruta, (antes, antes))
+
+def referenciar(postulantes, sha256):
+    postulante = postulantes(f'{sha256[:8]}@b.pe')
+    db.session.add(Archivo(usuario_id=postulante.usuario_id, nombre_original='cv.pdf', nombre_guardado='cv.pdf', extension='pdf', mime_type='application/pdf',
+                           ruta='x', tamano=1, sha256=sha256, backend='local', clave=AlmacenContenido.clave_de(sha256)))
+    db.session.commit()
+
+# -- escritura -- #
+# 01: el mismo contenido se guarda una sola vez, en ab/cd/<sha256>, y refresca el mtime del blob
+def test_mismo_contenido_un_blob(almacen):
+    sha256, tamano, ruta = almacen.guardar(io.BytesIO(b'hola'))
+    assert (sha256, tamano) == (hashlib.sha256(b'hola').hexdigest(), 4)
+    assert ruta == os.path.join(almacen.raiz, sha256[:2], sha256[2:4], sha256) == almacen.ruta_de(sha256)
+    envejecer(ruta)
+    assert almacen.guardar(io.BytesIO(b'hola')) == (sha256, 4, ruta)
+    assert time.time() - os.path.getmtime(ruta) < 60
+    assert list(almacen._blobs()) == [(sha256, ruta)] and os.listdir(almacen.temporales) == []
+
+# 02: lo que supera max_bytes no deja blob ni temporal
+def test_max_bytes_no_deja_restos(almacen):
+    with pytest.raises(ArchivoDemasiadoGrande): almacen.guardar(io.BytesIO(b'x' * 100), max_bytes=10)
+    assert list(almacen._blobs()) == [] and os.listdir(almacen.temporales) == []
+
+# -- borrado -- #
+# 01: liberar borra solo si no quedan filas y paso la gracia
+def test_liberar_respeta_referencias_y_gracia(almacen, postulantes):
+    usado, _, ruta_usado = almacen.guardar(io.BytesIO(b'usado'))
+    libre, _, ruta_libre = almacen.guardar(io.BytesIO(b'libre'))
+    referenciar(postulantes, usado)
+    envejecer(ruta_usado)
+    assert not almacen.liberar(usado) and os.path.exists(ruta_usado)
+    assert not almacen.liberar(libre) and os.path.exists(ruta_libre)  # recien guardado
+    envejecer(ruta_libre)
+    assert almacen.liberar(libre) and not os.path.exists(ruta_libre)
+    assert not almacen.liberar(libre)  # ya no existe
+
+# 02: la recoleccion borra los huerfanos viejos y los temporales abandonados, por lotes
+def test_recolectar_huerfanos(almacen, postulantes):
+    blobs = {nombre: almacen.guardar(io.BytesIO(nombre.encode())) for nombre in ['usado', 'viejo1', 'viejo2', 'viejo3', 'nuevo']}
+    referenciar(postulantes, blobs['usado'][0])
+    for nombre in ['usado', 'viejo1', 'viejo2', 'viejo3']: envejecer(blobs[nombre][2])
+    abandonado = os.path.join(almacen.temporales, 'abandonado'); open(abandonado, 'wb').close(); envejecer(abandonado)
+    assert almacen.recolectar(lote=2) == 3
+    assert sorted(sha256 for sha256, _ in almacen._blobs()) == sorted([blobs['usado'][0], blobs['nuevo'][0]])
+    assert os.listdir(almacen.temporales) == []
@@ -0,0 +1,119 @@
+# -- Backends de almacenamiento -- #
+# S3 contra un cliente en memoria y Cloudinary con delete_resources reemplazado; ninguno sale a la red.
+# 01: imports
+import io
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import text
+from werkzeug.datastructures import FileStorage
+import almacenamiento as modulo
+from almacenamiento import AlmacenCloudinary, AlmacenS3, almacenamiento, tarea_mover
+from models import db, Usuario, Archivo
+from subidas import ArchivoDemasiadoGrande
+
+# 01: lo minimo de boto3 que usa AlmacenS3, con los objetos en un dict
+class S3EnMemoria:
+    def __init__(self):
+        self.objetos, self.borrados, self.errores = {}, [], []
+        self.al_subir = None  # se llama despues de cada subida (para simular carreras)
+
+    def upload_fileobj(self, origen, bucket, clave, ExtraArgs=None):
+        datos = b''
+        while bloque := origen.read(8192): datos += bloque
+        self.objetos[bucket, clave] = (datos, ExtraArgs['ContentType'])
+        if self.al_subir: self.al_subir()
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objetos[Bucket, Key][0])}
+
+    def generate_presigned_url(self, operacion, Params, ExpiresIn):
+        extra = f"&disposicion={Params['ResponseContentDisposition']}" if 'ResponseContentDisposition' in Params else ''
+        return f"https://s3.local/{Params['Bucket']}/{Params['Key']}?expira={ExpiresIn}{extra}"
+
+    def delete_objects(self, Bucket, Delete):
+        claves = [o['Key'] for o in Delete['Objects']]
+        self.borrados.append(claves)
+        for clave in claves: self.objetos.pop((Bucket, clave), None)
+        return {'Errors': self.errores} if self.errores else {}
+
+def subida(datos, nombre='cv.pdf'):
+    return FileStorage(io.BytesIO(datos), filename=nombre, content_type='application/pdf')
+
+@pytest.fixture
+def s3():
+    return AlmacenS3('admision', prefijo='pruebas/', expira=60, cliente=S3EnMemoria())
+
+# -- s3 -- #
+# 01: guardar sube con el tipo de contenido, abrir devuelve los mismos bytes y la url va firmada con el nombre
+def test_s3_guardar_abrir_y_url(s3):
+    guardado = s3.guardar(subida(b'%PDF-1.4 hola'), 'postulantes/user_1', 'pdf', max_bytes=1024)
+    assert guardado.clave.startswith('pruebas/postulantes/user_1/') and guardado.clave.endswith('.pdf')
+    assert (guardado.tamano, guardado.ruta) == (13, f's3://admision/{guardado.clave}')
+    assert s3.s3.objetos['admision', guardado.clave] == (b'%PDF-1.4 hola', 'application/pdf')
+    assert s3.abrir(guardado.clave).read() == b'%PDF-1.4 hola'
+    url = s3.url_directa(guardado.clave, 'Currículum.pdf')
+    assert url.startswith(f'https://s3.local/admision/{guardado.clave}?expira=60') and "filename*=UTF-8''Curr%C3%ADculum.pdf" in url
+
+# 02: el limite corta la subida mientras se lee
+def test_s3_respeta_max_bytes(s3):
+    with pytest.raises(ArchivoDemasiadoGrande): s3.guardar(subida(b'x' * 2048), 'postulantes', 'pdf', max_bytes=1024)
+
+# 03: delete_objects en lotes de 1000; un error de S3 se propaga para que la cola reintente
+def test_s3_eliminar_en_lotes(s3):
+    claves = [f'pruebas/{i}.pdf' for i in range(2500)]
+    s3.eliminar(claves)
+    assert [len(lote) for lote in s3.s3.borrados] == [1000, 1000, 500] and sum(s3.s3.borrados, []) == claves
+    s3.s3.errores = [{'Key': 'pruebas/0.pdf', 'Code': 'AccessDenied'}]
+    with pytest.raises(RuntimeError, match='AccessDenied'): s3.eliminar(['pruebas/0.pdf'])
+
+# -- cloudinary -- #
+# 01: delete_resources en lotes de 100 por tipo; 'not_found' cuenta como borrado, otro estado se reintenta
+def test_cloudinary_eliminar_por_tipo_y_en_lotes(monkeypatch):
+    llamadas, respuestas = [], {}
+    def delete_resources(ids, resource_type):
+        llamadas.append((resource_type, list(ids)))
+        return {'deleted': {i: respuestas.get(i, 'deleted') for i in ids}}
+    monkeypatch.setattr(modulo, '_cloudinary', lambda: SimpleNamespace(cloudinary=SimpleNamespace(api=SimpleNamespace(delete_resources=delete_resources))))
+    claves = [f'image/postulantes/user_1/foto{i}' for i in range(150)] + ['raw/postulantes/user_1/cv.docx', 'raw/a/b.txt']
+    respuestas['a/b.txt'] = 'not_found'
+    AlmacenCloudinary().eliminar(claves)
+    assert [(tipo, len(ids)) for tipo, ids in llamadas] == [('image', 100), ('image', 50), ('raw', 2)]
+    assert llamadas[2][1] == ['postulantes/user_1/cv.docx', 'a/b.txt']  # el public_id conserva carpetas y extension
+
+    respuestas['postulantes/user_1/foto0'] = 'rate_limited'
+    with pytest.raises(RuntimeError, match='rate_limited'): AlmacenCloudinary().eliminar(['image/postulantes/user_1/foto0'])
+
+# -- mover al backend activo -- #
+@pytest.fixture
+def movible(tareas, monkeypatch, s3):
+    monkeypatch.setitem(tareas.app.config, 'TAREAS_SINCRONO', True)  # las eliminaciones corren en linea
+    monkeypatch.setitem(almacenamiento.backends, 's3', s3)
+    monkeypatch.setattr(almacenamiento, 'activo', s3)
+    usuario = Usuario(email='mover@b.pe', password_hash='x', tipo='postulante', verificado=True)
+    db.session.add(usuario); db.session.flush()
+    guardado = almacenamiento.de('local').guardar(subida(b'contenido local'), 'postulantes', 'pdf')
+    archivo = Archivo(usuario_id=usuario.id, nombre_original='cv.pdf', nombre_guardado='cv.pdf', extension='pdf', mime_type='application/pdf',
+                      ruta=guardado.ruta, tamano=guardado.tamano, sha256=guardado.sha256, backend='local', clave=guardado.clave)
+    db.session.add(archivo); db.session.commit()
+    ids = {'archivo': archivo.id, 'usuario': usuario.id}
+    yield ids['archivo'], s3
+    db.session.rollback()
+    db.session.execute(text('DELETE FROM archivos WHERE id = :archivo'), ids); db.session.execute(text('DELETE FROM usuarios WHERE id = :usuario'), ids)
+    db.session.commit()
+
+# 01: la fila pasa al backend activo con su clave nueva y el contenido llega intacto
+def test_tarea_mover_a_s3(movible):
+    archivo_id, s3 = movible
+    tarea_mover(archivo_id)
+    archivo = db.session.get(Archivo, archivo_id)
+    assert (archivo.backend, archivo.sha256) == ('s3', None)
+    assert s3.abrir(archivo.clave).read() == b'contenido local'
+
+# 02: si la fila se elimina mientras se sube, la copia recien subida se borra del destino
+def test_tarea_mover_archivo_eliminado_durante_la_subida(movible):
+    archivo_id, s3 = movible
+    def eliminar_fila():
+        with db.engine.begin() as con: con.execute(text('DELETE FROM archivos WHERE id = :i'), {'i': archivo_id})
+    s3.s3.al_subir = eliminar_fila
+    tarea_mover(archivo_id)
+    assert len(s3.s3.borrados) == 1 and s3.s3.objetos == {}
@@ -0,0 +1,58 @@
+# -- Busqueda de postulantes y archivos -- #
+# 01: imports
+import pytest
+from sqlalchemy import update
+from models import db, Postulante, Archivo
+import busqueda
+from busqueda import buscar, terminos
+
+@pytest.fixture
+def personas(postulantes):
+    jose = postulantes('jquispe@b.pe', nombres='José Luis', apellidos='Quispe Mamani', dni='40123456')
+    josefa = postulantes('jpena@b.pe', nombres='Josefa', apellidos='Peña Ñahui', dni='70999888')
+    db.session.add(Archivo(usuario_id=josefa.usuario_id, nombre_original='Constancia de estudios.pdf', nombre_guardado='c.pdf', extension='pdf',
+                           mime_type='application/pdf', ruta='x', tamano=1, backend='local', clave='legado/constancia.pdf'))
+    db.session.commit()
+    return jose, josefa
+
+def nombres(resultado):
+    return sorted(p.nombres for p in resultado['postulantes'])
+
+# 01: minusculas, sin tildes ni signos, como mucho 8 palabras
+def test_terminos():
+    assert terminos('  Peña,  ÑAHUI-José ') == ['pena', 'nahui', 'jose']
+    assert terminos(None) == [] and len(terminos(' '.join('abcdefghij'))) == 8
+
+# -- fts5 -- #
+# 01: cada palabra es un prefijo y todas deben coincidir; sin distinguir tildes
+def test_fts5_prefijos_y_tildes(personas):
+    assert busqueda.motor() == 'fts5'
+    assert nombres(buscar('jose qui')) == ['José Luis']
+    assert nombres(buscar('jos')) == ['Josefa', 'José Luis']
+    assert nombres(buscar('pena nah')) == ['Josefa']
+    assert nombres(buscar('7099')) == ['Josefa'] and nombres(buscar('jpena')) == ['Josefa']
+    assert [a.nombre_original for a in buscar('constancia estud', tipo='archivos')['archivos']] == ['Constancia de estudios.pdf']
+    assert buscar('j') == {'postulantes': [], 'archivos': []}  # menos de MINIMO_CARACTERES
+
+# 02: los triggers mantienen el indice, tambien con UPDATE masivos fuera del ORM
+def test_fts5_sigue_los_cambios(personas):
+    jose, _ = personas
+    db.session.execute(update(Postulante).where(Postulante.id == jose.id).values(apellidos='Condori')); db.session.commit()
+    assert nombres(buscar('quispe')) == [] and nombres(buscar('condori')) == ['José Luis']
+
+# -- sin indice -- #
+# 01: sin la tabla fts recurre a prefijos de correo y dni (los nombres no se encuentran)
+def test_prefijos_sin_indice(personas, app, monkeypatch):
+    monkeypatch.setitem(busqueda._motores, str(db.engine.url), 'prefijos')
+    assert nombres(buscar('jquis')) == ['José Luis']
+    assert nombres(buscar('4012')) == ['José Luis']
+    assert nombres(buscar('quispe')) == []
+    assert [a.nombre_original for a in buscar('jpena', tipo='archivos')['archivos']] == ['Constancia de estudios.pdf']
+
+# -- ruta -- #
+# 01: json para el autocompletado, solo para administradores
+def test_ruta_buscar(personas, admin):
+    cliente, _ = admin
+    respuesta = cliente.get('/admin/buscar', query_string={'q': 'Peña', 'tipo': 'postulantes'}).get_json()
+    assert [p['email'] for p in respuesta['postulantes']] == ['jpena@b.pe'] and respuesta['archivos'] == []
+    assert cliente.get('/admin/buscar', query_string={'q': 'x', 'tipo': 'otro'}).status_code == 400
@@ -0,0 +1,31 @@
+# -- Importacion masiva de postulantes -- #
+# 01: imports
+import io, json
+from sqlalchemy import select
+from app import validar_dni
+from cli_postulantes import importar
+from models import db, Usuario, Postulante
+
+def fila(n, **cambios):
+    return dict({'nombres': 'Ana', 'apellidos': 'Quispe', 'fecha_nacimiento': '2000-01-02', 'correo': f'importada{n}@b.pe',
+                 'dni': f'{n:08d}', 'password': 'secreta'}, **cambios)
+
+# 01: las lineas rotas se cuentan como invalidas con su numero y no frenan a las buenas de otros lotes
+def test_importar_jsonl_con_lineas_invalidas(contexto):
+    lineas = [json.dumps(fila(1)), '{"nombres": "sin cerrar"', json.dumps(fila(2)), '', '[1, 2, 3]',
+              json.dumps(fila(3, dni='123')), json.dumps(fila(1)), json.dumps(fila(4))]
+    errores = io.StringIO()
+    resumen = importar(io.StringIO('\n'.join(lineas) + '\n'), 'jsonl', 2, 1, True, validar_dni, errores=errores)
+    assert resumen == {'insertados': 3, 'duplicados': 1, 'invalidos': 3}
+    mensajes = errores.getvalue().splitlines()
+    assert [m.split(':')[0] for m in mensajes] == ['linea 2', 'linea 5', 'linea 6']
+    assert 'JSON invalido' in mensajes[0] and 'objeto JSON' in mensajes[1] and 'DNI' in mensajes[2]
+    correos = db.session.scalars(select(Usuario.email).join(Postulante).where(Usuario.email.like('importada%'))).all()
+    assert sorted(correos) == ['importada1@b.pe', 'importada2@b.pe', 'importada4@b.pe']
+
+# 02: en csv el numero de linea cuenta la cabecera
+def test_importar_csv_informa_la_linea(contexto):
+    texto = 'nombres,apellidos,fecha_nacimiento,correo,dni,password\nLuz,Mamani,2001-13-01,csv1@b.pe,12345678,x\n'
+    errores = io.StringIO()
+    assert importar(io.StringIO(texto), 'csv', 10, 1, True, validar_dni, errores=errores)['invalidos'] == 1
+    assert errores.getvalue().startswith('linea 2: fecha_nacimiento')
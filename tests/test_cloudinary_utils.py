@@ -0,0 +1,46 @@
+# -- Subida por streaming a cloudinary -- #
+# 01: imports
+import io
+import pytest
+from werkzeug.datastructures import FileStorage
+import cloudinary_utils
+from subidas import ArchivoDemasiadoGrande
+
+LIMITE = 5 * 1024 * 1024  # MAX_CONTENT_LENGTH de la app
+MINIMO_CLOUDINARY = 5 * 1024 * 1024  # upload_large rechaza partes menores (salvo la ultima)
+
+# 01: reemplaza el SDK y anota que metodo se uso, con que chunk_size y cuanto leyo
+@pytest.fixture
+def llamadas(monkeypatch):
+    registro = []
+    def respuesta():
+        return {'public_id': 'x', 'secure_url': 'https://x', 'format': 'pdf', 'bytes': 0, 'resource_type': 'raw'}
+    def upload(stream, **opciones):
+        registro.append(('upload', None, len(stream.read()))); return respuesta()
+    def upload_large(stream, chunk_size=20000000, **opciones):
+        assert chunk_size >= MINIMO_CLOUDINARY, f'cloudinary rechazaria partes de {chunk_size} bytes'
+        while parte := stream.read(chunk_size): registro.append(('upload_large', chunk_size, len(parte)))
+        return respuesta()
+    monkeypatch.setattr(cloudinary_utils.cloudinary.uploader, 'upload', upload)
+    monkeypatch.setattr(cloudinary_utils.cloudinary.uploader, 'upload_large', upload_large)
+    return registro
+
+def archivo(tamano):
+    return FileStorage(io.BytesIO(b'x' * tamano), filename='cv.pdf')
+
+# 02: el tamaño de parte nunca baja del minimo de cloudinary, aunque se configure o pida uno menor
+def test_parte_no_baja_del_minimo(llamadas):
+    assert cloudinary_utils.TAMANO_PARTE >= MINIMO_CLOUDINARY
+    cloudinary_utils.upload_stream_to_cloudinary(archivo(6 * 1024 * 1024), chunk_size=1024 * 1024)
+    assert [(metodo, parte) for metodo, parte, _ in llamadas] == [('upload_large', MINIMO_CLOUDINARY)] * 2
+
+# 03: todo lo que entra bajo MAX_CONTENT_LENGTH va en una sola llamada a upload
+def test_archivo_bajo_el_limite_usa_upload(llamadas):
+    assert cloudinary_utils.upload_stream_to_cloudinary(archivo(LIMITE), max_bytes=LIMITE)['success']
+    assert llamadas == [('upload', None, LIMITE)]
+
+# 04: lo que supera el limite no llega a enviarse
+def test_archivo_grande_se_rechaza_antes_de_subir(llamadas):
+    with pytest.raises(ArchivoDemasiadoGrande):
+        cloudinary_utils.upload_stream_to_cloudinary(archivo(LIMITE + 1), max_bytes=LIMITE)
+    assert llamadas == []
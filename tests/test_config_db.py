@@ -0,0 +1,38 @@
+# -- Configuracion de la base de datos -- #
+# 01: imports
+from flask import Flask
+from sqlalchemy import text
+from config_db import init_db, opciones_motor, url_base_de_datos
+from models import db
+
+def pragma(nombre):
+    with db.engine.connect() as con: return con.execute(text(f'PRAGMA {nombre}')).scalar()
+
+# 01: sqlite en archivo: WAL, synchronous=NORMAL (1) y busy_timeout en cada conexion
+def test_pragmas_sqlite_en_archivo(contexto):
+    assert pragma('journal_mode') == 'wal'
+    assert pragma('synchronous') == 1
+    assert pragma('busy_timeout') == 5000
+
+# 02: en memoria no hay WAL posible; el resto de los pragmas se aplica igual
+def test_pragmas_sqlite_en_memoria(tmp_path, monkeypatch):
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT', '1234')
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    init_db(app, str(tmp_path))
+    with app.app_context():
+        assert pragma('journal_mode') == 'memory'
+        assert pragma('synchronous') == 1
+        assert pragma('busy_timeout') == 1234
+
+# 03: DATABASE_URL con el esquema de heroku y el sqlite local por defecto
+def test_url_base_de_datos(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'postgres://u:c@host/base')
+    assert url_base_de_datos(str(tmp_path)) == 'postgresql://u:c@host/base'
+    monkeypatch.delenv('DATABASE_URL')
+    assert url_base_de_datos(str(tmp_path)) == f"sqlite:///{tmp_path / 'instance' / 'app.db'}"
+
+# 04: sqlite solo recibe el timeout del driver; postgres, el pool completo
+def test_opciones_motor():
+    assert set(opciones_motor('sqlite:///app.db')) == {'connect_args'}
+    assert opciones_motor('postgresql://u@host/base')['pool_pre_ping'] is True
@@ -0,0 +1,46 @@
+# -- Hash de contraseñas -- #
+# 01: imports
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import contrasenas
+from contrasenas import ServicioOcupado
+
+# 01: pool de un hilo con un lugar en cola; `bloquear` ocupa un cupo hasta que se suelta el evento
+@pytest.fixture
+def pool(monkeypatch):
+    hilos = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(contrasenas, '_pool', hilos)
+    monkeypatch.setattr(contrasenas, '_cupos', threading.BoundedSemaphore(2))
+    monkeypatch.setitem(contrasenas._politica, 'timeout', 5.0)
+    soltar = threading.Event()
+    yield soltar
+    soltar.set(); hilos.shutdown(wait=True)
+
+def bloquear(soltar):
+    hilo = threading.Thread(target=contrasenas._en_pool, args=(soltar.wait,)); hilo.start()
+    return hilo
+
+# 02: con el pool y la cola llenos rechaza en el acto; al terminar los hashes vuelve a aceptar
+def test_pool_lleno_rechaza(pool):
+    hilos = [bloquear(pool), bloquear(pool)]
+    with pytest.raises(ServicioOcupado): contrasenas.hashear('clave')
+    pool.set()
+    for hilo in hilos: hilo.join()
+    assert contrasenas.verificar(contrasenas.hashear('clave'), 'clave')
+
+# 03: si no responde a tiempo se rechaza; el cupo sigue ocupado mientras el hash corre
+def test_timeout_no_libera_el_cupo_antes_de_tiempo(pool, monkeypatch):
+    monkeypatch.setitem(contrasenas._politica, 'timeout', 0.05)
+    with pytest.raises(ServicioOcupado): contrasenas._en_pool(pool.wait)
+    assert contrasenas._cupos._value == 1
+    pool.set(); contrasenas._pool.submit(lambda: None).result()  # el callback de liberacion ya corrio
+    assert contrasenas._cupos._value == 2
+
+# 04: el login responde 503 en vez de esperar
+def test_login_ocupado_responde_503(postulantes, app, monkeypatch):
+    postulantes('ocupado@b.pe')
+    def ocupado(*args): raise ServicioOcupado('ocupado')
+    monkeypatch.setattr(contrasenas, '_en_pool', ocupado)
+    respuesta = app.test_client().post('/login', data={'correo': 'ocupado@b.pe', 'password': 'x'})
+    assert respuesta.status_code == 503
@@ -0,0 +1,76 @@
+# -- Miniaturas y vistas previas -- #
+# Necesitan Pillow (y pypdfium2 para los PDF); sin ellos se saltan, como la app deja de generar derivados.
+# 01: imports
+import io, os
+import pytest
+from sqlalchemy import text
+from werkzeug.datastructures import FileStorage
+import derivados as modulo
+from derivados import DerivadoImposible, derivados, renderizar, tarea_generar
+from almacenamiento import almacenamiento
+from models import db, Usuario, Archivo
+
+Image = pytest.importorskip('PIL.Image')
+
+def png(ancho, alto):
+    salida = io.BytesIO()
+    Image.new('RGB', (ancho, alto), 'red').save(salida, 'PNG')
+    return salida.getvalue()
+
+def abrir(webp):
+    imagen = Image.open(io.BytesIO(webp))
+    return imagen.format, imagen.size
+
+# -- render -- #
+# 01: webp con el lado mayor al tamaño pedido, sin agrandar las imagenes chicas
+def test_renderiza_imagen(tmp_path):
+    assert abrir(renderizar(png(1200, 600), 'png', 240)) == ('WEBP', (240, 120))
+    (tmp_path / 'chica.png').write_bytes(png(100, 50))
+    assert abrir(renderizar(str(tmp_path / 'chica.png'), 'png', 240)) == ('WEBP', (100, 50))  # tambien desde una ruta
+
+# 02: las imagenes con mas pixeles que MAX_PIXELES no se decodifican
+def test_imagen_demasiado_grande(monkeypatch):
+    monkeypatch.setattr(modulo, 'MAX_PIXELES', 1000)
+    with pytest.raises(DerivadoImposible, match='1000 pixeles'): renderizar(png(100, 100), 'png', 240)
+
+# 03: primera pagina del PDF; el documento y la pagina se cierran aunque falle el render
+def test_renderiza_pdf_y_cierra_el_documento(monkeypatch):
+    pdfium = pytest.importorskip('pypdfium2')
+    nuevo = pdfium.PdfDocument.new()
+    nuevo.new_page(400, 200)
+    salida = io.BytesIO(); nuevo.save(salida); nuevo.close()
+    cerrados = []
+    class Documento(pdfium.PdfDocument):
+        def close(self): cerrados.append('documento'); super().close()
+    monkeypatch.setattr(pdfium, 'PdfDocument', Documento)
+    assert abrir(renderizar(salida.getvalue(), 'pdf', 240)) == ('WEBP', (240, 120))
+    assert cerrados == ['documento']
+
+# -- generacion -- #
+@pytest.fixture
+def archivo_png(contexto):
+    usuario = Usuario(email='derivados@b.pe', password_hash='x', tipo='postulante', verificado=True)
+    db.session.add(usuario); db.session.flush()
+    guardado = almacenamiento.de('local').guardar(FileStorage(io.BytesIO(png(900, 300)), filename='foto.png'), 'postulantes', 'png')
+    archivo = Archivo(usuario_id=usuario.id, nombre_original='foto.png', nombre_guardado='foto.png', extension='png', mime_type='image/png',
+                      ruta=guardado.ruta, tamano=guardado.tamano, sha256=guardado.sha256, backend='local', clave=guardado.clave)
+    db.session.add(archivo); db.session.commit()
+    ids = {'archivo': archivo.id, 'usuario': usuario.id}
+    yield archivo
+    db.session.rollback()
+    db.session.execute(text('DELETE FROM archivos WHERE id = :archivo'), ids); db.session.execute(text('DELETE FROM usuarios WHERE id = :usuario'), ids)
+    db.session.commit()
+
+# 01: genera los tamaños que faltan leyendo el blob local desde su ruta
+def test_generar_todos_los_tamanos(archivo_png):
+    assert derivados.generar(archivo_png) == len(modulo.TAMANOS)
+    clave = derivados.clave(archivo_png)
+    with open(derivados.ruta(clave, 'mini'), 'rb') as f: assert abrir(f.read()) == ('WEBP', (240, 80))
+    assert derivados.generar(archivo_png) == 0  # ya estan en disco
+
+# 02: un archivo sin derivado posible no hace fallar la tarea (no se reintenta)
+def test_tarea_no_reintenta_imposibles(archivo_png, monkeypatch):
+    monkeypatch.setattr(modulo, 'MAX_PIXELES', 1000)
+    monkeypatch.setattr(modulo, 'TAMANOS', {'grande': 2000})  # falta en disco aunque otra prueba haya generado los demas
+    tarea_generar(archivo_png.id)
+    assert not os.path.exists(derivados.ruta(derivados.clave(archivo_png), 'grande'))
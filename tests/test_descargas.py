@@ -0,0 +1,64 @@
+# -- Descarga de archivos -- #
+# 01: imports
+import io
+import pytest
+from werkzeug.datastructures import FileStorage
+from almacenamiento import almacenamiento
+from models import db, Archivo
+
+CONTENIDO = b'%PDF-1.4 ' + b'x' * 1000
+
+@pytest.fixture
+def descarga(postulantes, app):
+    postulante = postulantes('descarga@b.pe')
+    guardado = almacenamiento.de('local').guardar(FileStorage(io.BytesIO(CONTENIDO), filename='cv.pdf'), 'postulantes', 'pdf')
+    archivo = Archivo(usuario_id=postulante.usuario_id, nombre_original='Currículum.pdf', nombre_guardado='cv.pdf', extension='pdf',
+                      mime_type='application/pdf', ruta=guardado.ruta, tamano=guardado.tamano, sha256=guardado.sha256, backend='local', clave=guardado.clave)
+    db.session.add(archivo); db.session.commit()
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion: sesion.update(user_id=postulante.usuario_id, tipo_usuario='postulante')
+    return cliente, f'/archivo/{archivo.id}'
+
+# 01: descarga completa con ETag, nombre unicode y cache privada que revalida
+def test_descarga_completa(descarga):
+    cliente, url = descarga
+    respuesta = cliente.get(url)
+    assert (respuesta.status_code, respuesta.data) == (200, CONTENIDO)
+    assert respuesta.headers['ETag'] and respuesta.headers['Accept-Ranges'] == 'bytes'
+    assert respuesta.headers['Content-Disposition'].startswith('attachment') and 'Curr%C3%ADculum.pdf' in respuesta.headers['Content-Disposition']
+    assert set(respuesta.headers['Cache-Control'].split(', ')) == {'private', 'no-cache', 'max-age=0'}
+    assert respuesta.headers['X-Content-Type-Options'] == 'nosniff'
+    assert cliente.get(url + '?ver=1').headers['Content-Disposition'].startswith('inline')
+
+# 02: con el ETag vigente responde 304 sin cuerpo
+def test_if_none_match_304(descarga):
+    cliente, url = descarga
+    etag = cliente.get(url).headers['ETag']
+    respuesta = cliente.get(url, headers={'If-None-Match': etag})
+    assert (respuesta.status_code, respuesta.data, respuesta.headers['ETag']) == (304, b'', etag)
+
+# 03: rangos (206); If-Range con otra version devuelve el archivo completo
+def test_range_e_if_range(descarga):
+    cliente, url = descarga
+    etag = cliente.get(url).headers['ETag']
+    parcial = cliente.get(url, headers={'Range': 'bytes=0-7', 'If-Range': etag})
+    assert (parcial.status_code, parcial.data) == (206, b'%PDF-1.4')
+    assert parcial.headers['Content-Range'] == f'bytes 0-7/{len(CONTENIDO)}'
+    viejo = cliente.get(url, headers={'Range': 'bytes=0-7', 'If-Range': '"otra"'})
+    assert (viejo.status_code, viejo.data) == (200, CONTENIDO)
+
+# 04: con x-accel nginx envia el archivo; la app solo responde la ruta interna
+def test_x_accel(descarga, app, monkeypatch):
+    monkeypatch.setitem(app.config, 'DESCARGAS_OFFLOAD', 'x-accel')
+    cliente, url = descarga
+    respuesta = cliente.get(url)
+    assert respuesta.headers['X-Accel-Redirect'].startswith('/_uploads/') and 'X-Sendfile' not in respuesta.headers
+    assert respuesta.data == b''
+
+# 05: un archivo de otro usuario no existe para este
+def test_archivo_ajeno_404(descarga, postulantes, app):
+    _, url = descarga
+    otro = postulantes('otro@b.pe')
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion: sesion.update(user_id=otro.usuario_id, tipo_usuario='postulante')
+    assert cliente.get(url).status_code == 404
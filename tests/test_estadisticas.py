@@ -0,0 +1,56 @@
+# -- Contadores del panel de administracion -- #
+# 01: imports
+import pytest
+from sqlalchemy import update
+from models import db, Archivo, Postulante
+from estadisticas import ContadoresAdmin, contadores
+
+@pytest.fixture
+def leidos(postulantes):
+    contadores.invalidar()
+    return contadores.leer()
+
+def archivo(usuario_id, tamano):
+    return Archivo(usuario_id=usuario_id, nombre_original='cv.pdf', nombre_guardado='cv.pdf', extension='pdf', mime_type='application/pdf',
+                   ruta='x', tamano=tamano, backend='local', clave=f'legado/{usuario_id}-{tamano}.pdf')
+
+# 01: los commits ajustan el cache con sus deltas, sin volver a contar
+def test_commit_aplica_deltas(leidos, postulantes):
+    reconciliado = contadores._reconciliado
+    postulante = postulantes('deltas@b.pe')
+    db.session.add(archivo(postulante.usuario_id, 1000)); db.session.commit()
+    db.session.refresh(postulante)  # estado cargado: el cambio se aplica como delta
+    postulante.estado = 'aprobado'; db.session.commit()
+    datos = contadores.leer()
+    assert contadores._reconciliado == reconciliado
+    assert (datos['usuarios'], datos['archivos'], datos['bytes_archivos']) == (leidos['usuarios'] + 1, leidos['archivos'] + 1, leidos['bytes_archivos'] + 1000)
+    assert datos['postulantes']['aprobado'] == leidos['postulantes']['aprobado'] + 1
+    assert datos['postulantes']['pendiente'] == leidos['postulantes']['pendiente']
+    assert datos == contadores.reconciliar()
+
+# 02: si el estado se asigna sin estar cargado no hay valor anterior: reconcilia en la proxima lectura
+def test_cambio_sin_valor_anterior_reconcilia(leidos, postulantes):
+    postulante = postulantes('expirado@b.pe')
+    db.session.expire(postulante)  # como tras un commit
+    reconciliado = contadores._reconciliado
+    postulante.estado = 'aprobado'; db.session.commit()
+    assert contadores.leer()['postulantes']['aprobado'] == leidos['postulantes']['aprobado'] + 1
+    assert contadores._reconciliado > reconciliado
+
+# 03: lo que se deshace con rollback no se aplica
+def test_rollback_descarta_deltas(leidos, postulantes):
+    postulante = postulantes('rollback@b.pe')
+    postulante.estado = 'rechazado'; db.session.flush()
+    db.session.rollback()
+    datos = contadores.leer()
+    assert datos['postulantes'] == {**leidos['postulantes'], 'pendiente': leidos['postulantes']['pendiente'] + 1}
+
+# 04: un UPDATE masivo no pasa por los eventos; la marca que toca otro proceso fuerza la reconciliacion
+def test_marca_de_otro_proceso_reconcilia(leidos, postulantes, app):
+    postulante = postulantes('marca@b.pe')
+    contadores.leer()
+    db.session.execute(update(Postulante).where(Postulante.id == postulante.id).values(estado='aprobado')); db.session.commit()
+    assert contadores.leer()['postulantes']['aprobado'] == leidos['postulantes']['aprobado']  # cache viejo
+    otro = ContadoresAdmin(); otro.marca = app.config['ESTADISTICAS_MARCA']
+    otro.invalidar()
+    assert contadores.leer()['postulantes']['aprobado'] == leidos['postulantes']['aprobado'] + 1
@@ -0,0 +1,64 @@
+# -- Cambio de estado masivo -- #
+# 01: imports
+import json
+import pytest
+from sqlalchemy import event, text
+from models import db, Archivo, AuditoriaEstado
+
+# 01: cuenta las sentencias UPDATE de postulantes durante el bloque
+@pytest.fixture
+def updates():
+    sentencias = []
+    def anotar(conn, cursor, sentencia, *args):
+        if sentencia.lstrip().upper().startswith('UPDATE POSTULANTES'): sentencias.append(sentencia)
+    event.listen(db.engine, 'before_cursor_execute', anotar)
+    yield sentencias
+    event.remove(db.engine, 'before_cursor_execute', anotar)
+
+def cambiar(cliente, **datos):
+    return cliente.post('/admin/postulantes/estado_masivo', data=datos, headers={'Accept': 'application/json'})
+
+def estados(*ids):
+    return [estado for (estado,) in db.session.execute(text('SELECT estado FROM postulantes WHERE id IN (SELECT value FROM json_each(:ids)) ORDER BY id'),
+                                                       {'ids': json.dumps(ids)})]
+
+# 02: los ids marcados cambian en un solo UPDATE; los que ya estaban en el estado no cuentan; queda auditado
+def test_seleccionados_un_update_y_auditoria(admin, postulantes, updates):
+    cliente, admin_id = admin
+    a, b, c = postulantes('a@b.pe'), postulantes('b@b.pe', estado='aprobado'), postulantes('c@b.pe')
+    respuesta = cambiar(cliente, estado='aprobado', alcance='seleccionados', ids=[str(a.id), str(b.id)])
+    assert respuesta.get_json() == {'afectados': 1, 'estado': 'aprobado'}
+    assert len(updates) == 1
+    assert estados(a.id, b.id, c.id) == ['aprobado', 'aprobado', 'pendiente']
+    auditoria = db.session.query(AuditoriaEstado).one()
+    assert (auditoria.admin_id, auditoria.estado_nuevo, auditoria.cantidad) == (admin_id, 'aprobado', 1)
+    assert json.loads(auditoria.criterio) == {'ids': sorted([a.id, b.id])}
+
+# 03: por filtro: pendientes con archivo subido
+def test_filtro_pendientes_con_archivo(admin, postulantes):
+    cliente, _ = admin
+    con, sin, aprobado = postulantes('con@b.pe'), postulantes('sin@b.pe'), postulantes('aprobado@b.pe', estado='aprobado')
+    for p in (con, aprobado):
+        db.session.add(Archivo(usuario_id=p.usuario_id, nombre_original='cv.pdf', nombre_guardado='cv.pdf', extension='pdf',
+                               mime_type='application/pdf', ruta='x', tamano=1, backend='local', clave=f'legado/{p.id}.pdf'))
+    db.session.commit()
+    respuesta = cambiar(cliente, estado='rechazado', alcance='filtro', filtro_estado='pendiente', con_archivo='1')
+    assert respuesta.get_json()['afectados'] == 1
+    assert estados(con.id, sin.id, aprobado.id) == ['rechazado', 'pendiente', 'aprobado']
+
+# 04: sin seleccion ni filtro, o con un estado desconocido, no toca la tabla
+def test_rechaza_sin_alcance(admin, postulantes, updates):
+    cliente, _ = admin
+    postulantes('nada@b.pe')
+    assert cambiar(cliente, estado='aprobado', alcance='seleccionados').status_code == 400
+    assert cambiar(cliente, estado='aprobado', alcance='filtro').status_code == 400
+    assert cambiar(cliente, estado='borrado', alcance='filtro', filtro_estado='pendiente').status_code == 400
+    assert updates == [] and db.session.query(AuditoriaEstado).count() == 0
+
+# 05: solo administradores
+def test_requiere_admin(postulantes, app):
+    p = postulantes('intruso@b.pe')
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion: sesion.update(user_id=p.usuario_id, tipo_usuario='postulante')
+    assert cambiar(cliente, estado='aprobado', ids=[str(p.id)]).status_code == 302  # a login
+    assert estados(p.id) == ['pendiente']
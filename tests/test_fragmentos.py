@@ -0,0 +1,68 @@
+# -- Cache de fragmentos y estaticos con huella -- #
+# 01: imports
+import gzip, re
+from datetime import datetime, timedelta
+import pytest
+from flask import url_for
+from sqlalchemy import update
+from models import db, Postulante
+from fragmentos import CacheFragmentos, fragmentos
+
+# -- {% cache %} -- #
+@pytest.fixture
+def cache_limpia(contexto):
+    fragmentos.limpiar()
+    yield fragmentos
+    fragmentos.limpiar()
+
+# 01: el cuerpo solo se evalua si la version cambio; el html no se vuelve a escapar
+def test_etiqueta_cache_por_version(cache_limpia, app):
+    llamadas = []
+    plantilla = app.jinja_env.from_string("{% cache 'prueba', id, version %}<b>{{ contar() }}</b>{% endcache %}")
+    contar = lambda: llamadas.append(1) or len(llamadas)
+    assert [plantilla.render(id=1, version=v, contar=contar) for v in ('a', 'a', 'b')] == ['<b>1</b>', '<b>1</b>', '<b>2</b>']
+    assert plantilla.render(id=2, version='a', contar=contar) == '<b>3</b>'  # otro id, otro fragmento
+
+# 02: LRU de `maximo` fragmentos; invalidar y la cache desactivada siempre renderizan
+def test_lru_invalidar_y_desactivada():
+    cache = CacheFragmentos(maximo=2)
+    for i in (1, 2, 3): cache.obtener('fila', i, (), lambda: 'html')
+    assert list(cache._datos) == [('fila', 2), ('fila', 3)]
+    cache.invalidar('fila', 3)
+    assert cache.obtener('fila', 3, (), lambda: 'nuevo') == 'nuevo'
+    cache.activo = False
+    assert cache.obtener('fila', 3, (), lambda: 'sin cache') == 'sin cache'
+
+def fila(html, postulante):
+    return re.search(rf'name="ids" value="{postulante.id}".*?</tr>', html, re.S).group(0)
+
+# 03: un UPDATE masivo que avanza fecha_actualizacion cambia la version: la fila se vuelve a renderizar
+# aunque este worker no se entere del cambio
+def test_update_masivo_cambia_la_version(cache_limpia, admin, postulantes):
+    cliente, _ = admin
+    postulante = postulantes('fila@b.pe')
+    assert 'estado-pendiente' in fila(cliente.get('/admin/usuarios').get_data(as_text=True), postulante)
+    db.session.execute(update(Postulante).where(Postulante.id == postulante.id)
+                       .values(estado='aprobado', fecha_actualizacion=datetime.utcnow() + timedelta(seconds=1))); db.session.commit()
+    assert 'estado-aprobado' in fila(cliente.get('/admin/usuarios').get_data(as_text=True), postulante)
+
+# 04: el endpoint de cambio masivo deja las filas al dia
+def test_estado_masivo_invalida_las_filas(cache_limpia, admin, postulantes):
+    cliente, _ = admin
+    postulante = postulantes('masivo@b.pe')
+    cliente.get('/admin/usuarios')
+    cliente.post('/admin/postulantes/estado_masivo', data={'estado': 'rechazado', 'ids': [str(postulante.id)]})
+    assert 'estado-rechazado' in fila(cliente.get('/admin/usuarios').get_data(as_text=True), postulante)
+
+# -- estaticos -- #
+# 01: url con huella del contenido, servida con un año de cache, immutable y gzip si el navegador lo acepta
+def test_estatico_con_huella(app):
+    with app.test_request_context(): url = url_for('static', filename='css/styles.css')
+    assert re.fullmatch(r'/static/css/styles\.[0-9a-f]{12}\.css', url)
+    cliente = app.test_client()
+    plano, comprimido = cliente.get(url), cliente.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert plano.status_code == 200 and 'Content-Encoding' not in plano.headers
+    assert set(plano.headers['Cache-Control'].split(', ')) >= {'public', 'immutable', 'max-age=31536000'}
+    assert comprimido.headers['Content-Encoding'] == 'gzip' and gzip.decompress(comprimido.data) == plano.data
+    assert 'Accept-Encoding' in comprimido.headers['Vary']
+    assert cliente.get('/static/css/styles.css').status_code == 200  # sin huella sigue funcionando
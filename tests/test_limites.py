@@ -0,0 +1,58 @@
+# -- Limites de frecuencia -- #
+# 01: imports
+import pytest
+from flask import Flask
+from sqlalchemy import text
+from models import db, Usuario
+from limites import CubetasTokens, Limitador, limitador
+import contrasenas
+
+# -- cubetas -- #
+# 01: la capacidad se gasta de a una ficha; esperar informa sin gastar
+def test_cubeta_gasta_y_revisa(monkeypatch):
+    reloj = [100.0]
+    monkeypatch.setattr('limites.time.monotonic', lambda: reloj[0])
+    cubetas = CubetasTokens(2, 60)
+    assert [cubetas.consumir('a'), cubetas.consumir('a')] == [0.0, 0.0]
+    assert cubetas.esperar('a') == pytest.approx(30.0) and cubetas.consumir('a') == pytest.approx(30.0)
+    reloj[0] += 30
+    assert cubetas.esperar('a') == 0.0 and cubetas.esperar('b') == 0.0
+    assert cubetas.consumir('a') == 0.0
+
+# 02: al superar `maximo` se descartan las claves menos usadas
+def test_cubeta_descarta_las_claves_antiguas():
+    cubetas = CubetasTokens(1, 60, maximo=2)
+    for clave in 'abc': cubetas.consumir(clave)
+    assert list(cubetas._cubetas) == ['b', 'c']
+
+# 03: el total se reparte entre los workers, con al menos una ficha por worker
+def test_limite_repartido_entre_workers():
+    app, limites = Flask(__name__), Limitador()
+    app.config.update(LIMITE_WORKERS=8, LIMITE_IP='30/60', LIMITE_EMAIL='5/300')
+    limites.init_app(app)
+    assert (limites.cubetas['ip'].capacidad, limites.cubetas['email'].capacidad) == (3.75, 1.0)
+
+# -- login -- #
+@pytest.fixture
+def cliente(contexto):
+    for cubetas in limitador.cubetas.values(): cubetas.limpiar()
+    usuario = Usuario(email='limite@b.pe', password_hash=contrasenas.hashear('clave'), tipo='postulante', verificado=True)
+    db.session.add(usuario); db.session.commit()
+    yield contexto.test_client()
+    for cubetas in limitador.cubetas.values(): cubetas.limpiar()
+    db.session.execute(text("DELETE FROM usuarios WHERE email = 'limite@b.pe'")); db.session.commit()
+
+def entrar(cliente, password):
+    return cliente.post('/login', data={'correo': 'limite@b.pe', 'password': password})
+
+# 01: los inicios de sesion correctos no gastan las fichas del correo
+def test_login_correcto_no_gasta_el_limite(cliente):
+    for _ in range(int(limitador.cubetas['email'].capacidad) + 3):
+        assert entrar(cliente, 'clave').status_code == 302
+
+# 02: los fallidos si; al agotarse responde 429 con Retry-After, aun con la contraseña correcta
+def test_login_fallido_gasta_el_limite(cliente):
+    for _ in range(int(limitador.cubetas['email'].capacidad)):
+        assert entrar(cliente, 'otra').status_code == 200
+    respuesta = entrar(cliente, 'clave')
+    assert respuesta.status_code == 429 and int(respuesta.headers['Retry-After']) > 0
@@ -0,0 +1,46 @@
+# -- Metricas de peticiones y SQL -- #
+# 01: imports
+from collections import Counter
+import pytest
+from flask import Flask, g
+from sqlalchemy import create_engine, event, exc
+from config_db import init_db
+from metricas import Metricas
+
+# 01: una sentencia que falla no deja su inicio pendiente ni se suma a la siguiente
+def test_sentencia_fallida_no_contamina_la_siguiente():
+    metricas, motor = Metricas(), create_engine('sqlite://')
+    event.listen(motor, 'before_cursor_execute', metricas._antes_sql)
+    event.listen(motor, 'after_cursor_execute', metricas._despues_sql)
+    with Flask(__name__).test_request_context(), motor.connect() as con:
+        g.metricas = {'sentencias': Counter(), 'sql': 0.0}
+        with pytest.raises(exc.OperationalError): con.exec_driver_sql('SELECT * FROM no_existe')
+        con.exec_driver_sql('SELECT 1')
+        assert g.metricas['sentencias'] == Counter({'SELECT 1': 1})
+        assert 0 < g.metricas['sql'] < 1
+        assert 'metricas_inicio' not in con.info
+
+# -- peticiones -- #
+# 01: app propia con su registro de metricas y una ruta que falla
+def app_con_metricas(tmp_path, **config):
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', METRICAS=True, **config)
+    init_db(app, str(tmp_path))
+    metricas = Metricas(); metricas.init_app(app)
+    app.add_url_rule('/ok', 'ok', lambda: 'ok')
+    app.add_url_rule('/falla', 'falla', lambda: 1 / 0)
+    return app, metricas
+
+# 02: una excepcion sin manejar cuenta como 500 con su latencia
+def test_excepcion_cuenta_como_500(tmp_path):
+    app, metricas = app_con_metricas(tmp_path)
+    cliente = app.test_client()
+    assert cliente.get('/ok').status_code == 200 and cliente.get('/falla').status_code == 500
+    assert metricas.peticiones.series == Counter({(('endpoint', 'ok'), ('codigo', 200)): 1, (('endpoint', 'falla'), ('codigo', 500)): 1})
+    assert metricas.latencia.series[(('endpoint', 'falla'),)][2] == 1
+
+# 03: si la excepcion se propaga (TESTING, debug) after_request no corre y la anota el teardown
+def test_excepcion_propagada_cuenta_como_500(tmp_path):
+    app, metricas = app_con_metricas(tmp_path, TESTING=True)
+    with pytest.raises(ZeroDivisionError): app.test_client().get('/falla')
+    assert metricas.peticiones.series == Counter({(('endpoint', 'falla'), ('codigo', 500)): 1})
@@ -0,0 +1,50 @@
+# -- Migraciones y planes de consulta -- #
+# 01: imports
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from sqlalchemy import create_engine, exc
+import migraciones
+from models import db
+
+# 01: con el esquema migrado todas las consultas de las rutas usan indices
+def test_consultas_de_rutas_usan_indices(contexto):
+    assert migraciones.verificar_indices(db.engine) == {}
+
+# 02: migrar de nuevo no aplica nada y todas quedan marcadas
+def test_migrar_es_idempotente(contexto):
+    assert migraciones.migrar(db.engine, salida=lambda linea: None) == 0
+    assert all(aplicada for _, _, aplicada in migraciones.estado(db.engine))
+
+# 03: una base sqlite nueva se migra al arrancar una sola vez aunque varios procesos arranquen juntos
+def test_sqlite_se_migra_al_arrancar(tmp_path):
+    url = f"sqlite:///{tmp_path / 'nueva.db'}"
+    motores = [create_engine(url, connect_args={'timeout': 30}) for _ in range(3)]
+    with ThreadPoolExecutor(3) as pool:
+        aplicadas = list(pool.map(lambda motor: migraciones.migrar_sqlite_al_arrancar(motor, salida=lambda linea: None), motores))
+    assert sorted(aplicadas) == [0, 0, len(migraciones.MIGRACIONES)]
+    assert migraciones.pendientes(motores[0]) == []
+
+# 04: bases viejas: la clave se deduce de la url o de nombre_guardado y despues se vuelve obligatoria
+def test_clave_de_archivos_viejos(tmp_path, caplog):
+    motor = create_engine(f"sqlite:///{tmp_path / 'vieja.db'}")
+    filas = [(1, 'https://res.cloudinary.com/demo/image/upload/v1/postulantes/cv.pdf', 'postulantes/cv'),
+             (2, 'https://res.cloudinary.com/demo/raw/upload/postulantes/notas.docx', 'postulantes/notas.docx'),
+             (3, 'https://res.cloudinary.com/demo/raw/otra/forma', 'postulantes/x.txt'),  # url irreconocible
+             (4, 'uploads/abc.png', 'abc.png')]
+    with motor.begin() as con:
+        con.exec_driver_sql('CREATE TABLE archivos (id INTEGER PRIMARY KEY, ruta TEXT NOT NULL, nombre_guardado TEXT NOT NULL, sha256 TEXT)')
+        con.exec_driver_sql('INSERT INTO archivos (id, ruta, nombre_guardado) VALUES (?, ?, ?)', filas)
+        migraciones._archivos_backend_y_clave(con)
+        migraciones._archivos_clave_obligatoria(con)
+        claves = dict(con.exec_driver_sql('SELECT id, clave FROM archivos').all())
+    assert claves == {1: 'image/postulantes/cv', 2: 'raw/postulantes/notas.docx', 3: 'raw/postulantes/x.txt', 4: 'abc.png'}
+    assert '[3]' in caplog.text
+    with pytest.raises(exc.IntegrityError), motor.begin() as con:
+        con.exec_driver_sql("INSERT INTO archivos (id, ruta, nombre_guardado) VALUES (5, 'uploads/x', 'x')")
+
+# 05: una fila sin forma de deducir la clave detiene la migracion con su id
+def test_archivo_sin_clave_detiene_la_migracion(tmp_path):
+    with create_engine(f"sqlite:///{tmp_path / 'vieja.db'}").begin() as con:
+        con.exec_driver_sql('CREATE TABLE archivos (id INTEGER PRIMARY KEY, ruta TEXT NOT NULL, nombre_guardado TEXT NOT NULL, sha256 TEXT, clave TEXT)')
+        con.exec_driver_sql("INSERT INTO archivos VALUES (7, 'https://res.cloudinary.com/demo/mal', '', NULL, NULL)")
+        with pytest.raises(RuntimeError, match=r'\[7\]'): migraciones._archivos_clave_obligatoria(con)
@@ -0,0 +1,36 @@
+# -- Paginacion por cursor -- #
+# 01: imports
+import base64, json
+from datetime import datetime
+import pytest
+from models import db, Usuario, Archivo
+from paginacion import codificar_cursor, paginar_keyset
+
+def cursor_crudo(datos):
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode()
+
+@pytest.fixture
+def archivos(contexto):
+    usuario = Usuario(email='paginas@b.pe', password_hash='x', tipo='postulante', verificado=True)
+    db.session.add(usuario); db.session.flush()
+    db.session.add_all(Archivo(usuario_id=usuario.id, nombre_original=f'{i}.pdf', nombre_guardado=f'{i}.pdf', extension='pdf',
+                               mime_type='application/pdf', ruta=f'{i}.pdf', tamano=1, backend='local', clave=f'{i}.pdf',
+                               fecha_subida=datetime(2025, 1, 1 + i)) for i in range(5))
+    db.session.flush()
+    return Archivo.query.filter_by(usuario_id=usuario.id)
+
+COLUMNAS = [Archivo.fecha_subida, Archivo.id]
+
+# 01: el cursor de una pagina lleva a la siguiente sin repetir filas
+def test_paginas_consecutivas(archivos):
+    primera, cursor = paginar_keyset(archivos, COLUMNAS, limite=3)
+    segunda, fin = paginar_keyset(archivos, COLUMNAS, cursor, limite=3)
+    assert [a.nombre_original for a in primera + segunda] == ['4.pdf', '3.pdf', '2.pdf', '1.pdf', '0.pdf'] and fin is None
+
+# 02: un cursor alterado devuelve la primera pagina en lugar de fallar en la base
+@pytest.mark.parametrize('cursor', ['%%%', 'bm8', cursor_crudo([[1], [2]]), cursor_crudo(['ayer', 3]), cursor_crudo([{'dt': 'x'}, 1]),
+                                    cursor_crudo({'a': 1, 'b': 2}), cursor_crudo([{'dt': '2025-01-03T00:00:00'}, True]),
+                                    codificar_cursor(datetime(2025, 1, 3))])
+def test_cursor_alterado_es_primera_pagina(archivos, cursor):
+    filas, _ = paginar_keyset(archivos, COLUMNAS, cursor, limite=3)
+    assert [a.nombre_original for a in filas] == ['4.pdf', '3.pdf', '2.pdf']
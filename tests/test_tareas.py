@@ -0,0 +1,69 @@
+# -- Cola de tareas -- #
+# 01: imports
+import time
+import pytest
+from sqlalchemy import text
+from models import db
+
+def fila(cola, tarea_id):
+    with cola._conexion() as con: return con.execute('SELECT * FROM tareas WHERE id=?', (tarea_id,)).fetchone()
+
+def fallar(**payload): raise RuntimeError('sin conexion')
+
+# 01: un fallo vuelve a pendiente con espera exponencial (base * 2**(intentos-1), +-20%)
+def test_fallo_reintenta_con_backoff(tareas, monkeypatch):
+    monkeypatch.setitem(tareas.handlers, 'prueba.fallar', fallar)
+    tarea_id = tareas.encolar('prueba.fallar')
+    antes = time.time()
+    assert tareas.procesar_pendientes() == 1
+    tarea = fila(tareas, tarea_id)
+    assert (tarea['estado'], tarea['intentos']) == ('pendiente', 1)
+    assert 'sin conexion' in tarea['ultimo_error']
+    base = tareas.app.config['TAREAS_BACKOFF_BASE']
+    assert antes + base * 0.8 <= tarea['ejecutar_en'] <= time.time() + base * 1.2
+    assert tareas.procesar_pendientes() == 0  # todavia no vence
+
+# 02: al agotar los intentos pasa a muertas; reintentar las devuelve con los intentos en cero
+def test_muerta_tras_max_intentos(tareas, monkeypatch):
+    monkeypatch.setitem(tareas.app.config, 'TAREAS_MAX_INTENTOS', 3)
+    monkeypatch.setitem(tareas.app.config, 'TAREAS_BACKOFF_BASE', 0)  # vence enseguida
+    monkeypatch.setitem(tareas.handlers, 'prueba.fallar', fallar)
+    tarea_id = tareas.encolar('prueba.fallar')
+    assert tareas.procesar_pendientes() == 3
+    assert (fila(tareas, tarea_id)['estado'], fila(tareas, tarea_id)['intentos']) == ('muerta', 3)
+    assert tareas.resumen() == {'muerta': 1}
+
+    hechas = []
+    monkeypatch.setitem(tareas.handlers, 'prueba.fallar', lambda **payload: hechas.append(payload))
+    assert tareas.reintentar_muertas() == 1
+    assert tareas.procesar_pendientes() == 1
+    assert tareas.resumen() == {'hecha': 1} and hechas == [{}]
+
+# 03: TAREAS_SINCRONO ejecuta en linea, sin pasar por la tabla, y el error llega al que encola
+def test_sincrono_ejecuta_en_linea(tareas, monkeypatch):
+    monkeypatch.setitem(tareas.app.config, 'TAREAS_SINCRONO', True)
+    hechas = []
+    monkeypatch.setitem(tareas.handlers, 'prueba.anotar', lambda **payload: hechas.append(payload))
+    monkeypatch.setitem(tareas.handlers, 'prueba.fallar', fallar)
+    tareas.encolar('prueba.anotar', archivo_id=7)
+    assert hechas == [{'archivo_id': 7}] and tareas.resumen() == {}
+    with pytest.raises(RuntimeError): tareas.encolar('prueba.fallar')
+
+# 04: lo diferido con encolar_tras_commit se descarta con rollback y se encola con commit
+def test_encolar_tras_commit(tareas, monkeypatch):
+    monkeypatch.setitem(tareas.app.config, 'TAREAS_SINCRONO', True)
+    hechas = []
+    monkeypatch.setitem(tareas.handlers, 'prueba.anotar', lambda **payload: hechas.append(payload))
+    db.session.execute(text('SELECT 1'))  # transaccion abierta, como en una vista
+    tareas.encolar_tras_commit(db.session, 'prueba.anotar', n=1)
+    db.session.rollback()
+    assert hechas == [] and 'tareas_pendientes' not in db.session.info
+
+    db.session.execute(text('SELECT 1'))
+    tareas.encolar_tras_commit(db.session, 'prueba.anotar', n=2)
+    db.session.commit()
+    assert hechas == [{'n': 2}]
+
+# 05: una tarea sin handler no se guarda
+def test_tarea_no_registrada(tareas):
+    with pytest.raises(KeyError): tareas.encolar('prueba.no_existe')
@@ -0,0 +1,69 @@
+# -- Usuario actual por peticion -- #
+# 01: imports
+import pytest
+from flask import session
+from models import db
+import usuario_actual as modulo
+from usuario_actual import CacheIdentidades, Identidad, cache, invalidar_usuario, usuario_actual
+
+def identidad(usuario_id):
+    return Identidad(usuario_id, f'u{usuario_id}@b.pe', 'postulante', True, None)
+
+# -- cache -- #
+# 01: cada entrada vence a los `ttl` segundos de guardarse
+def test_cache_vence_por_ttl(monkeypatch):
+    reloj = [100.0]
+    monkeypatch.setattr(modulo.time, 'monotonic', lambda: reloj[0])
+    identidades = CacheIdentidades(ttl=30)
+    identidades.guardar(1, identidad(1))
+    reloj[0] += 29
+    assert identidades.obtener(1) == identidad(1)
+    reloj[0] += 2
+    assert identidades.obtener(1) is None and 1 not in identidades._datos
+
+# 02: al superar `maximo` sale la menos usada; con ttl 0 no guarda nada
+def test_cache_lru_y_desactivado():
+    identidades = CacheIdentidades(ttl=60, maximo=2)
+    for i in (1, 2): identidades.guardar(i, identidad(i))
+    identidades.obtener(1)
+    identidades.guardar(3, identidad(3))
+    assert list(identidades._datos) == [1, 3]
+    apagado = CacheIdentidades(ttl=0)
+    apagado.guardar(1, identidad(1))
+    assert apagado.obtener(1) is None
+
+# -- por peticion -- #
+@pytest.fixture
+def cargas(contexto, monkeypatch):
+    monkeypatch.setattr(cache, 'ttl', 60)
+    cache.limpiar()
+    llamadas = []
+    original = modulo.cargar_identidad
+    monkeypatch.setattr(modulo, 'cargar_identidad', lambda usuario_id: llamadas.append(usuario_id) or original(usuario_id))
+    yield llamadas
+    cache.limpiar()
+
+def peticion(app, usuario_id):
+    contexto = app.test_request_context()
+    contexto.push(); session['user_id'] = usuario_id
+    return contexto
+
+# 01: una carga por peticion (flask.g) y ninguna mientras dure la copia del proceso
+def test_una_carga_mientras_dure_el_ttl(cargas, postulantes, app):
+    postulante = postulantes('cache@b.pe', nombres='Rosa')
+    for _ in range(3):
+        with peticion(app, postulante.usuario_id):
+            assert usuario_actual() is usuario_actual()
+            assert (usuario_actual().email, usuario_actual().postulante.nombres) == ('cache@b.pe', 'Rosa')
+    assert cargas == [postulante.usuario_id]
+
+# 02: invalidar descarta la copia del proceso y la de la peticion en curso
+def test_invalidar_vuelve_a_cargar(cargas, postulantes, app):
+    postulante = postulantes('invalidar@b.pe')
+    with peticion(app, postulante.usuario_id):
+        assert usuario_actual().postulante.estado == 'pendiente'
+        postulante.estado = 'aprobado'; db.session.commit()
+        assert usuario_actual().postulante.estado == 'pendiente'  # copia vieja hasta invalidar
+        invalidar_usuario(postulante.usuario_id)
+        assert usuario_actual().postulante.estado == 'aprobado'
+    assert cargas == [postulante.usuario_id] * 2
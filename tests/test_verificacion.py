@@ -0,0 +1,63 @@
+# -- Codigos de verificacion -- #
+# 01: imports
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import text
+from models import db, Usuario, CodigoVerificacion
+import verificacion
+
+@pytest.fixture
+def usuario(tareas):
+    usuario = Usuario(email='codigo@b.pe', password_hash='x', tipo='postulante', verificado=False)
+    db.session.add(usuario); db.session.commit()
+    yield usuario
+    db.session.rollback()
+    db.session.execute(text("DELETE FROM codigos_verificacion")); db.session.execute(text("DELETE FROM usuarios WHERE email = 'codigo@b.pe'"))
+    db.session.commit()
+
+def emitir(email='codigo@b.pe'):
+    codigo = verificacion.emitir_codigo(email); db.session.commit()
+    return codigo
+
+INCORRECTO = '000000'  # los codigos van de 100000 a 999999
+
+# 01: el codigo correcto verifica al usuario y se borra; solo se guarda su hash
+def test_codigo_correcto_verifica(usuario):
+    codigo = emitir()
+    assert codigo not in db.session.get(CodigoVerificacion, 'codigo@b.pe').codigo_hash
+    assert verificacion.comprobar_codigo('codigo@b.pe', codigo) == 'ok'
+    assert db.session.get(Usuario, usuario.id).verificado and db.session.get(CodigoVerificacion, 'codigo@b.pe') is None
+    assert verificacion.comprobar_codigo('codigo@b.pe', codigo) == 'inexistente'
+
+# 02: cada intento se reserva antes de comparar; al llegar al maximo se bloquea aunque el codigo sea correcto
+def test_intentos_reservados_hasta_bloquear(usuario, app):
+    codigo = emitir()
+    maximo = app.config['VERIFICACION_MAX_INTENTOS']
+    assert [verificacion.comprobar_codigo('codigo@b.pe', INCORRECTO) for _ in range(maximo)] == ['incorrecto'] * maximo
+    assert verificacion.comprobar_codigo('codigo@b.pe', codigo) == 'bloqueado'
+    db.session.expire_all()
+    assert db.session.get(CodigoVerificacion, 'codigo@b.pe').intentos == maximo
+    emitir()  # un codigo nuevo reinicia los intentos
+    assert verificacion.comprobar_codigo('codigo@b.pe', INCORRECTO) == 'incorrecto'
+
+# 03: un codigo vencido no se acepta
+def test_codigo_vencido(usuario):
+    codigo = emitir()
+    db.session.get(CodigoVerificacion, 'codigo@b.pe').expira = datetime.utcnow() - timedelta(seconds=1); db.session.commit()
+    assert verificacion.comprobar_codigo('codigo@b.pe', codigo) == 'vencido'
+
+# 04: la purga borra solo los vencidos, de a `lote` filas
+def test_purgar_vencidos_por_lotes(usuario):
+    ahora = datetime.utcnow()
+    db.session.add_all([CodigoVerificacion(email=f'v{i}@b.pe', codigo_hash='x', intentos=0, creado=ahora, expira=ahora - timedelta(hours=1))
+                        for i in range(7)])
+    emitir()
+    assert verificacion.purgar_vencidos(lote=3) == 7
+    assert [c.email for c in db.session.query(CodigoVerificacion)] == ['codigo@b.pe']
+
+# 05: emitir programa una purga tras el commit, como mucho una cada VERIFICACION_PURGA segundos
+def test_emitir_programa_una_purga(usuario, tareas, monkeypatch):
+    monkeypatch.setitem(verificacion._purga, 'ultima', float('-inf'))
+    emitir(); emitir()
+    with tareas._conexion() as con:
+        assert con.execute("SELECT COUNT(*) FROM tareas WHERE nombre = 'verificacion.purgar'").fetchone()[0] == 1
@@ -0,0 +1,92 @@
+# -- Usuario actual por peticion -- #
+# 01: imports
+import threading, time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from flask import g, session
+from sqlalchemy.orm import joinedload
+from models import db, Usuario
+
+# -- datos cacheables -- #
+# 01: copia inmutable de lo que las rutas leen del postulante
+@dataclass(frozen=True)
+class PerfilPostulante:
+    id: int
+    nombres: str
+    apellidos: str
+    dni: str
+    estado: str
+
+# 02: copia inmutable del usuario; no depende de ninguna sesion de SQLAlchemy
+@dataclass(frozen=True)
+class Identidad:
+    id: int
+    email: str
+    tipo: str
+    verificado: bool
+    postulante: Optional[PerfilPostulante]
+
+# -- cache del proceso -- #
+# 01: LRU con expiracion por entrada
+class CacheIdentidades:
+    def __init__(self, ttl=0, maximo=1024):
+        self.ttl, self.maximo = ttl, maximo
+        self._datos = OrderedDict()
+        self._candado = threading.Lock()
+
+    def obtener(self, usuario_id):
+        if self.ttl <= 0: return None
+        with self._candado:
+            entrada = self._datos.get(usuario_id)
+            if entrada is None: return None
+            if entrada[0] < time.monotonic():
+                del self._datos[usuario_id]; return None
+            self._datos.move_to_end(usuario_id)
+            return entrada[1]
+
+    def guardar(self, usuario_id, identidad):
+        if self.ttl <= 0: return
+        with self._candado:
+            self._datos[usuario_id] = (time.monotonic() + self.ttl, identidad)
+            self._datos.move_to_end(usuario_id)
+            while len(self._datos) > self.maximo: self._datos.popitem(last=False)
+
+    def invalidar(self, usuario_id):
+        with self._candado: self._datos.pop(usuario_id, None)
+
+    def limpiar(self):
+        with self._candado: self._datos.clear()
+
+cache = CacheIdentidades()
+
+# 02: configuracion desde la app (USUARIO_CACHE_TTL=0 desactiva el cache del proceso)
+def init_app(app):
+    cache.ttl = app.config.setdefault('USUARIO_CACHE_TTL', 0)
+    cache.maximo = app.config.setdefault('USUARIO_CACHE_MAX', 1024)
+
+# -- carga -- #
+# 01: una sola consulta para el usuario y su postulante
+def cargar_identidad(usuario_id):
+    usuario = db.session.get(Usuario, usuario_id, options=[joinedload(Usuario.postulante)])
+    if usuario is None: return None
+    p = usuario.postulante
+    return Identidad(usuario.id, usuario.email, usuario.tipo, bool(usuario.verificado),
+                     PerfilPostulante(p.id, p.nombres, p.apellidos, p.dni, p.estado) if p else None)
+
+# 02: identidad de la peticion en curso, memorizada en flask.g
+def usuario_actual():
+    if 'usuario_actual' in g: return g.usuario_actual
+    identidad = None
+    if (usuario_id := session.get('user_id')) is not None:
+        identidad = cache.obtener(usuario_id)
+        if identidad is None:
+            identidad = cargar_identidad(usuario_id)
+            if identidad is not None: cache.guardar(usuario_id, identidad)
+    g.usuario_actual = identidad
+    return identidad
+
+# 03: descarta la copia de un usuario tras escribir sus datos
+def invalidar_usuario(usuario_id):
+    cache.invalidar(usuario_id)
+    if 'usuario_actual' in g and g.usuario_actual and g.usuario_actual.id == usuario_id: g.pop('usuario_actual')
@@ -0,0 +1,94 @@
+# -- Codigos de verificacion de correo -- #
+# Guardados en la base de datos (no en la cookie de sesion) para que funcionen desde
+# cualquier navegador y en todos los workers.
+# 01: imports
+import hmac, os, secrets, time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from sqlalchemy import delete, select, update
+from models import db, Usuario, CodigoVerificacion
+from tareas import cola
+from usuario_actual import invalidar_usuario
+
+MENSAJES = {
+    'incorrecto': 'Código incorrecto',
+    'vencido': 'El código venció, solicita uno nuevo',
+    'bloqueado': 'Demasiados intentos fallidos, solicita un código nuevo',
+    'inexistente': 'No hay un código pendiente para ese correo',
+}
+
+_purga = {'ultima': float('-inf')}  # ultima purga programada por este proceso
+
+# 02: VERIFICACION_TTL, VERIFICACION_MAX_INTENTOS y VERIFICACION_PURGA
+def init_app(app):
+    app.config.setdefault('VERIFICACION_TTL', int(os.environ.get('VERIFICACION_TTL', 900)))  # segundos de vigencia
+    app.config.setdefault('VERIFICACION_MAX_INTENTOS', 5)  # intentos fallidos antes de bloquear el codigo
+    app.config.setdefault('VERIFICACION_PURGA', 600)  # segundos entre purgas de codigos vencidos
+
+    # comandos: flask verificacion purgar
+    @app.cli.group('verificacion')
+    def grupo():
+        """Codigos de verificacion de correo"""
+
+    @grupo.command('purgar')
+    @click.option('--lote', default=500, show_default=True, help='filas borradas por transaccion')
+    def _purgar(lote):
+        """Borra los codigos vencidos"""
+        click.echo(f'{purgar_vencidos(lote)} codigos borrados')
+
+# -- codigos -- #
+# 01: HMAC con la clave de la app; una copia de la base no revela codigos vigentes
+def _hash(email, codigo):
+    return hmac.new(current_app.secret_key.encode(), f'{email}:{codigo}'.encode(), 'sha256').hexdigest()
+
+# 02: genera un codigo nuevo para el correo (reemplaza el anterior) en la transaccion actual
+def emitir_codigo(email):
+    codigo = str(secrets.randbelow(900000) + 100000)
+    ahora = datetime.utcnow()
+    db.session.merge(CodigoVerificacion(email=email, codigo_hash=_hash(email, codigo), intentos=0, creado=ahora,
+                                        expira=ahora + timedelta(seconds=current_app.config['VERIFICACION_TTL'])))
+    _programar_purga()
+    return codigo
+
+# 03: comprueba el codigo y marca el correo como verificado; devuelve 'ok' o una clave de MENSAJES
+def comprobar_codigo(email, codigo):
+    fila = db.session.get(CodigoVerificacion, email)
+    if fila is None: return 'inexistente'
+    if fila.expira < datetime.utcnow(): return 'vencido'
+    # reserva el intento con un UPDATE condicional: entre workers nadie supera el maximo
+    reservado = db.session.execute(
+        update(CodigoVerificacion).where(CodigoVerificacion.email == email,
+                                         CodigoVerificacion.intentos < current_app.config['VERIFICACION_MAX_INTENTOS'])
+        .values(intentos=CodigoVerificacion.intentos + 1).execution_options(synchronize_session=False)).rowcount
+    if not reservado:
+        db.session.rollback(); return 'bloqueado'
+    if not hmac.compare_digest(fila.codigo_hash, _hash(email, codigo)):
+        db.session.commit(); return 'incorrecto'
+    db.session.delete(fila)
+    if usuario := Usuario.query.filter_by(email=email).first():
+        usuario.verificado = True; invalidar_usuario(usuario.id)
+    db.session.commit()
+    return 'ok'
+
+# -- limpieza -- #
+# 01: borra los vencidos de a `lote` filas para no bloquear la tabla en una sola transaccion
+def purgar_vencidos(lote=500):
+    total = 0
+    while True:
+        vencidos = select(CodigoVerificacion.email).where(CodigoVerificacion.expira < datetime.utcnow()).limit(lote).scalar_subquery()
+        borrados = db.session.execute(delete(CodigoVerificacion).where(CodigoVerificacion.email.in_(vencidos))
+                                      .execution_options(synchronize_session=False)).rowcount
+        db.session.commit(); total += borrados
+        if borrados < lote: return total
+
+@cola.tarea('verificacion.purgar')
+def tarea_purgar_vencidos():
+    purgar_vencidos()
+
+# 02: como mucho una purga cada VERIFICACION_PURGA segundos por proceso, tras el commit del registro
+def _programar_purga():
+    ahora = time.monotonic()
+    if ahora - _purga['ultima'] < current_app.config['VERIFICACION_PURGA']: return
+    _purga['ultima'] = ahora
+    cola.encolar_tras_commit(db.session, 'verificacion.purgar')